@@ -0,0 +1,41 @@
+"""
+Benchmark simulate_outcomes on random entries over synthetic bars.
+
+Usage:
+    python -m benchmarks.bench_outcomes [--bars 200000] [--trades 2000000] [--tie stop_loss]
+"""
+import time
+import argparse
+import numpy as np
+
+from src.backtest.outcomes import simulate_outcomes, OUTCOME_NAMES, TIE_RULES
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--bars', type=int, default=200_000)
+    parser.add_argument('--trades', type=int, default=2_000_000)
+    parser.add_argument('--tie', choices=TIE_RULES, default='stop_loss')
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    closes = 40000 + np.cumsum(rng.normal(0, 40, args.bars))
+    opens = np.concatenate([[closes[0]], closes[:-1]])
+    highs = np.maximum(opens, closes) + rng.uniform(0, 60, args.bars)
+    lows = np.minimum(opens, closes) - rng.uniform(0, 60, args.bars)
+    entries = rng.integers(0, args.bars, args.trades)
+    directions = rng.choice([-1, 1], args.trades)
+
+    start = time.perf_counter()
+    result = simulate_outcomes(opens, highs, lows, closes, entries, directions,
+                               take_profit=0.005, stop_loss=0.003, tie=args.tie)
+    elapsed = time.perf_counter() - start
+
+    counts = {OUTCOME_NAMES[code]: int((result['outcome'] == code).sum()) for code in OUTCOME_NAMES}
+    print(f"{'trades/s':<12}{args.trades / elapsed:>14,.0f}")
+    print(f"{'outcomes':<12}{counts}")
+    print(f"{'mean pnl':<12}{result['pnl'].mean():>14.6f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark price history decoding on a synthetic 100k-candle payload.
+
+Compares the legacy path (json + one dict per candle + pd.to_datetime per
+timestamp + DataFrame from records) against decode_price_payload.
+
+Usage:
+    python -m benchmarks.bench_price_decoding [--candles 100000] [--repeat 5]
+"""
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from datetime import datetime, timedelta
+
+from src.api.decoding import decode_price_payload, orjson
+
+
+def build_payload(candles: int) -> bytes:
+    """Build a Capital.com style /prices response body"""
+    start = datetime(2024, 1, 1)
+    rng = np.random.default_rng(42)
+    closes = 40000 + np.cumsum(rng.normal(0, 20, candles))
+    prices = []
+    for i, close in enumerate(closes):
+        bid = round(float(close), 2)
+        prices.append({
+            'snapshotTime': (start + timedelta(minutes=5 * i)).strftime('%Y-%m-%dT%H:%M:%S'),
+            'snapshotTimeUTC': (start + timedelta(minutes=5 * i)).strftime('%Y-%m-%dT%H:%M:%S'),
+            'openPrice': {'bid': bid - 5, 'ask': bid - 4},
+            'closePrice': {'bid': bid, 'ask': bid + 1},
+            'highPrice': {'bid': bid + 10, 'ask': bid + 11},
+            'lowPrice': {'bid': bid - 10, 'ask': bid - 9},
+            'lastTradedVolume': int(rng.integers(1, 500))
+        })
+    return json.dumps({'prices': prices, 'instrumentType': 'CRYPTOCURRENCIES'}).encode()
+
+
+def legacy_decode(raw: bytes) -> pd.DataFrame:
+    """Decode the payload the way load_historical_data used to"""
+    candles = json.loads(raw)['prices']
+    df = pd.DataFrame([{
+        'timestamp': pd.to_datetime(candle['snapshotTime']),
+        'open': float(candle['openPrice']['bid']),
+        'high': float(candle['highPrice']['bid']),
+        'low': float(candle['lowPrice']['bid']),
+        'close': float(candle['closePrice']['bid']),
+        'volume': float(candle.get('lastTradedVolume', 0))
+    } for candle in candles])
+    df.set_index('timestamp', inplace=True)
+    return df
+
+
+def columnar_decode(raw: bytes) -> pd.DataFrame:
+    """Decode the payload into NumPy columns and build the DataFrame once"""
+    columns = decode_price_payload(raw, 'bid')
+    index = pd.DatetimeIndex(columns.pop('timestamp').astype('datetime64[ns]'), name='timestamp')
+    return pd.DataFrame(columns, index=index)
+
+
+def best_of(func, raw: bytes, repeat: int) -> float:
+    """Return the best wall time of several runs"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(raw)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--candles', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    raw = build_payload(args.candles)
+    print(f"Payload: {args.candles} candles, {len(raw) / 1e6:.1f} MB, JSON parser: {'orjson' if orjson else 'json'}")
+
+    # Both paths must produce the same frame
+    pd.testing.assert_frame_equal(legacy_decode(raw), columnar_decode(raw), check_index_type=False)
+
+    legacy = best_of(legacy_decode, raw, args.repeat)
+    columnar = best_of(columnar_decode, raw, args.repeat)
+    arrays = best_of(lambda r: decode_price_payload(r, 'bid'), raw, args.repeat)
+
+    print(f"{'legacy dict records':<24}{legacy * 1000:>10.1f} ms")
+    print(f"{'columnar DataFrame':<24}{columnar * 1000:>10.1f} ms  ({legacy / columnar:.1f}x)")
+    print(f"{'columnar arrays only':<24}{arrays * 1000:>10.1f} ms  ({legacy / arrays:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
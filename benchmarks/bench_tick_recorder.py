@@ -0,0 +1,61 @@
+"""
+Benchmark the per-quote cost of TickRecorder.record and the replay reader.
+
+Records synthetic quotes for a few epics into a temporary directory, reports
+the amortized cost per record (buffer flushes included) and reads the file
+back through TickReader.
+
+Usage:
+    python -m benchmarks.bench_tick_recorder [--ticks 1000000] [--epics 4]
+"""
+import time
+import argparse
+import tempfile
+import numpy as np
+
+from src.api.tick_recorder import TickRecorder, TickReader
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--ticks', type=int, default=1_000_000)
+    parser.add_argument('--epics', type=int, default=4)
+    args = parser.parse_args()
+
+    epics = [f"EPIC{i}" for i in range(args.epics)]
+    rng = np.random.default_rng(42)
+    bids = (40000 + np.cumsum(rng.normal(0, 1, args.ticks))).tolist()
+    now = time.time()
+    quotes = [
+        (epics[i % args.epics], bid, bid + 10, int((now + i * 0.001) * 1000), now + i * 0.001)
+        for i, bid in enumerate(bids)
+    ]
+
+    with tempfile.TemporaryDirectory() as directory:
+        recorder = TickRecorder(directory)
+        record = recorder.record
+        start = time.perf_counter()
+        for epic, bid, ofr, timestamp, received in quotes:
+            record(epic, bid, ofr, timestamp, received)
+        elapsed = time.perf_counter() - start
+        recorder.close()
+
+        reader = TickReader(recorder._path)
+        assert len(reader) == args.ticks
+        assert np.allclose(reader.to_array()['bid'], bids)
+
+        start = time.perf_counter()
+        mid = (reader.to_array(epics[0])['bid'] + reader.to_array(epics[0])['ofr']) / 2
+        read = time.perf_counter() - start
+
+        start = time.perf_counter()
+        replayed = reader.replay(lambda quote: None)
+        replay = time.perf_counter() - start
+
+    print(f"{'record':<16}{elapsed / args.ticks * 1e9:>10.0f} ns/tick")
+    print(f"{'filter + mid':<16}{read * 1000:>10.1f} ms for {len(mid)} ticks")
+    print(f"{'replay':<16}{replay / replayed * 1e9:>10.0f} ns/tick")
+
+
+if __name__ == '__main__':
+    main()
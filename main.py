@@ -40,8 +40,9 @@ def run_live_monitoring():
             print(colored("\n🔌 Starting WebSocket connection...", "cyan"))
             await trader.ws_client.connect_with_retry()
             
-            if await trader.ws_client.subscribe_market_data("BTCUSD"):
+            if await trader.ws_client.subscribe_market_data(trader.epic):
                 print(colored("✅ Successfully subscribed to market data", "green"))
+                await trader.ws_client.subscribe_ohlc(trader.epic, [trader.get_resolution()])
                 await trader.ws_client.listen()
             else:
                 print(colored("❌ Failed to subscribe to market data", "red"))
@@ -52,6 +53,8 @@ def run_live_monitoring():
         finally:
             print(colored("\nClosing WebSocket connection...", "yellow"))
             await trader.ws_client.close()
+            trader.session_manager.stop()
+            trader.order_manager.stop()
 
     # Create event loop
     loop = asyncio.get_event_loop()
@@ -0,0 +1,11 @@
+from .montecarlo import MonteCarloSimulator, MonteCarloResult, trade_returns
+from .performance import (
+    PERFORMANCE_METRICS, performance_metrics, session_performance, session_series,
+    drawdown_series, max_drawdown, rolling_returns, sharpe_ratio, sortino_ratio, calmar_ratio, exposure_time
+)
+
+__all__ = [
+    'MonteCarloSimulator', 'MonteCarloResult', 'trade_returns',
+    'PERFORMANCE_METRICS', 'performance_metrics', 'session_performance', 'session_series',
+    'drawdown_series', 'max_drawdown', 'rolling_returns', 'sharpe_ratio', 'sortino_ratio', 'calmar_ratio', 'exposure_time'
+]
@@ -0,0 +1,199 @@
+import argparse
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional
+from tabulate import tabulate
+from termcolor import colored
+
+from src.utils.config import BACKTEST_CONFIG
+
+RESAMPLING_METHODS = ['bootstrap', 'block']
+# Trade outcomes that realized a P&L, OPEN and INVALID trades book nothing
+CLOSED_OUTCOMES = ('TP', 'SL', 'EXIT')
+PERCENTILES = [5, 25, 50, 75, 95]
+
+
+def trade_returns(trades: Iterable[Dict]) -> np.ndarray:
+    """Return of every closed trade on the balance it was opened with, oldest first"""
+    returns = []
+    for trade in trades:
+        if trade.get('outcome', 'EXIT') not in CLOSED_OUTCOMES:
+            continue
+        balance = trade['balance_after_trade'] - trade['pnl']
+        returns.append(trade['pnl'] / balance if balance > 0 else -1.0)
+    return np.array(returns, dtype=np.float64)
+
+
+@dataclass
+class MonteCarloResult:
+    initial_balance: float
+    paths: int
+    horizon: int                  # Trades per path
+    max_drawdown: np.ndarray      # Deepest peak-to-trough fall of each path, in %
+    terminal_return: np.ndarray   # Return at the end of each path, in %
+    ruin_trade: np.ndarray        # Trade (1-based) at which each path was ruined, 0 if never
+    ruin_level: float             # Share of the initial balance lost that counts as ruin
+
+    @property
+    def ruined(self) -> np.ndarray:
+        return self.ruin_trade > 0
+
+    @property
+    def probability_of_ruin(self) -> float:
+        return float(self.ruined.mean()) if self.paths else 0.0
+
+    def percentiles(self, percentiles: Iterable[float] = PERCENTILES) -> pd.DataFrame:
+        """Percentiles of drawdown, terminal return and time to ruin (of the ruined paths)"""
+        percentiles = list(percentiles)
+        ruin_trades = self.ruin_trade[self.ruined]
+        return pd.DataFrame({
+            'max_drawdown': np.percentile(self.max_drawdown, percentiles),
+            'terminal_return': np.percentile(self.terminal_return, percentiles),
+            'trades_to_ruin': np.percentile(ruin_trades, percentiles) if len(ruin_trades) else np.full(len(percentiles), np.nan)
+        }, index=[f"p{p:g}" for p in percentiles])
+
+
+class MonteCarloSimulator:
+    """Resamples a trade history into synthetic equity paths.
+
+    Each path draws ``horizon`` trade returns from the history, either
+    independently (``bootstrap``) or as runs of ``block_size`` consecutive
+    trades starting anywhere in the history and wrapping around its end
+    (``block``), which keeps streaks of wins and losses together. Returns
+    compound on the path balance, the way trades sized on the current
+    balance do. Paths are generated in chunks of 2-D arrays sized to
+    ``memory_limit`` bytes, so 100k paths never need more than that at once.
+    For a given seed the results do not depend on the chunk size.
+    """
+
+    def __init__(self, returns: np.ndarray, initial_balance: Optional[float] = None,
+                 method: Optional[str] = None, block_size: Optional[int] = None,
+                 ruin_level: Optional[float] = None, memory_limit: Optional[int] = None):
+        """
+        Initialize MonteCarloSimulator
+
+        Args:
+            returns: Return of every historical trade on its opening balance (see ``trade_returns``)
+            initial_balance: Starting balance of every path
+            method: 'bootstrap' or 'block'
+            block_size: Consecutive trades per block of the block method
+            ruin_level: Share of the initial balance lost at which a path counts as ruined
+            memory_limit: Bytes of path arrays held at once
+        """
+        self.returns = np.asarray(returns, dtype=np.float64)
+        if len(self.returns) == 0:
+            raise ValueError("No closed trades to resample")
+        self.initial_balance = initial_balance if initial_balance is not None else BACKTEST_CONFIG['initial_balance']
+        self.method = method or BACKTEST_CONFIG['monte_carlo_method']
+        if self.method not in RESAMPLING_METHODS:
+            raise ValueError(f"Unknown resampling method {self.method}, expected one of {RESAMPLING_METHODS}")
+        self.block_size = max(1, min(block_size or BACKTEST_CONFIG['monte_carlo_block_size'], len(self.returns)))
+        self.ruin_level = ruin_level if ruin_level is not None else BACKTEST_CONFIG['monte_carlo_ruin_level']
+        self.memory_limit = memory_limit or BACKTEST_CONFIG['monte_carlo_memory_limit']
+
+    @classmethod
+    def from_session(cls, session, **kwargs) -> 'MonteCarloSimulator':
+        """Simulator over the closed trades of a TradingSession (or anything with ``session``, like a BacktestResult)"""
+        session = getattr(session, 'session', session)
+        return cls(trade_returns(session.trades), initial_balance=kwargs.pop('initial_balance', session.initial_balance), **kwargs)
+
+    def _indices(self, rng: np.random.Generator, paths: int, horizon: int) -> np.ndarray:
+        """History index of every trade of a chunk of paths"""
+        count = len(self.returns)
+        if self.method == 'bootstrap':
+            return rng.integers(0, count, size=(paths, horizon))
+        blocks = -(-horizon // self.block_size)
+        starts = rng.integers(0, count, size=(paths, blocks))
+        indices = (starts[:, :, None] + np.arange(self.block_size)) % count
+        return indices.reshape(paths, blocks * self.block_size)[:, :horizon]
+
+    def run(self, paths: Optional[int] = None, horizon: Optional[int] = None, seed: Optional[int] = None) -> MonteCarloResult:
+        """
+        Simulate equity paths
+
+        Args:
+            paths: Number of synthetic equity paths
+            horizon: Trades per path, defaults to the length of the history
+            seed: Seed of the resampling
+
+        Returns:
+            MonteCarloResult with the drawdown, terminal return and ruin trade of every path
+        """
+        paths = paths if paths is not None else BACKTEST_CONFIG['monte_carlo_paths']
+        horizon = horizon or len(self.returns)
+        rng = np.random.default_rng(seed)
+
+        # Indices, equity, running peak and drawdown temporaries are alive per path trade
+        chunk_size = max(1, self.memory_limit // (horizon * 8 * 5))
+        growth = np.maximum(1 + self.returns, 0)  # A balance that is gone stays gone
+        ruin_equity = 1 - self.ruin_level
+
+        max_drawdown = np.empty(paths)
+        terminal_return = np.empty(paths)
+        ruin_trade = np.zeros(paths, dtype=np.int64)
+        for start in range(0, paths, chunk_size):
+            end = min(start + chunk_size, paths)
+            # Equity relative to the initial balance
+            equity = growth[self._indices(rng, end - start, horizon)]
+            np.cumprod(equity, axis=1, out=equity)
+
+            peak = np.maximum.accumulate(equity, axis=1)
+            np.maximum(peak, 1.0, out=peak)
+            max_drawdown[start:end] = ((peak - equity) / peak).max(axis=1) * 100
+            terminal_return[start:end] = (equity[:, -1] - 1) * 100
+
+            ruined = equity <= ruin_equity
+            first = ruined.argmax(axis=1)
+            ruin_trade[start:end] = np.where(ruined[np.arange(end - start), first], first + 1, 0)
+
+        return MonteCarloResult(
+            initial_balance=self.initial_balance,
+            paths=paths,
+            horizon=horizon,
+            max_drawdown=max_drawdown,
+            terminal_return=terminal_return,
+            ruin_trade=ruin_trade,
+            ruin_level=self.ruin_level
+        )
+
+
+def print_monte_carlo_results(result: MonteCarloResult):
+    """Print the percentiles and the probability of ruin of a simulation"""
+    print(colored(f"\n=== Monte Carlo: {result.paths:,} paths of {result.horizon} trades ===", "cyan"))
+    print(tabulate(result.percentiles(), headers='keys', tablefmt='grid', floatfmt='.2f'))
+
+    profitable = (result.terminal_return > 0).mean() * 100 if result.paths else 0.0
+    print(colored(f"📈 {profitable:.1f}% of paths end in profit", "green" if profitable >= 50 else "red"))
+    ruin = result.probability_of_ruin * 100
+    print(colored(f"💀 Probability of losing {result.ruin_level * 100:.0f}% of the balance: {ruin:.2f}%",
+                  "red" if ruin > 0 else "green"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Monte Carlo equity paths from a session report")
+    parser.add_argument('--report', required=True, help="Session report CSV (DATA_DIR/session_<id>.csv)")
+    parser.add_argument('--initial-balance', type=float, default=None)
+    parser.add_argument('--paths', type=int, default=None)
+    parser.add_argument('--horizon', type=int, default=None, help="Trades per path (default: trades in the report)")
+    parser.add_argument('--method', choices=RESAMPLING_METHODS, default=None)
+    parser.add_argument('--block-size', type=int, default=None)
+    parser.add_argument('--ruin-level', type=float, default=None, help="Share of the balance lost that counts as ruin")
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    trades = pd.read_csv(args.report).to_dict('records')
+    returns = trade_returns(trades)
+    print(colored(f"🎲 Resampling {len(returns)} closed trades...", "cyan"))
+    simulator = MonteCarloSimulator(
+        returns,
+        initial_balance=args.initial_balance,
+        method=args.method,
+        block_size=args.block_size,
+        ruin_level=args.ruin_level
+    )
+    print_monte_carlo_results(simulator.run(paths=args.paths, horizon=args.horizon, seed=args.seed))
+
+
+if __name__ == '__main__':
+    main()
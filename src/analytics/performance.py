@@ -0,0 +1,215 @@
+import numpy as np
+import pandas as pd
+from typing import Dict, Iterable, Optional, Tuple
+
+SECONDS_PER_YEAR = 365.25 * 24 * 3600
+# Keys of performance_metrics
+PERFORMANCE_METRICS = ('sharpe_ratio', 'sortino_ratio', 'calmar_ratio', 'annualized_return',
+                       'max_drawdown', 'max_drawdown_duration', 'exposure')
+
+
+def _seconds(times: Iterable) -> np.ndarray:
+    """Epoch seconds of datetimes, timestamps or numbers (already seconds)"""
+    times = np.asarray(list(times) if not isinstance(times, (np.ndarray, pd.Index)) else times)
+    if times.dtype.kind in 'fiu':
+        return times.astype(np.float64)
+    return pd.DatetimeIndex(pd.to_datetime(times)).as_unit('ns').asi8 / 1e9 if len(times) else np.zeros(0)
+
+
+def period_returns(equity: np.ndarray) -> np.ndarray:
+    """Return of every period of an equity curve"""
+    equity = np.asarray(equity, dtype=np.float64)
+    return equity[1:] / equity[:-1] - 1
+
+
+def drawdown_series(equity: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Drawdown of every point of an equity curve
+
+    Returns:
+        Depth below the running peak in %, and duration as the number of
+        periods since that peak (0 at a new peak)
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    peak = np.maximum.accumulate(equity)
+    depth = (peak - equity) / peak * 100
+    positions = np.arange(len(equity))
+    last_peak = np.maximum.accumulate(np.where(equity >= peak, positions, 0))
+    return depth, positions - last_peak
+
+
+def max_drawdown(equity: np.ndarray) -> float:
+    """Deepest fall below the running peak of an equity curve, in %"""
+    if len(equity) == 0:
+        return 0.0
+    depth, _ = drawdown_series(equity)
+    return float(max(depth.max(), 0.0))
+
+
+def rolling_returns(equity: np.ndarray, window, times: Optional[Iterable] = None) -> np.ndarray:
+    """
+    Return over a trailing window at every point, NaN until the window is filled
+
+    Args:
+        equity: Equity curve
+        window: Periods, or a pd.Timedelta when times are given
+        times: Time of every equity point
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    returns = np.full(len(equity), np.nan)
+    if times is None:
+        if 0 < window < len(equity):
+            returns[window:] = equity[window:] / equity[:-window] - 1
+        return returns
+
+    seconds = _seconds(times)
+    # First point at least a window before each point, the window is filled once one exists
+    start = np.searchsorted(seconds, seconds - pd.Timedelta(window).total_seconds(), side='right') - 1
+    filled = start >= 0
+    returns[filled] = equity[filled] / equity[start[filled]] - 1
+    return returns
+
+
+def sharpe_ratio(returns: np.ndarray, periods_per_year: float = 1.0, risk_free: float = 0.0) -> float:
+    """Mean excess return over its standard deviation, annualized by periods_per_year"""
+    excess = np.asarray(returns, dtype=np.float64) - risk_free / periods_per_year
+    if len(excess) < 2:
+        return 0.0
+    deviation = excess.std(ddof=1)
+    return float(excess.mean() / deviation * np.sqrt(periods_per_year)) if deviation > 0 else 0.0
+
+
+def sortino_ratio(returns: np.ndarray, periods_per_year: float = 1.0, target: float = 0.0) -> float:
+    """Mean return above target over the downside deviation, annualized by periods_per_year"""
+    excess = np.asarray(returns, dtype=np.float64) - target
+    if len(excess) == 0:
+        return 0.0
+    downside = np.sqrt(np.mean(np.minimum(excess, 0) ** 2))
+    return float(excess.mean() / downside * np.sqrt(periods_per_year)) if downside > 0 else 0.0
+
+
+def calmar_ratio(annualized_return: float, max_drawdown_percentage: float) -> float:
+    """Annualized return over the max drawdown (both in %), 0 without a drawdown"""
+    return annualized_return / max_drawdown_percentage if max_drawdown_percentage > 0 else 0.0
+
+
+def exposure_time(entry_times: Iterable, exit_times: Iterable, start=None, end=None) -> float:
+    """
+    Share of time with at least one position open, in %
+
+    Overlapping positions count once. The period runs from the first entry
+    (or start) to the last exit (or end).
+    """
+    entries, exits = _seconds(entry_times), _seconds(exit_times)
+    if len(entries) == 0:
+        return 0.0
+    order = np.argsort(entries, kind='stable')
+    entries, exits = entries[order], np.maximum(exits[order], entries[order])
+
+    # Each position only adds the time past the furthest exit of the positions opened before it
+    covered_until = np.maximum.accumulate(exits)
+    previous = np.concatenate([[-np.inf], covered_until[:-1]])
+    covered = np.maximum(covered_until - np.maximum(entries, previous), 0).sum()
+
+    first = _seconds([start])[0] if start is not None else entries[0]
+    last = _seconds([end])[0] if end is not None else covered_until[-1]
+    span = last - first
+    return float(min(covered / span, 1.0) * 100) if span > 0 else 0.0
+
+
+def performance_metrics(equity: np.ndarray, times: Optional[Iterable] = None,
+                        entry_times: Optional[Iterable] = None, exit_times: Optional[Iterable] = None,
+                        periods_per_year: Optional[float] = None) -> Dict[str, float]:
+    """
+    Risk-adjusted statistics of an equity curve
+
+    Args:
+        equity: Equity curve, starting with the initial balance
+        times: Time of every equity point, annualizes the ratios and returns
+        entry_times: Entry time of every trade, for the exposure
+        exit_times: Exit time of every trade, for the exposure
+        periods_per_year: Equity points per year (derived from times when not given;
+            without either the ratios are per period and the return is not annualized)
+
+    Returns:
+        Dict with the PERFORMANCE_METRICS: ratios, annualized return and max
+        drawdown in %, drawdown duration in periods and exposure in %
+    """
+    equity = np.asarray(equity, dtype=np.float64)
+    returns = period_returns(equity) if len(equity) > 1 else np.zeros(0)
+
+    years = None
+    if times is not None and len(equity) > 1:
+        seconds = _seconds(times)
+        span = seconds[-1] - seconds[0]
+        if span > 0:
+            years = span / SECONDS_PER_YEAR
+            if periods_per_year is None:
+                periods_per_year = len(returns) / years
+    if years is None and periods_per_year and len(returns):
+        years = len(returns) / periods_per_year
+
+    total = equity[-1] / equity[0] if len(equity) and equity[0] > 0 else 1.0
+    if years and total > 0:
+        with np.errstate(over='ignore'):
+            annualized = float((np.power(total, 1 / years) - 1) * 100)
+    else:
+        annualized = (total - 1) * 100
+    depth, duration = drawdown_series(equity) if len(equity) else (np.zeros(1), np.zeros(1, dtype=np.int64))
+    deepest = float(max(depth.max(), 0.0))
+
+    exposure = 0.0
+    if entry_times is not None and exit_times is not None:
+        exposure = exposure_time(entry_times, exit_times)
+
+    periods_per_year = periods_per_year or 1.0
+    return {
+        'sharpe_ratio': sharpe_ratio(returns, periods_per_year),
+        'sortino_ratio': sortino_ratio(returns, periods_per_year),
+        'calmar_ratio': calmar_ratio(annualized, deepest),
+        'annualized_return': annualized,
+        'max_drawdown': deepest,
+        'max_drawdown_duration': int(duration.max()),
+        'exposure': exposure
+    }
+
+
+def session_arrays(session) -> Dict[str, np.ndarray]:
+    """
+    Equity curve and trade times of a TradingSession (or anything with ``session``, like a BacktestResult)
+
+    Returns:
+        Dict with 'equity', 'times' (session start or first entry, then each
+        trade's exit), 'entry_times' and 'exit_times' as epoch seconds
+    """
+    session = getattr(session, 'session', session)
+    trades = session.trades
+    entry_times = _seconds([trade.get('entry_time') or trade['timestamp'] for trade in trades])
+    exit_times = _seconds([trade.get('exit_time') or trade.get('entry_time') or trade['timestamp'] for trade in trades])
+    start = _seconds([session.session_start])
+    if len(entry_times):
+        # Backtests replay history long before the session object was created
+        start = np.minimum(start, entry_times.min())
+    return {
+        'equity': np.asarray(session.equity_curve, dtype=np.float64),
+        'times': np.concatenate([start, np.maximum.accumulate(exit_times) if len(exit_times) else exit_times]),
+        'entry_times': entry_times,
+        'exit_times': exit_times
+    }
+
+
+def session_performance(session) -> Dict[str, float]:
+    """PERFORMANCE_METRICS of a live session, a backtest session or a BacktestResult"""
+    return performance_metrics(**session_arrays(session))
+
+
+def session_series(session, window=pd.Timedelta(days=1)) -> pd.DataFrame:
+    """Equity, drawdown depth and duration and trailing returns of every point of a session, indexed by time"""
+    arrays = session_arrays(session)
+    depth, duration = drawdown_series(arrays['equity'])
+    return pd.DataFrame({
+        'equity': arrays['equity'],
+        'drawdown': depth,
+        'drawdown_duration': duration,
+        'rolling_return': rolling_returns(arrays['equity'], window, arrays['times']) * 100
+    }, index=pd.to_datetime(arrays['times'], unit='s'))
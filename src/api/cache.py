@@ -0,0 +1,99 @@
+import time
+import threading
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+
+class _InFlight:
+    """Request shared by every caller asking for the same key"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResponseCache:
+    """TTL cache for Capital.com REST responses.
+
+    Entries are keyed by ``(category, *args)`` where the category selects the
+    freshness window, e.g. ``('markets', 'BTCUSD')``. Concurrent callers that
+    miss on the same key share one in-flight request instead of each hitting
+    the API. ``None`` results are treated as failures and never stored.
+    """
+
+    def __init__(self, ttls: Dict[str, float]):
+        """
+        Initialize ResponseCache
+
+        Args:
+            ttls: Freshness window in seconds per category, 0 disables caching
+        """
+        self.ttls = dict(ttls)
+        self._entries: Dict[Tuple, Tuple[float, Any]] = {}
+        self._in_flight: Dict[Tuple, _InFlight] = {}
+        self._lock = threading.Lock()
+        self._stats = {category: {'hits': 0, 'misses': 0, 'coalesced': 0} for category in self.ttls}
+
+    def get_or_fetch(self, key: Tuple[Hashable, ...], fetch: Callable[[], Any]) -> Any:
+        """Return a fresh cached value for key or fetch it once for all waiting callers"""
+        category = key[0]
+        ttl = self.ttls.get(category, 0)
+        stats = self._stats.setdefault(category, {'hits': 0, 'misses': 0, 'coalesced': 0})
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() < entry[0]:
+                stats['hits'] += 1
+                return entry[1]
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is not None:
+                stats['coalesced'] += 1
+                owner = False
+            else:
+                in_flight = _InFlight()
+                self._in_flight[key] = in_flight
+                stats['misses'] += 1
+                owner = True
+
+        if not owner:
+            in_flight.done.wait()
+            if in_flight.error is not None:
+                raise in_flight.error
+            return in_flight.value
+
+        try:
+            in_flight.value = fetch()
+            if in_flight.value is not None and ttl > 0:
+                with self._lock:
+                    # Skip storing if the key was invalidated while the request was running
+                    if self._in_flight.get(key) is in_flight:
+                        self._entries[key] = (time.monotonic() + ttl, in_flight.value)
+            return in_flight.value
+        except Exception as e:
+            in_flight.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._in_flight.get(key) is in_flight:
+                    del self._in_flight[key]
+            in_flight.done.set()
+
+    def invalidate(self, *categories: str):
+        """Drop cached entries for the given categories, or everything if none given"""
+        with self._lock:
+            if not categories:
+                self._entries.clear()
+                self._in_flight.clear()
+                return
+
+            for key in [k for k in self._entries if k[0] in categories]:
+                del self._entries[key]
+            # Detach running requests so their now-stale result is not stored
+            for key in [k for k in self._in_flight if k[0] in categories]:
+                del self._in_flight[key]
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """Get hit, miss and coalesced request counts per category"""
+        with self._lock:
+            return {category: dict(stats) for category, stats in self._stats.items()}
@@ -4,9 +4,14 @@ import time
 import base64
 import requests
 from typing import Dict, List, Optional, Union
-from datetime import datetime
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
 from termcolor import colored
+from src.api.rate_limiter import RateLimiter, REQUEST_PRIORITY
+from src.api.cache import ResponseCache
+from src.api.decoding import decode_price_payload
+from src.utils.config import API_CONFIG
 
 class CapitalAPI:
     def __init__(self):
@@ -17,8 +22,8 @@ class CapitalAPI:
         self.identifier = os.getenv('CAPITAL_API_IDENTIFIER')
         self.password = os.getenv('CAPITAL_API_PASSWORD')
         
-        # Set base URL based on demo/live mode
-        self.base_url = (
+        # Set base URL based on demo/live mode (CAPITAL_API_URL overrides, e.g. for the simulator)
+        self.base_url = os.getenv('CAPITAL_API_URL') or (
             'https://demo-api-capital.backend-capital.com' if self.demo_mode 
             else 'https://api-capital.backend-capital.com'
         )
@@ -29,6 +34,18 @@ class CapitalAPI:
         self.account_info = None
         self.last_account_update = None
         self.account_update_interval = 60  # Update account info every 60 seconds
+        self.session_manager = None  # Set by SessionManager to enable re-authentication
+        
+        # Shared rate limiter for every REST call
+        self.rate_limiter = RateLimiter(
+            rate=API_CONFIG['rate_limit'],
+            burst=API_CONFIG['rate_burst'],
+            starvation_timeout=API_CONFIG['starvation_timeout']
+        )
+        self.max_retries = API_CONFIG['max_retries']
+        
+        # Short-lived cache for market, positions and account responses
+        self.cache = ResponseCache(API_CONFIG['cache_ttl'])
         
     def _headers(self, with_auth: bool = True) -> Dict[str, str]:
         """Generate headers for API requests"""
@@ -45,10 +62,86 @@ class CapitalAPI:
             
         return headers
 
+    def _parse_retry_after(self, response: requests.Response) -> float:
+        """Get the backoff delay requested by a 429 response"""
+        retry_after = response.headers.get('Retry-After')
+        if retry_after:
+            try:
+                return max(0.0, float(retry_after))
+            except ValueError:
+                try:
+                    retry_at = parsedate_to_datetime(retry_after)
+                    return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+                except (TypeError, ValueError):
+                    pass
+        return API_CONFIG['default_retry_after']
+
+    def _request(
+        self,
+        method: str,
+        path: str,
+        priority: int = REQUEST_PRIORITY['ACCOUNT'],
+        with_auth: bool = True,
+        **kwargs
+    ) -> requests.Response:
+        """
+        Send a rate limited request to the Capital.com REST API
+        
+        Args:
+            method: HTTP method
+            path: Endpoint path starting with /api/v1
+            priority: Request priority class from REQUEST_PRIORITY
+            with_auth: Whether to include session tokens
+            **kwargs: Extra arguments passed to requests (params, json, ...)
+        """
+        url = f"{self.base_url}{path}"
+        reauthenticated = False
+        
+        for attempt in range(self.max_retries + 1):
+            self.rate_limiter.acquire(priority)
+            used_cst = self.cst
+            response = requests.request(method, url, headers=self._headers(with_auth=with_auth), **kwargs)
+            
+            # Expired session: refresh tokens once and replay the request
+            if (response.status_code == 401 and with_auth and not reauthenticated
+                    and self.session_manager is not None):
+                reauthenticated = True
+                if self.session_manager.reauthenticate(used_cst):
+                    self.rate_limiter.acquire(priority)
+                    response = requests.request(method, url, headers=self._headers(with_auth=with_auth), **kwargs)
+            
+            if response.status_code != 429 or attempt == self.max_retries:
+                return response
+            
+            retry_after = self._parse_retry_after(response)
+            print(colored(f"⏳ Rate limited by Capital.com, retrying in {retry_after:.1f}s", "yellow"))
+            self.rate_limiter.penalize(retry_after, priority)
+        
+        return response
+
+    def get_rate_limit_metrics(self) -> Dict[str, Dict[str, float]]:
+        """Get queue wait statistics per request priority class"""
+        return self.rate_limiter.get_metrics()
+
+    def invalidate_cache(self, *categories: str):
+        """Drop cached responses (e.g. 'positions', 'accounts') after state changes"""
+        self.cache.invalidate(*categories)
+
+    def _fetch_market(self, epic: str, priority: int) -> Dict:
+        """Fetch /markets/{epic} through the response cache"""
+        def fetch():
+            response = self._request('GET', f"/api/v1/markets/{epic}", priority=priority)
+            return response.json() if response.status_code == 200 else None
+        
+        return self.cache.get_or_fetch(('markets', epic), fetch)
+
+    def ping(self) -> int:
+        """Keep the current session alive and return the response status code"""
+        response = self._request('GET', "/api/v1/ping")
+        return response.status_code
+
     def create_session(self) -> bool:
         """Create a new trading session"""
-        endpoint = f"{self.base_url}/api/v1/session"
-        
         payload = {
             "identifier": self.identifier,
             "password": self.password,
@@ -56,9 +149,11 @@ class CapitalAPI:
         }
         
         try:
-            response = requests.post(
-                endpoint,
-                headers=self._headers(with_auth=False),
+            response = self._request(
+                'POST',
+                "/api/v1/session",
+                priority=REQUEST_PRIORITY['ORDER'],
+                with_auth=False,
                 json=payload
             )
             
@@ -93,166 +188,73 @@ class CapitalAPI:
             print(colored(f"❌ Error updating account info: {e}", "red"))
             return False
 
-    def get_market_info(self, epic: str) -> Dict:
+    def get_market_info(self, epic: str, priority: int = REQUEST_PRIORITY['ACCOUNT']) -> Dict:
         """Get market information for a specific instrument"""
-        endpoint = f"{self.base_url}/api/v1/markets/{epic}"
-        
-        response = requests.get(
-            endpoint,
-            headers=self._headers()
-        )
-        
-        return response.json() if response.status_code == 200 else None
+        return self._fetch_market(epic, priority)
 
     def get_positions(self) -> List[Dict]:
         """Get all open positions"""
-        endpoint = f"{self.base_url}/api/v1/positions"
+        def fetch():
+            response = self._request('GET', "/api/v1/positions")
+            return response.json().get('positions', []) if response.status_code == 200 else None
         
-        response = requests.get(
-            endpoint,
-            headers=self._headers()
-        )
+        positions = self.cache.get_or_fetch(('positions',), fetch)
+        return positions if positions is not None else []
+
+    def validate_order(self, direction: str, price: float, stop_level: float = None, profit_level: float = None) -> Optional[str]:
+        """Check stop and profit levels against the current price, returns the error or None"""
+        if stop_level:
+            # Validate stop loss distance
+            if direction == 'BUY' and stop_level >= price:
+                return "Stop loss must be below current price for long positions"
+            if direction == 'SELL' and stop_level <= price:
+                return "Stop loss must be above current price for short positions"
         
-        return response.json().get('positions', []) if response.status_code == 200 else []
+        if profit_level:
+            # Validate take profit distance
+            if direction == 'BUY' and profit_level <= price:
+                return "Take profit must be above current price for long positions"
+            if direction == 'SELL' and profit_level >= price:
+                return "Take profit must be below current price for short positions"
+        return None
 
-    def create_position(self, epic: str, direction: str, size: float, stop_level: float = None, profit_level: float = None) -> Dict:
-        """Create a new position with Capital.com API"""
-        try:
-            # Format the position size to 2 decimal places
-            size = round(size, 2)
-            
-            # Validate position size
-            if size < 0.01:
-                print("❌ Position size too small (minimum 0.01)")
-                return None
-                
-            # Validate stop loss and take profit levels
-            current_price = self.get_market_info(epic).get('snapshot', {}).get('bid', 0)
-            if current_price == 0:
-                print("❌ Could not get current market price")
-                return None
-                
-            if stop_level:
-                # Validate stop loss distance
-                if direction == 'BUY':
-                    if stop_level >= current_price:
-                        print("❌ Stop loss must be below current price for long positions")
-                        return None
-                else:  # SELL
-                    if stop_level <= current_price:
-                        print("❌ Stop loss must be above current price for short positions")
-                        return None
-                        
-            if profit_level:
-                # Validate take profit distance
-                if direction == 'BUY':
-                    if profit_level <= current_price:
-                        print("❌ Take profit must be above current price for long positions")
-                        return None
-                else:  # SELL
-                    if profit_level >= current_price:
-                        print("❌ Take profit must be below current price for short positions")
-                        return None
-            
-            # Prepare the payload
-            payload = {
-                "epic": epic,
-                "direction": direction,
-                "size": 0.005, #size,
-                "guaranteedStop": False,
-                "forceOpen": True
-            }
-            
-            # Add stop loss if provided
-            if stop_level:
-                payload["stopLevel"] = round(stop_level, 2)
-                
-            # Add take profit if provided
-            if profit_level:
-                payload["profitLevel"] = round(profit_level, 2)
-            
-            # Print trying to open position
-            print(f"🚀 Trying to open {direction} position with size {size} at {current_price}")
-            
-            # Make the request with correct endpoint
-            response = requests.post(
-                f"{self.base_url}/api/v1/positions",
-                headers=self._headers(),
-                json=payload
-            )
-            
-            # Log the status code with color
-            print(f"Response status: {colored(response.status_code, 'green' if response.status_code == 200 else 'red')}")
+    def _position_payload(self, epic: str, direction: str, size: float, stop_level: float = None, profit_level: float = None) -> Dict:
+        """Build the /positions order body"""
+        payload = {
+            "epic": epic,
+            "direction": direction,
+            "size": 0.005, #size,
+            "guaranteedStop": False,
+            "forceOpen": True
+        }
+        
+        # Add stop loss if provided
+        if stop_level:
+            payload["stopLevel"] = round(stop_level, 2)
             
-            if response.status_code == 200:
-                position_data = response.json()
-                deal_reference = position_data.get('dealReference')
-                
-                if deal_reference:
-                    # Wait for position confirmation
-                    confirmed = self.wait_for_position_confirmation(deal_reference)
-                    if confirmed:
-                        print(f"✅ Position created successfully with deal reference: {deal_reference}")
-                        return position_data
-                    else:
-                        print("❌ Position creation not confirmed")
-                        return None
-                else:
-                    print("❌ No deal reference in response")
-                    return None
-            else:
-                print(f"❌ Failed to create position. Status code: {response.status_code}")
-                print(f"Error response: {response.text}")
-                return None
-                
-        except Exception as e:
-            print(f"❌ Error creating position: {e}")
-            return None
+        # Add take profit if provided
+        if profit_level:
+            payload["profitLevel"] = round(profit_level, 2)
+        return payload
 
-    def wait_for_position_confirmation(self, deal_reference: str, max_attempts: int = 2, delay: float = 1.0) -> bool:
-        """Wait for position confirmation from Capital.com API"""
-        for attempt in range(max_attempts):
-            try:
-                response = requests.get(
-                    f"{self.base_url}/api/v1/confirms/{deal_reference}",
-                    headers=self._headers()
-                )
-                
-                if response.status_code == 200:
-                    confirm_data = response.json()
-                    status = confirm_data.get('status')
-                    
-                    if status == 'OPEN':
-                        print(f"✅ Position confirmed: {deal_reference}")
-                        return True
-                    elif status == 'REJECTED':
-                        print(f"❌ Position rejected: {deal_reference}")
-                        print(f"Reason: {confirm_data.get('reason', 'No reason provided')}")
-                        return False
-                    elif status == 'DELETED':
-                        print(f"❌ Position deleted: {deal_reference}")
-                        return False
-                    else:
-                        print(f"⏳ Waiting for position confirmation... Status: {status}")
-                
-                # Wait before next attempt
-                time.sleep(delay)
-                
-            except Exception as e:
-                print(f"Error checking position confirmation: {e}")
-                time.sleep(delay)
-        
-        print(f"❌ Position confirmation timeout for deal reference: {deal_reference}")
-        return False
+    def submit_position(self, epic: str, direction: str, size: float, stop_level: float = None, profit_level: float = None) -> requests.Response:
+        """Post a market order without waiting for its confirmation"""
+        return self._request(
+            'POST',
+            "/api/v1/positions",
+            priority=REQUEST_PRIORITY['ORDER'],
+            json=self._position_payload(epic, direction, size, stop_level, profit_level)
+        )
+
+    def get_confirm(self, deal_reference: str) -> Optional[Dict]:
+        """Get the deal confirmation of a deal reference, None while it is not available"""
+        response = self._request('GET', f"/api/v1/confirms/{deal_reference}", priority=REQUEST_PRIORITY['ORDER'])
+        return response.json() if response.status_code == 200 else None
 
     def close_position(self, dealId: str) -> Dict:
         """Close a specific position"""
-        endpoint = f"{self.base_url}/api/v1/positions/{dealId}"
-        
-        response = requests.delete(
-            endpoint,
-            headers=self._headers()
-        )
+        response = self._request('DELETE', f"/api/v1/positions/{dealId}", priority=REQUEST_PRIORITY['ORDER'])
+        self.invalidate_cache('positions', 'accounts')
         
         return response.json() if response.status_code == 200 else None
 
@@ -262,7 +264,9 @@ class CapitalAPI:
         resolution: str = 'MINUTE',
         from_date: Optional[str] = None,
         to_date: Optional[str] = None,
-        max_bars: int = 1000
+        max_bars: int = 1000,
+        priority: int = REQUEST_PRIORITY['HISTORY'],
+        decode: Optional[str] = None
     ) -> Dict:
         """
         Get historical price data
@@ -273,9 +277,10 @@ class CapitalAPI:
             from_date: Start date in ISO format (YYYY-MM-DDTHH:mm:ss)
             to_date: End date in ISO format (YYYY-MM-DDTHH:mm:ss)
             max_bars: Maximum number of bars to return
+            priority: Request priority class, backfill by default
+            decode: Price side ('bid', 'ask' or 'mid') to decode the candles into
+                NumPy OHLCV columns instead of returning the raw JSON payload
         """
-        endpoint = f"{self.base_url}/api/v1/prices/{epic}"
-        
         params = {
             'resolution': resolution,
             'max_bars': max_bars
@@ -285,29 +290,36 @@ class CapitalAPI:
             params['from'] = from_date
         if to_date:
             params['to'] = to_date
+        
+        def fetch():
+            response = self._request('GET', f"/api/v1/prices/{epic}", priority=priority, params=params)
             
-        response = requests.get(
-            endpoint,
-            headers=self._headers(),
-            params=params
-        )
+            if response.status_code == 200:
+                if decode:
+                    return decode_price_payload(response.content, decode)
+                return response.json()
+            else:
+                print(f"Error getting price history: {response.status_code}")
+                print(f"Response: {response.text}")
+                return None
         
-        if response.status_code == 200:
-            return response.json()
-        else:
-            print(f"Error getting price history: {response.status_code}")
-            print(f"Response: {response.text}")
-            return None
+        # Only the latest bars are cached, explicit date ranges are backfill
+        if from_date or to_date:
+            return fetch()
+        return self.cache.get_or_fetch(('prices', epic, resolution, max_bars, decode), fetch)
 
     def get_account_info(self) -> Dict:
         """Get account information and balance"""
-        endpoint = f"{self.base_url}/api/v1/accounts"
-        
         try:
-            response = requests.get(
-                endpoint,
-                headers=self._headers()
-            )
+            return self.cache.get_or_fetch(('accounts',), self._fetch_account_info)
+        except Exception as e:
+            print(colored(f"❌ Error getting account info: {e}", "red"))
+            return None
+
+    def _fetch_account_info(self) -> Dict:
+        """Fetch account information from /accounts"""
+        try:
+            response = self._request('GET', "/api/v1/accounts")
             
             if response.status_code == 200:
                 data = response.json()
@@ -334,11 +346,4 @@ class CapitalAPI:
 
     def get_market_details(self, epic: str) -> Dict:
         """Get detailed market information for a specific instrument"""
-        endpoint = f"{self.base_url}/api/v1/markets/{epic}"
-        
-        response = requests.get(
-            endpoint,
-            headers=self._headers()
-        )
-        
-        return response.json() if response.status_code == 200 else None
+        return self._fetch_market(epic, REQUEST_PRIORITY['ACCOUNT'])
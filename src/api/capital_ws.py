@@ -1,34 +1,138 @@
+import os
 import websockets
 import json
 import asyncio
+import random
 import time
-from typing import Dict, Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Callable, List, Optional, Union
 from datetime import datetime
 from termcolor import colored
+from src.api.quote_queue import LatestQuoteQueue
+from src.api.tick_recorder import TickRecorder
+from src.utils.config import WEBSOCKET_CONFIG
 
 class CapitalWebSocket:
     def __init__(self, cst: str, security_token: str):
-        self.ws_url = "wss://api-streaming-capital.backend-capital.com/connect"
+        self.ws_url = os.getenv('CAPITAL_WS_URL', "wss://api-streaming-capital.backend-capital.com/connect")
         self.cst = cst
         self.security_token = security_token
         self.websocket = None
         self.last_ping_time = None
-        self.ping_interval = 540  # 9 minutes in seconds
+        self.ping_interval = WEBSOCKET_CONFIG['ping_interval']
+        self.watchdog_timeout = WEBSOCKET_CONFIG['watchdog_timeout']
+        self.last_receive_time = None  # Monotonic time of the last message, used by the watchdog
         self.on_quote_callback = None
+        self.on_disconnect_callback = None
+        self.on_reconnect_callback = None
+        self.disconnected_at = None  # Epoch seconds when the current outage started
+        self.last_outage = None      # (disconnected_at, reconnected_at) of the last outage
+        self.reconnect_task = None
         self.is_connected = False
         self.correlation_id = 1
         self.message_count = 0
         self.last_message_time = None
         self.connection_time = None
         self.subscription_status = {}
+        self.ohlc_subscriptions: Dict[str, Dict] = {}  # Epic -> resolutions and status of OHLC bar streams
+        self.ohlc_bar_type = WEBSOCKET_CONFIG['ohlc_bar_type']
+        self.quote_handlers: Dict[str, Callable[[Dict], None]] = {}
+        self.bar_handlers: Dict[str, Callable[[Dict], None]] = {}
+        self.epic_stats: Dict[str, Dict[str, float]] = {}
+        self.max_epics_per_message = WEBSOCKET_CONFIG['max_epics_per_message']
+        self.max_subscribed_epics = WEBSOCKET_CONFIG['max_subscribed_epics']
+        self.subscription_interval = WEBSOCKET_CONFIG['subscription_interval']
         self.connection_attempts = 0
         self.max_retries = 5
-        self.retry_delay = 5  # seconds
+        self.reconnect_base_delay = WEBSOCKET_CONFIG['reconnect_base_delay']
+        self.reconnect_max_delay = WEBSOCKET_CONFIG['reconnect_max_delay']
+        
+        # Quotes are handed to per-epic consumers so the socket is never blocked
+        self.quote_queue = LatestQuoteQueue(max_epics=WEBSOCKET_CONFIG['quote_queue_max_epics'])
+        self.quote_consumers: Dict[str, asyncio.Task] = {}
+        self.quote_executor = ThreadPoolExecutor(
+            max_workers=WEBSOCKET_CONFIG['quote_workers'],
+            thread_name_prefix="quote-worker"
+        )
+        
+        # Every received quote is kept for replay and profiling when recording is enabled
+        self.tick_recorder = None
+        if WEBSOCKET_CONFIG['record_ticks']:
+            self.tick_recorder = TickRecorder(
+                WEBSOCKET_CONFIG['tick_directory'],
+                buffer_size=WEBSOCKET_CONFIG['tick_buffer_size'],
+                flush_interval=WEBSOCKET_CONFIG['tick_flush_interval']
+            )
 
     def set_quote_callback(self, callback: Callable[[Dict], None]):
-        """Set callback function for quote updates"""
+        """Set callback function for quote updates of epics without their own handler"""
         self.on_quote_callback = callback
 
+    def add_quote_handler(self, epic: str, handler: Callable[[Dict], None]):
+        """Route quote updates of an epic to its own handler"""
+        self.quote_handlers[epic] = handler
+
+    def remove_quote_handler(self, epic: str):
+        """Stop routing quote updates of an epic to its handler"""
+        self.quote_handlers.pop(epic, None)
+
+    def add_bar_handler(self, epic: str, handler: Callable[[Dict], None]):
+        """Route streamed OHLC bars of an epic to a handler, called on the receive loop so it must not block"""
+        self.bar_handlers[epic] = handler
+
+    def remove_bar_handler(self, epic: str):
+        """Stop routing streamed OHLC bars of an epic to its handler"""
+        self.bar_handlers.pop(epic, None)
+
+    def set_connection_callbacks(
+        self,
+        on_disconnect: Optional[Callable[[float], None]] = None,
+        on_reconnect: Optional[Callable[[List[str], float, float], None]] = None
+    ):
+        """
+        Set callbacks for connection outages
+        
+        Args:
+            on_disconnect: Called with the outage start time as soon as the connection drops
+            on_reconnect: Called in a worker thread with (epics, disconnected_at, reconnected_at)
+                after resubscribing, to backfill data missed during the outage
+        """
+        self.on_disconnect_callback = on_disconnect
+        self.on_reconnect_callback = on_reconnect
+
+    def _mark_disconnected(self):
+        """Record the start of an outage and notify the disconnect callback once"""
+        self.is_connected = False
+        if self.disconnected_at is not None:
+            return
+        self.disconnected_at = time.time()
+        if self.on_disconnect_callback:
+            try:
+                self.on_disconnect_callback(self.disconnected_at)
+            except Exception as e:
+                print(colored(f"❌ Error in disconnect callback: {e}", "red"))
+
+    async def _run_reconnect_callback(self, epics: List[str], disconnected_at: float, reconnected_at: float):
+        """Run the reconnect callback without blocking the receive loop"""
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(
+                self.quote_executor, self.on_reconnect_callback, epics, disconnected_at, reconnected_at
+            )
+        except Exception as e:
+            print(colored(f"❌ Error in reconnect callback: {e}", "red"))
+
+    def update_tokens(self, cst: str, security_token: str):
+        """Use refreshed session tokens for all following messages"""
+        self.cst = cst
+        self.security_token = security_token
+        print(colored("🔑 WebSocket session tokens updated", "green"))
+
+    def _backoff_delay(self, attempt: int) -> float:
+        """Exponential backoff with jitter for the given failed attempt number"""
+        delay = min(self.reconnect_max_delay, self.reconnect_base_delay * 2 ** max(0, attempt - 1))
+        return delay / 2 + random.uniform(0, delay / 2)
+
     async def connect_with_retry(self):
         """Attempt to connect with retries"""
         while self.connection_attempts < self.max_retries:
@@ -46,6 +150,7 @@ class CapitalWebSocket:
                 
                 self.is_connected = True
                 self.last_ping_time = time.time()
+                self.last_receive_time = time.monotonic()
                 self.connection_time = datetime.now()
                 self.connection_attempts = 0  # Reset counter on successful connection
                 
@@ -57,8 +162,9 @@ class CapitalWebSocket:
                 print(colored(f"❌ Connection attempt {self.connection_attempts} failed: {str(e)}", "red"))
                 
                 if self.connection_attempts < self.max_retries:
-                    print(colored(f"Retrying in {self.retry_delay} seconds...", "yellow"))
-                    await asyncio.sleep(self.retry_delay)
+                    delay = self._backoff_delay(self.connection_attempts)
+                    print(colored(f"Retrying in {delay:.1f} seconds...", "yellow"))
+                    await asyncio.sleep(delay)
                 else:
                     print(colored("❌ Maximum connection attempts reached", "red"))
                     return False
@@ -68,7 +174,7 @@ class CapitalWebSocket:
     async def reconnect(self):
         """Handle reconnection"""
         print(colored("\n🔄 Attempting to reconnect...", "yellow"))
-        self.is_connected = False
+        self._mark_disconnected()
         
         if self.websocket:
             try:
@@ -81,85 +187,333 @@ class CapitalWebSocket:
         
         # Try to reconnect
         if await self.connect_with_retry():
-            # Resubscribe to all active subscriptions
-            for epic in self.subscription_status.keys():
-                await self.subscribe_market_data(epic)
+            # Resubscribe to all active subscriptions in batches
+            epics = list(self.subscription_status.keys())
+            await self.subscribe_market_data(epics)
+            await self._resubscribe_ohlc()
+            
+            self.last_outage = (self.disconnected_at, time.time())
+            self.disconnected_at = None
+            print(colored(f"🕳️ Outage of {self.last_outage[1] - self.last_outage[0]:.1f}s recorded", "yellow"))
+            if self.on_reconnect_callback:
+                self.reconnect_task = asyncio.create_task(self._run_reconnect_callback(epics, *self.last_outage))
             return True
         return False
 
-    async def subscribe_market_data(self, epic: str):
-        """Subscribe to market data for a specific epic"""
+    async def _send_epics(self, destination: str, epics: List[str], payload: Optional[Dict] = None):
+        """Send epics to a subscription destination, max_epics_per_message at a time"""
+        for start in range(0, len(epics), self.max_epics_per_message):
+            if start > 0:
+                await asyncio.sleep(self.subscription_interval)
+            message = {
+                "destination": destination,
+                "correlationId": str(self.correlation_id),
+                "cst": self.cst,
+                "securityToken": self.security_token,
+                "payload": {
+                    "epics": epics[start:start + self.max_epics_per_message],
+                    **(payload or {})
+                }
+            }
+            await self.websocket.send(json.dumps(message))
+            self.correlation_id += 1
+
+    async def subscribe_market_data(self, epics: Union[str, List[str]]):
+        """Subscribe to market data for one or many epics"""
         if not self.is_connected:
             print(colored("❌ Cannot subscribe: WebSocket not connected", "red"))
             return False
-
-        subscribe_message = {
-            "destination": "marketData.subscribe",
-            "correlationId": str(self.correlation_id),
-            "cst": self.cst,
-            "securityToken": self.security_token,
-            "payload": {
-                "epics": [epic]
-            }
-        }
+        
+        epics = [epics] if isinstance(epics, str) else list(dict.fromkeys(epics))
+        new_epics = [epic for epic in epics if epic not in self.subscription_status]
+        if len(self.subscription_status) + len(new_epics) > self.max_subscribed_epics:
+            print(colored(f"❌ Cannot subscribe: limit of {self.max_subscribed_epics} epics reached", "red"))
+            return False
         
         try:
-            print(colored(f"\n📡 Subscribing to {epic}...", "cyan"))
-            await self.websocket.send(json.dumps(subscribe_message))
-            self.correlation_id += 1
-            self.subscription_status[epic] = {
-                "subscribed_at": datetime.now(),
-                "status": "pending",
-                "retry_count": 0
-            }
-            print(colored(f"✅ Subscription request sent for {epic}", "green"))
+            print(colored(f"\n📡 Subscribing to {', '.join(epics)}...", "cyan"))
+            await self._send_epics("marketData.subscribe", epics)
+            for epic in epics:
+                self.subscription_status[epic] = {
+                    "subscribed_at": datetime.now(),
+                    "status": "pending",
+                    "retry_count": 0
+                }
+            print(colored(f"✅ Subscription request sent for {len(epics)} epic(s)", "green"))
             return True
         except Exception as e:
             print(colored(f"❌ Error subscribing to market data: {e}", "red"))
             return False
 
+    async def unsubscribe_market_data(self, epics: Union[str, List[str]]):
+        """Unsubscribe from market data for one or many epics"""
+        epics = [epics] if isinstance(epics, str) else list(epics)
+        for epic in epics:
+            self.subscription_status.pop(epic, None)
+        
+        if not self.is_connected:
+            return True
+        
+        try:
+            await self._send_epics("marketData.unsubscribe", epics)
+            print(colored(f"✅ Unsubscribed from {', '.join(epics)}", "green"))
+            return True
+        except Exception as e:
+            print(colored(f"❌ Error unsubscribing from market data: {e}", "red"))
+            return False
+
+    async def subscribe_ohlc(self, epics: Union[str, List[str]], resolutions: List[str]):
+        """
+        Subscribe to OHLC bars pushed by the broker
+        
+        Args:
+            epics: One or many epics
+            resolutions: Bar resolutions such as MINUTE_5 or HOUR
+        """
+        if not self.is_connected:
+            print(colored("❌ Cannot subscribe to bars: WebSocket not connected", "red"))
+            return False
+        
+        epics = [epics] if isinstance(epics, str) else list(dict.fromkeys(epics))
+        new_epics = [epic for epic in epics if epic not in self.ohlc_subscriptions]
+        if len(self.ohlc_subscriptions) + len(new_epics) > self.max_subscribed_epics:
+            print(colored(f"❌ Cannot subscribe to bars: limit of {self.max_subscribed_epics} epics reached", "red"))
+            return False
+        
+        try:
+            print(colored(f"\n🕯️ Subscribing to {', '.join(resolutions)} bars of {', '.join(epics)}...", "cyan"))
+            await self._send_epics(
+                "OHLCMarketData.subscribe",
+                epics,
+                {"resolutions": list(resolutions), "type": self.ohlc_bar_type}
+            )
+            for epic in epics:
+                subscription = self.ohlc_subscriptions.setdefault(epic, {"resolutions": set(), "subscribed_at": datetime.now()})
+                subscription["resolutions"].update(resolutions)
+                subscription["status"] = "pending"
+            print(colored(f"✅ Bar subscription request sent for {len(epics)} epic(s)", "green"))
+            return True
+        except Exception as e:
+            print(colored(f"❌ Error subscribing to bars: {e}", "red"))
+            return False
+
+    async def unsubscribe_ohlc(self, epics: Union[str, List[str]]):
+        """Unsubscribe from all OHLC bar streams of one or many epics"""
+        epics = [epics] if isinstance(epics, str) else list(epics)
+        resolutions = set()
+        for epic in epics:
+            subscription = self.ohlc_subscriptions.pop(epic, None)
+            if subscription:
+                resolutions.update(subscription["resolutions"])
+        
+        if not self.is_connected or not resolutions:
+            return True
+        
+        try:
+            await self._send_epics(
+                "OHLCMarketData.unsubscribe",
+                epics,
+                {"resolutions": sorted(resolutions), "types": [self.ohlc_bar_type]}
+            )
+            print(colored(f"✅ Unsubscribed from bars of {', '.join(epics)}", "green"))
+            return True
+        except Exception as e:
+            print(colored(f"❌ Error unsubscribing from bars: {e}", "red"))
+            return False
+
+    async def _resubscribe_ohlc(self):
+        """Restore OHLC bar streams after a reconnect, one request per set of resolutions"""
+        groups: Dict[tuple, List[str]] = {}
+        for epic, subscription in self.ohlc_subscriptions.items():
+            groups.setdefault(tuple(sorted(subscription["resolutions"])), []).append(epic)
+        for resolutions, epics in groups.items():
+            await self._send_epics(
+                "OHLCMarketData.subscribe",
+                epics,
+                {"resolutions": list(resolutions), "type": self.ohlc_bar_type}
+            )
+            for epic in epics:
+                self.ohlc_subscriptions[epic]["status"] = "pending"
+
+    def _record_epic_message(self, epic: str, received_at: float):
+        """Update message count and rate statistics of an epic"""
+        stats = self.epic_stats.get(epic)
+        if stats is None:
+            stats = self.epic_stats[epic] = {
+                'messages': 0, 'first': received_at, 'last': received_at,
+                'window_start': received_at, 'window_count': 0, 'rate': 0.0
+            }
+        
+        # Messages per second over 1-second windows, exponentially smoothed
+        window = received_at - stats['window_start']
+        if window >= 1.0:
+            window_rate = stats['window_count'] / window
+            stats['rate'] = 0.7 * stats['rate'] + 0.3 * window_rate if stats['rate'] else window_rate
+            stats['window_start'] = received_at
+            stats['window_count'] = 0
+        stats['window_count'] += 1
+        stats['messages'] += 1
+        stats['last'] = received_at
+
+    def get_epic_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get message counts and rates per epic"""
+        result = {}
+        for epic, stats in self.epic_stats.items():
+            elapsed = stats['last'] - stats['first']
+            result[epic] = {
+                'messages': stats['messages'],
+                'rate': stats['rate'],
+                'average_rate': (stats['messages'] - 1) / elapsed if elapsed > 0 else 0.0
+            }
+        return result
+
     async def listen(self):
-        """Listen for WebSocket messages"""
-        while True:  # Changed to infinite loop to handle reconnections
-            try:
-                if not self.is_connected:
-                    if not await self.reconnect():
-                        print(colored("Failed to reconnect, retrying in 5 seconds...", "red"))
-                        await asyncio.sleep(5)
-                        continue
-                
-                await self.check_ping()
-                
-                try:
-                    message = await asyncio.wait_for(self.websocket.recv(), timeout=1.0)
-                    data = json.loads(message)
-                    
-                    self.message_count += 1
-                    self.last_message_time = datetime.now()
-                    
-                    if data.get("destination") == "quote" and self.on_quote_callback:
-                        epic = data["payload"].get("epic")
-                        if epic in self.subscription_status:
-                            self.subscription_status[epic]["status"] = "active"
-                            self.subscription_status[epic]["last_update"] = datetime.now()
-                        self.on_quote_callback(data["payload"])
-                    elif data.get("destination") == "marketData.subscribe":
-                        if data.get("status") == "OK":
-                            print(colored("✅ Market data subscription confirmed", "green"))
-                        else:
-                            print(colored(f"❌ Market data subscription failed: {data.get('status')}", "red"))
-                    
-                except asyncio.TimeoutError:
+        """Listen for WebSocket messages, reconnecting whenever the connection drops"""
+        while True:
+            if not self.is_connected:
+                if not await self.reconnect():
+                    delay = self._backoff_delay(self.max_retries)
+                    print(colored(f"Failed to reconnect, retrying in {delay:.1f} seconds...", "red"))
+                    await asyncio.sleep(delay)
                     continue
-                    
+            
+            heartbeat = asyncio.create_task(self._heartbeat())
+            watchdog = asyncio.create_task(self._watchdog())
+            try:
+                # Blocks without polling until a message arrives or the socket closes
+                async for message in self.websocket:
+                    self._handle_message(message)
+                print(colored("❌ WebSocket connection closed by server", "red"))
             except websockets.exceptions.ConnectionClosed as e:
                 print(colored(f"❌ WebSocket connection closed: {e}", "red"))
-                self.is_connected = False
-                continue
             except Exception as e:
                 print(colored(f"❌ Error in WebSocket listener: {e}", "red"))
-                self.is_connected = False
+            finally:
+                heartbeat.cancel()
+                watchdog.cancel()
+                self._mark_disconnected()
+
+    def _record_tick(self, epic: str, payload: Dict, received_at: float):
+        """Record a quote, recording failures never reach the receive loop"""
+        try:
+            self.tick_recorder.record(epic, payload["bid"], payload["ofr"], payload["timestamp"], received_at)
+        except OSError as e:
+            # A full disk or failed rotation will not recover on its own, stop recording
+            print(colored(f"❌ Tick recording failed, recorder disabled: {e}", "red"))
+            recorder, self.tick_recorder = self.tick_recorder, None
+            try:
+                recorder.close()
+            except OSError:
+                pass
+        except Exception as e:
+            print(colored(f"❌ Error recording quote for {epic}: {e}", "red"))
+
+    def _handle_message(self, message: str):
+        """Dispatch a single streaming message"""
+        received_at = time.time()
+        self.last_receive_time = time.monotonic()
+        data = json.loads(message)
+        
+        self.message_count += 1
+        self.last_message_time = datetime.now()
+        
+        destination = data.get("destination")
+        if destination == "quote":
+            payload = data["payload"]
+            epic = payload.get("epic")
+            if self.tick_recorder:
+                self._record_tick(epic, payload, received_at)
+            self._record_epic_message(epic, received_at)
+            if epic in self.subscription_status:
+                self.subscription_status[epic]["status"] = "active"
+                self.subscription_status[epic]["last_update"] = self.last_message_time
+            if epic in self.quote_handlers or self.on_quote_callback:
+                if self.quote_queue.put(epic, payload, received_at):
+                    self._ensure_quote_consumer(epic)
+        elif destination == "ohlc.event":
+            payload = data["payload"]
+            epic = payload.get("epic")
+            subscription = self.ohlc_subscriptions.get(epic)
+            if subscription is not None:
+                subscription["status"] = "active"
+                subscription["last_update"] = self.last_message_time
+            handler = self.bar_handlers.get(epic)
+            if handler:
+                try:
+                    handler(payload)
+                except Exception as e:
+                    print(colored(f"❌ Error processing bar for {epic}: {e}", "red"))
+        elif destination == "OHLCMarketData.subscribe":
+            if data.get("status") == "OK":
+                subscriptions = data.get("payload", {}).get("subscriptions", {})
+                for key, result in subscriptions.items():
+                    # Keys look like EPIC:RESOLUTION:TYPE
+                    subscription = self.ohlc_subscriptions.get(key.split(":")[0])
+                    if subscription is not None and subscription["status"] == "pending":
+                        subscription["status"] = "confirmed" if result == "PROCESSED" else result
+                print(colored(f"✅ Bar subscription confirmed ({len(subscriptions)} stream(s))", "green"))
+            else:
+                print(colored(f"❌ Bar subscription failed: {data.get('status')}", "red"))
+        elif destination == "marketData.subscribe":
+            if data.get("status") == "OK":
+                subscriptions = data.get("payload", {}).get("subscriptions", {})
+                for epic, result in subscriptions.items():
+                    if epic in self.subscription_status and self.subscription_status[epic]["status"] == "pending":
+                        self.subscription_status[epic]["status"] = "confirmed" if result == "PROCESSED" else result
+                print(colored(f"✅ Market data subscription confirmed ({len(subscriptions)} epic(s))", "green"))
+            else:
+                print(colored(f"❌ Market data subscription failed: {data.get('status')}", "red"))
+
+    async def _heartbeat(self):
+        """Send a ping every ping_interval seconds"""
+        while True:
+            elapsed = time.time() - (self.last_ping_time or 0)
+            await asyncio.sleep(max(0.0, self.ping_interval - elapsed))
+            await self.check_ping()
+
+    async def _watchdog(self):
+        """Drop the connection when no data arrives for watchdog_timeout seconds"""
+        probed = False
+        while True:
+            silence = time.monotonic() - self.last_receive_time
+            if silence >= self.watchdog_timeout:
+                print(colored(f"⚠️ No data for {silence:.0f}s, dropping dead connection", "yellow"))
+                await self.websocket.close()
+                return
+            
+            # Probe a quiet connection halfway through the timeout, a live one answers the ping
+            if silence >= self.watchdog_timeout / 2 and not probed:
+                probed = True
+                await self.ping()
+            elif silence < self.watchdog_timeout / 2:
+                probed = False
+            
+            await asyncio.sleep(min(self.watchdog_timeout - silence, self.watchdog_timeout / 2))
+
+    def _ensure_quote_consumer(self, epic: str):
+        """Start the consumer task for an epic if it is not running"""
+        task = self.quote_consumers.get(epic)
+        if task is None or task.done():
+            self.quote_consumers[epic] = asyncio.create_task(self._consume_quotes(epic))
+
+    async def _consume_quotes(self, epic: str):
+        """Process the freshest quote of an epic, one at a time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            payload, received_at = await self.quote_queue.get(epic)
+            handler = self.quote_handlers.get(epic, self.on_quote_callback)
+            if handler is None:
                 continue
+            # Lets handlers measure latency from socket receipt
+            payload['receivedAt'] = received_at
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(payload)
+                else:
+                    # Blocking handlers (REST calls, model inference) run in worker threads
+                    await loop.run_in_executor(self.quote_executor, handler, payload)
+            except Exception as e:
+                print(colored(f"❌ Error processing quote for {epic}: {e}", "red"))
 
     def print_status(self):
         """Print current WebSocket status"""
@@ -194,7 +548,24 @@ class CapitalWebSocket:
                 last_update = data.get("last_update", "Never")
                 if isinstance(last_update, datetime):
                     last_update = last_update.strftime('%H:%M:%S')
-                print(f"{epic}: {status} (since {subscribed_at.strftime('%H:%M:%S')}, last update: {last_update})")
+                rate = self.epic_stats.get(epic, {}).get('rate', 0.0)
+                print(f"{epic}: {status} (since {subscribed_at.strftime('%H:%M:%S')}, last update: {last_update}, {rate:.1f} msg/s)")
+        
+        if self.ohlc_subscriptions:
+            print("\nBar Streams:")
+            for epic, data in self.ohlc_subscriptions.items():
+                last_update = data.get("last_update", "Never")
+                if isinstance(last_update, datetime):
+                    last_update = last_update.strftime('%H:%M:%S')
+                print(f"{epic} {', '.join(sorted(data['resolutions']))}: {data['status']} (last update: {last_update})")
+        
+        queue_stats = self.quote_queue.get_stats()
+        if queue_stats:
+            print(f"\nQuote Queue (depth {self.quote_queue.depth()}):")
+            for epic, stats in queue_stats.items():
+                print(f"{epic}: processed {stats['processed']}/{stats['received']}, "
+                      f"coalesced {stats['coalesced']}, dropped {stats['dropped']}, "
+                      f"lag avg {stats['avg_lag'] * 1000:.1f}ms max {stats['max_lag'] * 1000:.1f}ms")
 
     async def ping(self):
         """Send ping message to keep connection alive"""
@@ -225,6 +596,13 @@ class CapitalWebSocket:
 
     async def close(self):
         """Close WebSocket connection"""
+        for task in self.quote_consumers.values():
+            task.cancel()
+        self.quote_consumers.clear()
+        self.quote_executor.shutdown(wait=False)
+        if self.tick_recorder:
+            self.tick_recorder.close()
+        
         if self.websocket:
             try:
                 await self.websocket.close()
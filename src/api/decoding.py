@@ -0,0 +1,70 @@
+import json
+import numpy as np
+from typing import Dict, List, Union
+
+try:
+    import orjson
+except ImportError:  # Optional faster JSON parser
+    orjson = None
+
+PRICE_SIDES = ('bid', 'ask', 'mid')
+OHLC_FIELDS = {
+    'open': 'openPrice',
+    'high': 'highPrice',
+    'low': 'lowPrice',
+    'close': 'closePrice'
+}
+
+
+def loads(raw: Union[bytes, str]) -> Dict:
+    """Parse a JSON response body, using orjson when it is installed"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def decode_prices(prices: List[Dict], side: str = 'bid') -> Dict[str, np.ndarray]:
+    """
+    Decode a /prices payload into NumPy OHLCV columns
+
+    Args:
+        prices: The 'prices' list of a Capital.com price history response
+        side: Price side to extract ('bid', 'ask' or 'mid')
+
+    Returns:
+        Dict with 'timestamp' (datetime64[ms], UTC), 'open', 'high', 'low', 'close'
+        and 'volume' (float64) arrays, one element per candle
+    """
+    if side not in PRICE_SIDES:
+        raise ValueError(f"Invalid price side: {side}. Expected one of {PRICE_SIDES}")
+
+    count = len(prices)
+    columns = {
+        # Timestamp strings are parsed in one vectorized pass. snapshotTime is in
+        # the account's local time, quotes and streamed bars are UTC
+        'timestamp': np.array([candle.get('snapshotTimeUTC') or candle['snapshotTime'] for candle in prices],
+                              dtype='datetime64[ms]')
+    }
+
+    for column, field in OHLC_FIELDS.items():
+        if side == 'mid':
+            bid = np.fromiter((candle[field]['bid'] for candle in prices), dtype=np.float64, count=count)
+            ask = np.fromiter((candle[field]['ask'] for candle in prices), dtype=np.float64, count=count)
+            values = bid
+            values += ask
+            values *= 0.5
+        else:
+            values = np.fromiter((candle[field][side] for candle in prices), dtype=np.float64, count=count)
+        columns[column] = values
+
+    columns['volume'] = np.fromiter(
+        (candle.get('lastTradedVolume', 0) for candle in prices),
+        dtype=np.float64,
+        count=count
+    )
+    return columns
+
+
+def decode_price_payload(raw: Union[bytes, str], side: str = 'bid') -> Dict[str, np.ndarray]:
+    """Parse a raw /prices response body straight into NumPy OHLCV columns"""
+    return decode_prices(loads(raw).get('prices', []), side)
@@ -0,0 +1,273 @@
+import time
+import asyncio
+import threading
+import concurrent.futures
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from termcolor import colored
+
+from src.api.rate_limiter import REQUEST_PRIORITY
+from src.utils.latency import LatencyTrace
+
+# Order lifecycle: CREATED -> VALIDATED -> SUBMITTED -> one of FINAL_STATES
+ORDER_STATES = (
+    'CREATED',    # Accepted by the manager
+    'VALIDATED',  # Levels checked against the last quote
+    'SUBMITTED',  # Broker returned a deal reference
+    'CONFIRMED',  # Deal accepted (position opened or closed)
+    'REJECTED',   # Refused by validation or the broker
+    'FAILED',     # Request error
+    'TIMEOUT'     # No final confirmation in time
+)
+FINAL_STATES = ('CONFIRMED', 'REJECTED', 'FAILED', 'TIMEOUT')
+MAX_KEPT_ORDERS = 1000
+
+
+@dataclass
+class Order:
+    order_id: int
+    action: str  # 'OPEN' or 'CLOSE'
+    epic: Optional[str] = None
+    direction: Optional[str] = None
+    size: float = 0.0
+    stop_level: Optional[float] = None
+    profit_level: Optional[float] = None
+    deal_id: Optional[str] = None
+    deal_reference: Optional[str] = None
+    confirm: Optional[Dict] = None
+    error: Optional[str] = None
+    states: List[Tuple[str, float]] = field(default_factory=list)
+    future: Optional[concurrent.futures.Future] = None  # Resolves to the order once it reaches a final state
+
+    @property
+    def state(self) -> str:
+        return self.states[-1][0] if self.states else 'CREATED'
+
+    @property
+    def done(self) -> bool:
+        return self.state in FINAL_STATES
+
+
+class OrderManager:
+    """Submits orders and confirms them concurrently on its own event loop.
+
+    Orders are validated against the last streamed quote, posted through
+    CapitalAPI in worker threads (so several orders are in flight at once)
+    and confirmed by polling /confirms without blocking (the streaming API
+    does not push deal confirmations). Each order carries a future and the
+    timestamped list of states it went through.
+    """
+
+    def __init__(self, capital_api, max_quote_age: float = 5.0, confirm_poll_interval: float = 0.2,
+                 confirm_timeout: float = 10.0, workers: int = 4):
+        """
+        Initialize OrderManager
+
+        Args:
+            capital_api: CapitalAPI instance with an active session
+            max_quote_age: Seconds a streamed quote is trusted for validation before
+                falling back to the market snapshot
+            confirm_poll_interval: Seconds between /confirms polls of one order
+            confirm_timeout: Seconds before an unconfirmed order times out
+            workers: Threads running REST calls
+        """
+        self.capital_api = capital_api
+        self.max_quote_age = max_quote_age
+        self.confirm_poll_interval = confirm_poll_interval
+        self.confirm_timeout = confirm_timeout
+
+        self.quotes: Dict[str, Dict] = {}
+        self.orders: Dict[int, Order] = {}
+        self._next_id = 1
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="order-worker")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start the background event loop"""
+        if self._thread and self._thread.is_alive():
+            return
+        ready = threading.Event()
+
+        def run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.call_soon(ready.set)
+            self._loop.run_forever()
+            self._loop.close()
+
+        self._thread = threading.Thread(target=run, name="order-manager", daemon=True)
+        self._thread.start()
+        ready.wait(timeout=5)
+
+    def stop(self):
+        """Stop the event loop and the REST workers"""
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+        self._executor.shutdown(wait=False)
+
+    def update_quote(self, epic: str, quote: Dict):
+        """Remember the last streamed quote (bid, ofr) of an epic for validation"""
+        self.quotes[epic] = {'bid': float(quote['bid']), 'ofr': float(quote['ofr']), 'time': time.time()}
+
+    def _new_order(self, action: str, **kwargs) -> Order:
+        with self._lock:
+            order = Order(order_id=self._next_id, action=action, **kwargs)
+            self._next_id += 1
+            self._set_state(order, 'CREATED')
+            self.orders[order.order_id] = order
+        return order
+
+    def _set_state(self, order: Order, state: str, error: Optional[str] = None):
+        if state not in ORDER_STATES:
+            raise ValueError(f"Invalid order state: {state}")
+        order.states.append((state, time.time()))
+        if error:
+            order.error = error
+
+    def submit_open(self, epic: str, direction: str, size: float, stop_level: float = None,
+                    profit_level: float = None, trace: Optional[LatencyTrace] = None) -> Order:
+        """
+        Submit a market order from any thread and return it right away
+
+        Args:
+            epic: Instrument to trade
+            direction: 'BUY' or 'SELL'
+            size: Position size
+            stop_level: Stop loss level
+            profit_level: Take profit level
+            trace: Latency trace marked with order_sent and confirmed
+        """
+        order = self._new_order('OPEN', epic=epic, direction=direction, size=round(size, 2),
+                                stop_level=stop_level, profit_level=profit_level)
+        order.future = asyncio.run_coroutine_threadsafe(self._run_open(order, trace), self._loop)
+        return order
+
+    def submit_close(self, deal_id: str) -> Order:
+        """Close a position from any thread and return the order right away"""
+        order = self._new_order('CLOSE', deal_id=deal_id)
+        order.future = asyncio.run_coroutine_threadsafe(self._run_close(order), self._loop)
+        return order
+
+    def close_positions(self, deal_ids: List[str]) -> List[Order]:
+        """Close several positions in parallel"""
+        return [self.submit_close(deal_id) for deal_id in deal_ids]
+
+    async def _call(self, func, *args):
+        """Run a blocking CapitalAPI call in a worker thread"""
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def _reference_price(self, epic: str, direction: str) -> Optional[float]:
+        """Price the order would fill at, from the last quote or the market snapshot"""
+        side = 'ofr' if direction == 'BUY' else 'bid'
+        quote = self.quotes.get(epic)
+        if quote and time.time() - quote['time'] <= self.max_quote_age:
+            return quote[side]
+
+        market = await self._call(self.capital_api.get_market_info, epic, REQUEST_PRIORITY['ORDER'])
+        snapshot = (market or {}).get('snapshot', {})
+        price = snapshot.get('offer' if side == 'ofr' else 'bid')
+        return float(price) if price else None
+
+    async def _run_open(self, order: Order, trace: Optional[LatencyTrace]) -> Order:
+        try:
+            if order.size < 0.01:
+                self._set_state(order, 'REJECTED', "Position size too small (minimum 0.01)")
+                return order
+
+            price = await self._reference_price(order.epic, order.direction)
+            if price is None:
+                self._set_state(order, 'FAILED', "Could not get current market price")
+                return order
+            error = self.capital_api.validate_order(order.direction, price, order.stop_level, order.profit_level)
+            if error:
+                self._set_state(order, 'REJECTED', error)
+                return order
+            self._set_state(order, 'VALIDATED')
+
+            print(f"🚀 Submitting {order.direction} order #{order.order_id} with size {order.size} at {price}")
+            response = await self._call(
+                self.capital_api.submit_position,
+                order.epic, order.direction, order.size, order.stop_level, order.profit_level
+            )
+            if trace:
+                trace.mark('order_sent')
+            if response.status_code != 200:
+                self._set_state(order, 'FAILED', f"HTTP {response.status_code}: {response.text}")
+                return order
+
+            await self._confirm(order, response.json().get('dealReference'), accepted=('OPEN', 'ACCEPTED'))
+            if trace:
+                trace.mark('confirmed')
+            if order.state == 'CONFIRMED':
+                order.deal_id = order.confirm.get('dealId')
+            return order
+        except Exception as e:
+            self._set_state(order, 'FAILED', str(e))
+            return order
+        finally:
+            self._finish(order)
+
+    async def _run_close(self, order: Order) -> Order:
+        try:
+            result = await self._call(self.capital_api.close_position, order.deal_id)
+            if not result:
+                self._set_state(order, 'FAILED', f"Close request for {order.deal_id} failed")
+                return order
+            await self._confirm(order, result.get('dealReference'), accepted=('CLOSED', 'ACCEPTED'))
+            return order
+        except Exception as e:
+            self._set_state(order, 'FAILED', str(e))
+            return order
+        finally:
+            self._finish(order)
+
+    async def _confirm(self, order: Order, deal_reference: Optional[str], accepted: Tuple[str, ...]):
+        """Poll /confirms until the deal is final"""
+        if not deal_reference:
+            self._set_state(order, 'FAILED', "No deal reference in response")
+            return
+        order.deal_reference = deal_reference
+        self._set_state(order, 'SUBMITTED')
+
+        deadline = time.monotonic() + self.confirm_timeout
+        while time.monotonic() < deadline:
+            confirm = await self._call(self.capital_api.get_confirm, deal_reference)
+
+            status = (confirm or {}).get('status')
+            if status in ('REJECTED', 'DELETED') or (confirm or {}).get('dealStatus') == 'REJECTED':
+                order.confirm = confirm
+                self._set_state(order, 'REJECTED', confirm.get('reason', status))
+                return
+            if status in accepted or (confirm or {}).get('dealStatus') == 'ACCEPTED':
+                order.confirm = confirm
+                self._set_state(order, 'CONFIRMED')
+                return
+            await asyncio.sleep(self.confirm_poll_interval)
+        self._set_state(order, 'TIMEOUT', f"No confirmation for {deal_reference}")
+
+    def _finish(self, order: Order):
+        """Log the final state and refresh cached account data"""
+        self.capital_api.invalidate_cache('positions', 'accounts')
+        with self._lock:
+            for order_id in list(self.orders)[:-MAX_KEPT_ORDERS]:
+                if self.orders[order_id].done:
+                    del self.orders[order_id]
+        if order.state == 'CONFIRMED':
+            print(colored(f"✅ {order.action} order #{order.order_id} confirmed ({order.deal_reference})", "green"))
+        else:
+            print(colored(f"❌ {order.action} order #{order.order_id} {order.state.lower()}: {order.error}", "red"))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Count orders per current state"""
+        counts: Dict[str, int] = {}
+        with self._lock:
+            orders = list(self.orders.values())
+        for order in orders:
+            counts[order.state] = counts.get(order.state, 0) + 1
+        return counts
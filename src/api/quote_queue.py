@@ -0,0 +1,92 @@
+import time
+import asyncio
+from typing import Dict, Optional, Tuple
+
+
+class LatestQuoteQueue:
+    """Bounded per-epic mailbox that only keeps the newest quote.
+
+    The WebSocket listener calls ``put`` without ever blocking; a quote that
+    arrives while the previous one for the same epic is still waiting
+    replaces it (counted as coalesced). Consumers ``await get(epic)`` and
+    always receive the freshest price. Quotes for new epics beyond
+    ``max_epics`` are dropped.
+    """
+
+    def __init__(self, max_epics: int = 100):
+        """
+        Initialize LatestQuoteQueue
+
+        Args:
+            max_epics: Maximum number of epics with a mailbox
+        """
+        self.max_epics = max_epics
+        self._pending: Dict[str, Tuple[Dict, float]] = {}
+        self._events: Dict[str, asyncio.Event] = {}
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def _epic_stats(self, epic: str) -> Dict[str, float]:
+        return self._stats.setdefault(epic, {
+            'received': 0,
+            'processed': 0,
+            'coalesced': 0,
+            'dropped': 0,
+            'last_lag': 0.0,
+            'max_lag': 0.0,
+            'total_lag': 0.0,
+            'last_quote_age': 0.0
+        })
+
+    def put(self, epic: str, payload: Dict, received_at: Optional[float] = None) -> bool:
+        """Store the quote as the latest for its epic, returns False if it was dropped"""
+        stats = self._epic_stats(epic)
+        stats['received'] += 1
+
+        if epic not in self._events:
+            if len(self._events) >= self.max_epics:
+                stats['dropped'] += 1
+                return False
+            self._events[epic] = asyncio.Event()
+
+        if epic in self._pending:
+            stats['coalesced'] += 1
+        self._pending[epic] = (payload, received_at if received_at is not None else time.time())
+        self._events[epic].set()
+        return True
+
+    async def get(self, epic: str) -> Tuple[Dict, float]:
+        """Wait for the next quote of an epic and return (payload, received_at)"""
+        if epic not in self._events:
+            self._events[epic] = asyncio.Event()
+        event = self._events[epic]
+
+        while epic not in self._pending:
+            event.clear()
+            await event.wait()
+
+        payload, received_at = self._pending.pop(epic)
+        event.clear()
+
+        # Lag between socket receipt and the start of processing
+        stats = self._epic_stats(epic)
+        lag = time.time() - received_at
+        stats['processed'] += 1
+        stats['last_lag'] = lag
+        stats['max_lag'] = max(stats['max_lag'], lag)
+        stats['total_lag'] += lag
+        if 'timestamp' in payload:
+            stats['last_quote_age'] = received_at - payload['timestamp'] / 1000
+        return payload, received_at
+
+    def depth(self) -> int:
+        """Number of epics with a quote waiting to be processed"""
+        return len(self._pending)
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        """Get received, processed, coalesced and dropped counts and lag per epic"""
+        result = {}
+        for epic, stats in self._stats.items():
+            result[epic] = dict(stats)
+            result[epic]['pending'] = 1 if epic in self._pending else 0
+            result[epic]['avg_lag'] = stats['total_lag'] / stats['processed'] if stats['processed'] else 0.0
+        return result
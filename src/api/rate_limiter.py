@@ -0,0 +1,127 @@
+import time
+import threading
+from collections import deque
+from typing import Dict, Optional
+
+# Request priority classes (lower value is served first)
+REQUEST_PRIORITY = {
+    'ORDER': 0,      # Order placement, closes and deal confirmations
+    'ACCOUNT': 1,    # Positions listings and account refreshes
+    'HISTORY': 2     # Price history backfill
+}
+
+
+class RateLimiter:
+    """Token-bucket limiter shared by all Capital.com REST calls.
+
+    Callers block in ``acquire`` until a token is available. Waiting requests
+    are queued per priority class and served FIFO inside each class, with
+    higher classes first. A request that has waited longer than
+    ``starvation_timeout`` is served next regardless of its class so history
+    backfill keeps making progress under sustained order traffic.
+    """
+
+    def __init__(self, rate: float = 10.0, burst: int = 10, starvation_timeout: float = 5.0):
+        """
+        Initialize RateLimiter
+
+        Args:
+            rate: Tokens added per second
+            burst: Maximum number of tokens the bucket can hold
+            starvation_timeout: Seconds after which a waiting request jumps the priority order
+        """
+        self.rate = rate
+        self.burst = burst
+        self.starvation_timeout = starvation_timeout
+
+        self.tokens = float(burst)
+        self.last_refill = time.monotonic()
+        self.blocked_until = 0.0
+
+        self._condition = threading.Condition()
+        self._queues = {priority: deque() for priority in REQUEST_PRIORITY.values()}
+        self._metrics = {
+            priority: {'requests': 0, 'total_wait': 0.0, 'max_wait': 0.0, 'throttled': 0}
+            for priority in REQUEST_PRIORITY.values()
+        }
+
+    def _refill(self, now: float):
+        """Add tokens accumulated since the last refill"""
+        # No tokens accrue while the API asked us to back off
+        elapsed = now - max(self.last_refill, self.blocked_until)
+        if elapsed > 0:
+            self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+            self.last_refill = now
+
+    def _next_ticket(self, now: float) -> Optional[list]:
+        """Return the ticket that should be served next"""
+        oldest = None
+        for priority in sorted(self._queues):
+            queue = self._queues[priority]
+            if queue and (oldest is None or queue[0][0] < oldest[0]):
+                oldest = queue[0]
+
+        if oldest is not None and now - oldest[0] >= self.starvation_timeout:
+            return oldest
+
+        for priority in sorted(self._queues):
+            if self._queues[priority]:
+                return self._queues[priority][0]
+        return None
+
+    def acquire(self, priority: int = REQUEST_PRIORITY['ACCOUNT']) -> float:
+        """Block until the request may be sent and return the time spent waiting"""
+        with self._condition:
+            enqueued_at = time.monotonic()
+            ticket = [enqueued_at, priority]
+            self._queues[priority].append(ticket)
+
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+
+                if self._next_ticket(now) is ticket:
+                    if now < self.blocked_until:
+                        delay = self.blocked_until - now
+                    elif self.tokens >= 1:
+                        self.tokens -= 1
+                        self._queues[priority].popleft()
+                        break
+                    else:
+                        delay = (1 - self.tokens) / self.rate
+                    self._condition.wait(delay)
+                else:
+                    # Wake up periodically so starving tickets can be promoted
+                    self._condition.wait(1.0 / self.rate)
+
+            waited = time.monotonic() - enqueued_at
+            stats = self._metrics[priority]
+            stats['requests'] += 1
+            stats['total_wait'] += waited
+            stats['max_wait'] = max(stats['max_wait'], waited)
+
+            self._condition.notify_all()
+            return waited
+
+    def penalize(self, retry_after: float, priority: int = REQUEST_PRIORITY['ACCOUNT']):
+        """Pause all requests after the API answered 429 Too Many Requests"""
+        with self._condition:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.tokens = 0.0
+            self._metrics[priority]['throttled'] += 1
+            self._condition.notify_all()
+
+    def get_metrics(self) -> Dict[str, Dict[str, float]]:
+        """Get queue wait statistics per priority class"""
+        with self._condition:
+            metrics = {}
+            for name, priority in REQUEST_PRIORITY.items():
+                stats = self._metrics[priority]
+                metrics[name] = {
+                    'requests': stats['requests'],
+                    'queued': len(self._queues[priority]),
+                    'avg_wait': stats['total_wait'] / stats['requests'] if stats['requests'] else 0.0,
+                    'max_wait': stats['max_wait'],
+                    'throttled': stats['throttled']
+                }
+            return metrics
@@ -0,0 +1,98 @@
+import time
+import threading
+from typing import Callable, List, Optional
+from termcolor import colored
+
+
+class SessionManager:
+    """Keeps the Capital.com CST/X-SECURITY-TOKEN pair alive.
+
+    A background thread pings the API before the session idles out. When a
+    request gets a 401, ``CapitalAPI`` calls ``reauthenticate`` with the token
+    it used; the first caller logs in again while the others block on the
+    lock and then reuse the fresh tokens. Token listeners (e.g. the WebSocket
+    client) are notified after every successful refresh.
+    """
+
+    def __init__(self, capital_api, keepalive_interval: float = 300):
+        """
+        Initialize SessionManager
+
+        Args:
+            capital_api: CapitalAPI instance with an active session
+            keepalive_interval: Seconds between keep-alive pings
+        """
+        self.capital_api = capital_api
+        self.keepalive_interval = keepalive_interval
+        self.refresh_count = 0
+        self.last_refresh_time = time.time()
+        self.last_keepalive_time = None
+
+        self._lock = threading.RLock()
+        self._listeners: List[Callable[[str, str], None]] = []
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        capital_api.session_manager = self
+
+    def add_token_listener(self, callback: Callable[[str, str], None]):
+        """Register a callback receiving (cst, security_token) after each refresh"""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Start the background keep-alive thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._keepalive_loop, name="capital-session", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background keep-alive thread"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def _keepalive_loop(self):
+        """Ping the API periodically so the session never idles out"""
+        while not self._stop_event.wait(self.keepalive_interval):
+            self.keep_alive()
+
+    def keep_alive(self) -> bool:
+        """Send a keep-alive ping, re-authenticating if the session is gone"""
+        try:
+            # A 401 here is handled by CapitalAPI._request through reauthenticate
+            status = self.capital_api.ping()
+            self.last_keepalive_time = time.time()
+            return status == 200
+        except Exception as e:
+            print(colored(f"❌ Error sending session keep-alive: {e}", "red"))
+            return False
+
+    def reauthenticate(self, stale_cst: Optional[str] = None) -> bool:
+        """
+        Create a new session unless another caller already replaced stale_cst
+
+        Args:
+            stale_cst: CST token the caller saw rejected
+        """
+        with self._lock:
+            if stale_cst is not None and self.capital_api.cst != stale_cst:
+                return True
+
+            print(colored("\n🔑 Session expired, re-authenticating...", "yellow"))
+            if not self.capital_api.create_session():
+                print(colored("❌ Re-authentication failed", "red"))
+                return False
+
+            self.refresh_count += 1
+            self.last_refresh_time = time.time()
+            print(colored("✅ Session re-authenticated", "green"))
+
+            for listener in self._listeners:
+                try:
+                    listener(self.capital_api.cst, self.capital_api.security_token)
+                except Exception as e:
+                    print(colored(f"❌ Error updating session tokens: {e}", "red"))
+            return True
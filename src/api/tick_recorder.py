@@ -0,0 +1,192 @@
+import os
+import json
+import time
+import struct
+import numpy as np
+from datetime import datetime, timezone
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+from termcolor import colored
+
+# One record per quote, packed without padding (34 bytes)
+TICK_DTYPE = np.dtype([
+    ('timestamp', '<i8'),  # Broker quote time in epoch milliseconds
+    ('epic_id', '<u2'),    # Index into the epic list of the file
+    ('bid', '<f8'),
+    ('ofr', '<f8'),
+    ('received', '<f8')    # Local receive time in epoch seconds
+])
+_TICK_STRUCT = struct.Struct('<qHddd')
+_TICK_SIZE = _TICK_STRUCT.size
+
+
+def _epics_path(path: str) -> str:
+    """Sidecar file listing the epics of a tick file in id order"""
+    return os.path.splitext(path)[0] + '.json'
+
+
+class TickRecorder:
+    """Append-only binary recorder for streamed quotes.
+
+    ``record`` packs the quote as a fixed-width TICK_DTYPE record into a
+    preallocated buffer. The buffer is written in one call when it is full,
+    when ``flush_interval`` seconds passed, at the UTC day boundary (each
+    day goes to its own ticks-YYYYMMDD.bin file) and on ``close``.
+    """
+
+    def __init__(self, directory: str, buffer_size: int = 4096, flush_interval: float = 5.0):
+        """
+        Initialize TickRecorder
+
+        Args:
+            directory: Directory for the daily tick files
+            buffer_size: Records buffered before they are written
+            flush_interval: Seconds after which a partially filled buffer is written
+        """
+        self.directory = directory
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        os.makedirs(directory, exist_ok=True)
+
+        self._buffer = bytearray(buffer_size * _TICK_SIZE)
+        self._offset = 0
+        self._pack = _TICK_STRUCT.pack_into
+        self._end = len(self._buffer)
+        self._epic_ids: Dict[str, int] = {}
+        self._file = None
+        self._path: Optional[str] = None
+        self._rotate_at = 0.0
+        self._flush_at = 0.0
+        self.records_written = 0
+
+    def record(self, epic: str, bid: float, ofr: float, timestamp: int, received: float):
+        """Buffer one quote (timestamp in epoch ms, received in epoch seconds)"""
+        if received >= self._rotate_at:
+            self._rotate(received)
+        epic_id = self._epic_ids.get(epic)
+        if epic_id is None:
+            epic_id = self._add_epic(epic)
+        self._pack(self._buffer, self._offset, timestamp, epic_id, bid, ofr, received)
+        self._offset += _TICK_SIZE
+        if self._offset == self._end or received >= self._flush_at:
+            self.flush()
+            self._flush_at = received + self.flush_interval
+
+    def _add_epic(self, epic: str) -> int:
+        """Assign the next epic id and persist the epic list"""
+        epic_id = len(self._epic_ids)
+        self._epic_ids[epic] = epic_id
+        self._write_epics()
+        return epic_id
+
+    def _write_epics(self):
+        epics = sorted(self._epic_ids, key=self._epic_ids.get)
+        with open(_epics_path(self._path), 'w') as f:
+            json.dump(epics, f)
+
+    def _rotate(self, now: float):
+        """Start the tick file of the UTC day containing now"""
+        self.flush()
+        if self._file:
+            self._file.close()
+
+        day = datetime.fromtimestamp(now, timezone.utc).date()
+        self._path = os.path.join(self.directory, f"ticks-{day.strftime('%Y%m%d')}.bin")
+        self._rotate_at = datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp() + 86400
+
+        # Epic ids are per file, appending to a file of the same day keeps its ids
+        self._epic_ids = {}
+        if os.path.exists(_epics_path(self._path)):
+            with open(_epics_path(self._path)) as f:
+                self._epic_ids = {epic: epic_id for epic_id, epic in enumerate(json.load(f))}
+        self._file = open(self._path, 'ab')
+        print(colored(f"📼 Recording ticks to {self._path}", "cyan"))
+
+    def flush(self):
+        """Write buffered records to the current file"""
+        if not self._offset or self._file is None:
+            return
+        self._file.write(memoryview(self._buffer)[:self._offset])
+        self._file.flush()
+        self.records_written += self._offset // _TICK_SIZE
+        self._offset = 0
+
+    def close(self):
+        """Flush and close the current file"""
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+class TickReader:
+    """Memory-mapped reader for files written by TickRecorder"""
+
+    def __init__(self, path: str):
+        """
+        Initialize TickReader
+
+        Args:
+            path: Tick file (.bin) written by TickRecorder
+        """
+        self.path = path
+        with open(_epics_path(path)) as f:
+            self.epics: List[str] = json.load(f)
+        size = os.path.getsize(path)
+        # A crash can leave a partial record at the end, ignore it
+        count = size // TICK_DTYPE.itemsize
+        self.ticks = np.memmap(path, dtype=TICK_DTYPE, mode='r', shape=(count,)) if count else np.zeros(0, dtype=TICK_DTYPE)
+
+    def __len__(self) -> int:
+        return len(self.ticks)
+
+    def to_array(self, epic: Optional[str] = None) -> np.ndarray:
+        """Get the records as a structured array, optionally only those of one epic"""
+        if epic is None:
+            return self.ticks
+        if epic not in self.epics:
+            return np.zeros(0, dtype=TICK_DTYPE)
+        return self.ticks[self.ticks['epic_id'] == self.epics.index(epic)]
+
+    def iter_ticks(self) -> Iterator[Tuple[float, str, float, float]]:
+        """Yield (timestamp in epoch seconds, epic, bid, ofr) like the simulator tick sources"""
+        epics = self.epics
+        for timestamp, epic_id, bid, ofr in zip(
+            self.ticks['timestamp'].tolist(), self.ticks['epic_id'].tolist(),
+            self.ticks['bid'].tolist(), self.ticks['ofr'].tolist()
+        ):
+            yield timestamp / 1000, epics[epic_id], bid, ofr
+
+    def replay(self, callback: Callable[[Dict], None], speed: float = 0.0, epic: Optional[str] = None) -> int:
+        """
+        Feed recorded quotes to a quote callback
+
+        Args:
+            callback: Receives quote payloads shaped like streamed quotes
+            speed: Replay speed multiplier on the recorded receive times (0 = as fast as possible)
+            epic: Only replay quotes of this epic
+
+        Returns:
+            Number of quotes replayed
+        """
+        ticks = self.to_array(epic)
+        if not len(ticks):
+            return 0
+
+        wall_start = time.monotonic()
+        first_received = float(ticks['received'][0])
+        for timestamp, epic_id, bid, ofr, received in zip(
+            ticks['timestamp'].tolist(), ticks['epic_id'].tolist(), ticks['bid'].tolist(),
+            ticks['ofr'].tolist(), ticks['received'].tolist()
+        ):
+            if speed > 0:
+                wait = wall_start + (received - first_received) / speed - time.monotonic()
+                if wait > 0.001:
+                    time.sleep(wait)
+            callback({
+                'epic': self.epics[epic_id],
+                'product': 'CFD',
+                'bid': bid,
+                'ofr': ofr,
+                'timestamp': timestamp
+            })
+        return len(ticks)
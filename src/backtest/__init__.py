@@ -0,0 +1,10 @@
+from .fills import FillModel
+from .engine import BacktestEngine, BacktestResult
+from .outcomes import simulate_outcomes, OUTCOME_NAMES
+from .sweep import ParameterSweep, grid, random_search
+from .walkforward import WalkForward, train_model
+
+__all__ = [
+    'FillModel', 'BacktestEngine', 'BacktestResult', 'simulate_outcomes', 'OUTCOME_NAMES',
+    'ParameterSweep', 'grid', 'random_search', 'WalkForward', 'train_model'
+]
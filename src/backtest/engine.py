@@ -0,0 +1,232 @@
+import os
+import time
+import contextlib
+import numpy as np
+import pandas as pd
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from src.backtest.fills import FillModel
+from src.core.bars import BarStore
+from src.core.positions import ActivePositions, exit_indicator_series, exit_params
+from src.core.session import TradingSession
+from src.utils.config import BACKTEST_CONFIG, DEFAULT_EPIC
+
+# Capital.com resolution per SignalGenerator timeframe
+TIMEFRAME_RESOLUTIONS = {'1m': 'MINUTE', '5m': 'MINUTE_5'}
+TIMEFRAME_MINUTES = {'1m': 1, '5m': 5}
+
+
+@dataclass
+class BacktestResult:
+    session: TradingSession
+    bars: int
+    elapsed: float
+    signals: np.ndarray  # Signal per bar, 0 where none was evaluated
+    stats: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def trades(self) -> List[Dict]:
+        return self.session.trades
+
+    @property
+    def bars_per_second(self) -> float:
+        return self.bars / self.elapsed if self.elapsed > 0 else 0.0
+
+
+class BacktestEngine:
+    """Runs the live strategy over historical bars, bar by bar.
+
+    Each bar first checks the stop loss and take profit levels of open
+    positions against the bar's range, then applies the ActivePositions exit
+    rules at the close and finally asks ``SignalGenerator.get_trading_signal``
+    for a new entry, which fills at the close through the fill model. Closed
+    trades are booked in a TradingSession that has no database.
+
+    In normal mode bars are streamed into a BarStore and the signal is
+    computed on it at every bar where a trade may be opened, exactly as the
+    live trader does. Fast mode precomputes the signals of all bars in one
+    ``SignalGenerator.get_signals`` pass and the exit indicators first
+    (``precompute``) so the event loop only runs on arrays,
+    and the precomputed arrays can be reused across runs that only change
+    trade levels or sizing.
+    """
+
+    def __init__(self, signal_generator, fill_model: Optional[FillModel] = None, epic: str = DEFAULT_EPIC,
+                 initial_balance: Optional[float] = None, fast: Optional[bool] = None,
+                 warmup_bars: Optional[int] = None, quiet: bool = True):
+        """
+        Initialize BacktestEngine
+
+        Args:
+            signal_generator: SignalGenerator whose config and timeframe drive the backtest
+            fill_model: Fill prices of entries and exits (defaults to BACKTEST_CONFIG spread and slippage)
+            epic: Symbol recorded on positions and trades
+            initial_balance: Starting balance of the session
+            fast: Run on precomputed signal and indicator arrays
+            warmup_bars: Bars of history before the first signal
+            quiet: Silence the strategy's console output while running
+        """
+        self.signal_generator = signal_generator
+        self.config = signal_generator.config
+        self.fill_model = fill_model or FillModel(BACKTEST_CONFIG['spread'], BACKTEST_CONFIG['slippage'])
+        self.epic = epic
+        self.initial_balance = initial_balance if initial_balance is not None else BACKTEST_CONFIG['initial_balance']
+        self.fast = fast if fast is not None else BACKTEST_CONFIG['fast']
+        self.warmup_bars = warmup_bars if warmup_bars is not None else BACKTEST_CONFIG['warmup_bars']
+        self.quiet = quiet
+
+        timeframe = signal_generator.timeframe
+        self.resolution = TIMEFRAME_RESOLUTIONS.get(timeframe, 'MINUTE_5')
+        self.bar_delta = pd.Timedelta(minutes=TIMEFRAME_MINUTES.get(timeframe, 5))
+        self.window = self.config['max_bars_back']  # Bars the live trader keeps in its bar store
+
+    @contextlib.contextmanager
+    def _output(self):
+        if not self.quiet:
+            yield
+            return
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    def compute_signals(self, bars: pd.DataFrame) -> np.ndarray:
+        """Signal of every bar after the warmup, each computed on the bars the live trader would hold"""
+        with self._output():
+            signals = self.signal_generator.get_signals(bars, window=self.window)['signal'].to_numpy(dtype=np.int8, copy=True)
+        signals[:self.warmup_bars] = 0
+        return signals
+
+    def precompute(self, bars: pd.DataFrame) -> Dict[str, np.ndarray]:
+        """Signals and exit rule indicators of every bar, as used by fast mode"""
+        volatility, trend = exit_indicator_series(bars['close'].values, self.resolution)
+        return {'signals': self.compute_signals(bars), 'volatility': volatility, 'trend': trend}
+
+    def _position_size(self, balance: float, price: float) -> float:
+        """Position size the live trader would use at a balance and price"""
+        risk_amount = balance * self.config['risk_per_trade']
+        position_size = risk_amount / (price * self.config['stop_loss'])
+        return max(0.01, min(0.5, position_size))
+
+    def run(self, bars: pd.DataFrame, precomputed: Optional[Dict[str, np.ndarray]] = None) -> BacktestResult:
+        """
+        Backtest the strategy over bars
+
+        Args:
+            bars: OHLC(V) bars indexed by bar start time, oldest first
+            precomputed: Output of ``precompute`` for these bars (fast mode only)
+
+        Returns:
+            BacktestResult with the session holding trades and statistics
+        """
+        fast = self.fast
+        if fast and precomputed is None:
+            precomputed = self.precompute(bars)
+
+        opens, highs, lows, closes = (bars[column].to_numpy(dtype=np.float64) for column in ('open', 'high', 'low', 'close'))
+        # Decisions are taken at the bar close
+        times = (bars.index + self.bar_delta).to_pydatetime()
+        count = len(bars)
+
+        session = TradingSession(self.initial_balance, persist=False)
+        store = None
+        if not fast:
+            store = BarStore(bar_seconds=int(self.bar_delta.total_seconds()), max_bars=self.window)
+            start_ms = bars.index.values.astype('datetime64[ms]').astype(np.int64)
+            warmup = bars.iloc[:self.warmup_bars]
+            store.load(self.epic, {
+                'timestamp': warmup.index.values,
+                **{name: warmup[name].values if name in warmup else np.zeros(len(warmup))
+                   for name in ('open', 'high', 'low', 'close', 'volume')}
+            })
+        active = ActivePositions(session.session_id, bar_store=store, persist=False)
+        session.active_positions = active
+
+        signals = precomputed['signals'] if fast else np.zeros(count, dtype=np.int8)
+        if fast:
+            # Every exit rule needs the trend beyond its threshold, other bars only mark positions to market
+            with np.errstate(invalid='ignore'):
+                rules_active = np.abs(precomputed['trend']) > exit_params(self.resolution)['trend_threshold']
+        fill = self.fill_model
+        stats = {'trigger_exits': 0, 'rule_exits': 0, 'entries': 0}
+
+        started = time.perf_counter()
+        with self._output():
+            for i in range(self.warmup_bars, count):
+                if not fast:
+                    store.update_bar(self.epic, int(start_ms[i]), opens[i], highs[i], lows[i], closes[i])
+                elif not signals[i] and not len(active.book):
+                    continue  # Nothing to exit and no entry signal
+                now = times[i]
+
+                if len(active.book):
+                    # Stop loss and take profit levels inside the bar's range
+                    hits = active.triggers.check_range(lows[i], highs[i])
+                    if hits:
+                        sides = {record['position_key']: record['signal'] for record in active.book.records}
+                        exit_prices = {
+                            key: (fill.stop if kind == 'stop_loss' else fill.target)(level, opens[i], sides[key])
+                            for key, kind, level in hits
+                        }
+                        closed = active.close_positions(exit_prices, {key: kind for key, kind, _ in hits}, now)
+                        stats['trigger_exits'] += len(closed)
+                        self._book_trades(session, closed)
+
+                if len(active.book) and (not fast or rules_active[i]):
+                    # Exit rules at the close
+                    if fast:
+                        active.set_exit_indicators(self.epic, self.resolution, precomputed['volatility'][i], precomputed['trend'][i])
+                    closed = active.update_positions(closes[i], now)
+                    for position in closed:
+                        position['exit_price'] = fill.market(closes[i], -position['signal'])
+                    stats['rule_exits'] += len(closed)
+                    self._book_trades(session, closed)
+
+                if not session.can_open_new_position(now):
+                    continue
+                if not fast:
+                    history = store.get_frame(self.epic)
+                    signals[i] = self.signal_generator.get_trading_signal(history, len(history) - 1)
+                signal = int(signals[i])
+                if signal == 0:
+                    continue
+
+                stop_loss, take_profit = self.signal_generator.get_trade_levels(closes[i], signal)
+                entry_price = fill.market(closes[i], signal)
+                active.add_position({
+                    'symbol': self.epic,
+                    'signal': signal,
+                    'entry_price': entry_price,
+                    'position_size': self._position_size(session.current_balance, entry_price),
+                    'stop_loss': stop_loss,
+                    'take_profit': take_profit,
+                    'entry_time': now,
+                    'timeframe': self.resolution
+                })
+                session.last_trade_time = now
+                stats['entries'] += 1
+
+            # Positions still open at the end are closed at the last close
+            if len(active.book):
+                exit_prices = {
+                    record['position_key']: fill.market(closes[-1], -record['signal'])
+                    for record in active.book.records
+                }
+                reasons = {key: 'end_of_data' for key in exit_prices}
+                self._book_trades(session, active.close_positions(exit_prices, reasons, times[-1]))
+        elapsed = time.perf_counter() - started
+
+        return BacktestResult(
+            session=session,
+            bars=max(0, count - self.warmup_bars),
+            elapsed=elapsed,
+            signals=signals,
+            stats=stats
+        )
+
+    def _book_trades(self, session: TradingSession, closed: List[Dict]):
+        """Record closed positions in the session accounting"""
+        for position in closed:
+            position['hit_price'] = position['exit_price']
+            position['risk_percentage'] = self.config['risk_per_trade']
+            position['timestamp'] = position['entry_time']
+            session.add_trade(position)
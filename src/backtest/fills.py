@@ -0,0 +1,33 @@
+class FillModel:
+    """Prices at which simulated orders fill.
+
+    Market orders cross half the bid/ask spread and pay slippage. Stops fill
+    at their level, or at the bar open when the bar gapped through it, as a
+    market order. Take profits are limit orders and fill at their level, or at
+    the better open after a favourable gap.
+    """
+
+    def __init__(self, spread: float = 0.0, slippage: float = 0.0):
+        """
+        Initialize FillModel
+
+        Args:
+            spread: Bid/ask spread as a fraction of price
+            slippage: Adverse move on market and stop fills as a fraction of price
+        """
+        self.spread = spread
+        self.slippage = slippage
+
+    def market(self, price: float, side: int) -> float:
+        """Fill price of a market order (side 1 buys, -1 sells) at a bar price"""
+        return price * (1 + side * (self.spread / 2 + self.slippage))
+
+    def stop(self, level: float, bar_open: float, side: int) -> float:
+        """Exit price of a position (side 1 long, -1 short) stopped out in a bar"""
+        gapped = (bar_open - level) * side <= 0
+        return self.market(bar_open if gapped else level, -side)
+
+    def target(self, level: float, bar_open: float, side: int) -> float:
+        """Exit price of a position (side 1 long, -1 short) reaching its take profit in a bar"""
+        gapped = (bar_open - level) * side >= 0
+        return bar_open if gapped else level
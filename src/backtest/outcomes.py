@@ -0,0 +1,130 @@
+import numpy as np
+from typing import Dict, Optional, Union
+
+from src.utils.config import BACKTEST_CONFIG
+
+# Outcome codes of simulate_outcomes
+OUTCOME_SL = -1
+OUTCOME_TIMEOUT = 0
+OUTCOME_TP = 1
+OUTCOME_NAMES = {OUTCOME_SL: 'SL', OUTCOME_TIMEOUT: 'TIMEOUT', OUTCOME_TP: 'TP'}
+
+# How a bar containing both levels is resolved
+TIE_RULES = (
+    'stop_loss',    # Assume the stop was hit first
+    'take_profit',  # Assume the target was hit first
+    'ohlc'          # Up bars trade open-low-high-close, down bars open-high-low-close
+)
+
+# Rows times columns per chunk, bounds the size of the 2-D work arrays
+CHUNK_ELEMENTS = 1 << 20
+FIRST_BLOCK = 8  # Bars scanned for every trade before unresolved trades move on to wider blocks
+
+
+def simulate_outcomes(opens: np.ndarray, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                      entries: np.ndarray, directions: np.ndarray,
+                      take_profit: Union[float, np.ndarray], stop_loss: Union[float, np.ndarray],
+                      max_bars: Optional[int] = None, tie: Optional[str] = None,
+                      position_size: Union[float, np.ndarray] = 1.0) -> Dict[str, np.ndarray]:
+    """
+    Resolve the take profit and stop loss of many trades at once
+
+    Trades enter at the close of their entry bar with levels placed like
+    SignalGenerator.get_trade_levels. The following ``max_bars`` bars of every
+    trade are compared against both levels as 2-D (trades, bars) arrays, so
+    there is no loop over bars. Trades that hit neither level exit at the
+    close of their last bar.
+
+    Args:
+        opens, highs, lows, closes: Bar prices
+        entries: Entry bar index of every trade
+        directions: 1 for long, -1 for short
+        take_profit: Take profit distance as a fraction of the entry price (scalar or per trade)
+        stop_loss: Stop loss distance as a fraction of the entry price (scalar or per trade)
+        max_bars: Bars a trade is held at most (defaults to BACKTEST_CONFIG['max_holding_bars'])
+        tie: Rule for bars containing both levels, one of TIE_RULES
+            (defaults to BACKTEST_CONFIG['tie_rule'])
+        position_size: Size the P&L is scaled by (scalar or per trade)
+
+    Returns:
+        Arrays per trade: entry_price, exit_bar, exit_price, outcome (OUTCOME_TP,
+        OUTCOME_SL or OUTCOME_TIMEOUT) and pnl (position_size times the signed return)
+    """
+    max_bars = max_bars or BACKTEST_CONFIG['max_holding_bars']
+    tie = tie or BACKTEST_CONFIG['tie_rule']
+    if tie not in TIE_RULES:
+        raise ValueError(f"Invalid tie rule: {tie}")
+
+    opens, highs, lows, closes = (np.asarray(values, dtype=np.float64) for values in (opens, highs, lows, closes))
+    entries = np.asarray(entries, dtype=np.int64)
+    directions = np.where(np.asarray(directions) > 0, 1, -1).astype(np.int8)
+    count = len(entries)
+    take_profit = np.broadcast_to(np.asarray(take_profit, dtype=np.float64), (count,))
+    stop_loss = np.broadcast_to(np.asarray(stop_loss, dtype=np.float64), (count,))
+    if np.any(take_profit <= 0) or np.any(stop_loss <= 0):
+        raise ValueError("take_profit and stop_loss must be positive")
+
+    entry_price = closes[entries]
+    tp_level = entry_price * (1 + directions * take_profit)
+    sl_level = entry_price * (1 - directions * stop_loss)
+
+    # Row i of a window view holds bars i+1 .. i+max_bars, padded past the end with NaN (never hit)
+    def windows(values: np.ndarray) -> np.ndarray:
+        padded = np.concatenate([values[1:], np.full(max_bars, np.nan)])
+        return np.lib.stride_tricks.sliding_window_view(padded, max_bars)
+
+    high_windows, low_windows = windows(highs), windows(lows)
+    first_tp = np.full(count, max_bars, dtype=np.int64)
+    first_sl = np.full(count, max_bars, dtype=np.int64)
+
+    for side in (1, -1):
+        # Longs take profit on highs and stop out on lows, shorts the other way round
+        favourable, adverse = (high_windows, low_windows) if side > 0 else (low_windows, high_windows)
+        pending = np.flatnonzero(directions == side)
+        # Most trades resolve within a few bars: scan blocks of doubling width and
+        # only keep the trades that hit neither level for the next block
+        offset, width = 0, FIRST_BLOCK
+        while len(pending) and offset < max_bars:
+            columns = slice(offset, min(offset + width, max_bars))
+            rows = max(1, CHUNK_ELEMENTS // width)
+            for start in range(0, len(pending), rows):
+                trades = pending[start:start + rows]
+                index = entries[trades]
+                tp, sl = tp_level[trades, None], sl_level[trades, None]
+                if side > 0:
+                    tp_hit, sl_hit = favourable[index, columns] >= tp, adverse[index, columns] <= sl
+                else:
+                    tp_hit, sl_hit = favourable[index, columns] <= tp, adverse[index, columns] >= sl
+                first_tp[trades] = np.where(tp_hit.any(axis=1), offset + tp_hit.argmax(axis=1), max_bars)
+                first_sl[trades] = np.where(sl_hit.any(axis=1), offset + sl_hit.argmax(axis=1), max_bars)
+            pending = pending[(first_tp[pending] == max_bars) & (first_sl[pending] == max_bars)]
+            offset += width
+            width *= 2
+
+    both = (first_tp == first_sl) & (first_tp < max_bars)
+    if tie == 'stop_loss':
+        tp_first = first_tp < first_sl
+    elif tie == 'take_profit':
+        tp_first = (first_tp < first_sl) | both
+    else:
+        # The side of the bar visited first wins: longs take profit on the high, shorts on the low
+        tie_bar = np.minimum(entries + 1 + np.minimum(first_tp, max_bars - 1), len(closes) - 1)
+        low_first = closes[tie_bar] >= opens[tie_bar]
+        tp_first = (first_tp < first_sl) | (both & ((directions > 0) != low_first))
+
+    hit = np.minimum(first_tp, first_sl)
+    outcome = np.where(hit < max_bars, np.where(tp_first, OUTCOME_TP, OUTCOME_SL), OUTCOME_TIMEOUT).astype(np.int8)
+    exit_bar = np.where(outcome != OUTCOME_TIMEOUT, entries + 1 + hit, np.minimum(entries + max_bars, len(closes) - 1))
+    exit_price = np.where(
+        outcome == OUTCOME_TP, tp_level,
+        np.where(outcome == OUTCOME_SL, sl_level, closes[exit_bar])
+    )
+    pnl = np.asarray(position_size, dtype=np.float64) * directions * (exit_price - entry_price) / entry_price
+
+    return {
+        'entry_price': entry_price,
+        'exit_bar': exit_bar,
+        'exit_price': exit_price,
+        'outcome': outcome,
+        'pnl': pnl
+    }
@@ -0,0 +1,54 @@
+import numpy as np
+from multiprocessing import shared_memory
+from typing import Dict, Tuple
+
+
+class SharedArrays:
+    """NumPy arrays packed into one shared memory block.
+
+    The creating process copies the arrays in once; worker processes attach
+    by name with ``attach(spec)`` and get read-only views without copying or
+    pickling the data. The creator must ``close`` (which also unlinks) the
+    block when the workers are done.
+    """
+
+    ALIGNMENT = 64
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        """
+        Initialize SharedArrays
+
+        Args:
+            arrays: Arrays to share by name
+        """
+        layout = {}
+        size = 0
+        for name, values in arrays.items():
+            values = np.ascontiguousarray(values)
+            layout[name] = (values.dtype.str, values.shape, size)
+            size += -(-values.nbytes // self.ALIGNMENT) * self.ALIGNMENT
+
+        self._memory = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        for name, values in arrays.items():
+            dtype, shape, offset = layout[name]
+            view = np.ndarray(shape, dtype=dtype, buffer=self._memory.buf, offset=offset)
+            view[...] = values
+        self.spec = {'name': self._memory.name, 'layout': layout}
+
+    @staticmethod
+    def attach(spec: Dict) -> Tuple[shared_memory.SharedMemory, Dict[str, np.ndarray]]:
+        """Map the arrays of a spec, keep the returned block referenced while using them"""
+        memory = shared_memory.SharedMemory(name=spec['name'])
+        arrays = {}
+        for name, (dtype, shape, offset) in spec['layout'].items():
+            view = np.ndarray(shape, dtype=dtype, buffer=memory.buf, offset=offset)
+            view.flags.writeable = False
+            arrays[name] = view
+        return memory, arrays
+
+    def close(self):
+        """Release and remove the shared block"""
+        if self._memory is not None:
+            self._memory.close()
+            self._memory.unlink()
+            self._memory = None
@@ -0,0 +1,396 @@
+import os
+import json
+import time
+import random
+import hashlib
+import argparse
+import functools
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from tabulate import tabulate
+from termcolor import colored
+
+from src.analytics.performance import session_performance
+from src.backtest.engine import BacktestEngine, TIMEFRAME_RESOLUTIONS
+from src.backtest.fills import FillModel
+from src.backtest.shared import SharedArrays
+from src.core.positions import exit_indicator_series
+from src.features.signals import SignalGenerator
+from src.utils.config import BACKTEST_CONFIG, TRADING_CONFIG
+
+# Parameters that only change how trades are placed and sized, every other
+# parameter changes the signals and needs its own signal pass
+TRADE_PARAMS = ('take_profit', 'stop_loss', 'risk_per_trade')
+
+# timeframe_params keys the strategy reads (the signal ADX and momentum
+# periods), the exit rules of a backtest run on EXIT_PARAMS
+TIMEFRAME_PARAMS = ('adx_period', 'momentum_period')
+
+# Session summary fields and performance metrics reported per combination
+RESULT_METRICS = ('total_trades', 'win_rate', 'profit_factor', 'return_percentage', 'max_drawdown', 'final_balance',
+                  'sharpe_ratio', 'sortino_ratio', 'calmar_ratio', 'exposure')
+
+
+def apply_params(config: Dict[str, Any], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Copy a config with params applied, dotted keys reach into nested dicts (timeframe_params.5m.adx_period)"""
+    config = json.loads(json.dumps(config))
+    for key, value in params.items():
+        target = config
+        *path, name = key.split('.')
+        for part in path:
+            target = target[part]
+        if name not in target:
+            raise KeyError(f"Unknown TRADING_CONFIG key: {key}")
+        if path[:1] == ['timeframe_params'] and name not in TIMEFRAME_PARAMS:
+            raise KeyError(f"{key} is not read by the strategy, only {', '.join(TIMEFRAME_PARAMS)} of timeframe_params are")
+        target[name] = value
+    return config
+
+
+def grid(space: Dict[str, Sequence]) -> List[Dict[str, Any]]:
+    """Every combination of the listed values"""
+    keys = list(space)
+    return [dict(zip(keys, values)) for values in itertools.product(*(space[key] for key in keys))]
+
+
+def random_search(space: Dict[str, Any], samples: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    Random combinations
+
+    Args:
+        space: Per key a list to pick from or a (low, high) tuple to sample
+            uniformly (integers when both bounds are integers)
+        samples: Combinations to draw
+        seed: Random seed
+    """
+    rng = random.Random(seed)
+    combinations = []
+    for _ in range(samples):
+        params = {}
+        for key, values in space.items():
+            if isinstance(values, tuple):
+                low, high = values
+                params[key] = rng.randint(low, high) if isinstance(low, int) and isinstance(high, int) else rng.uniform(low, high)
+            else:
+                params[key] = rng.choice(list(values))
+        combinations.append(params)
+    return combinations
+
+
+def params_key(params: Dict[str, Any]) -> str:
+    """Stable identifier of a parameter combination"""
+    return hashlib.sha1(json.dumps(params, sort_keys=True).encode()).hexdigest()[:16]
+
+
+# Per-process state of the pool workers, set up once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(specs: List[Dict], timeframe: str, fill: Dict[str, float], initial_balance: float):
+    memories, arrays = [], {}
+    for spec in specs:
+        memory, views = SharedArrays.attach(spec)
+        memories.append(memory)
+        arrays.update(views)
+    index = pd.DatetimeIndex(arrays['time'].view('datetime64[ns]'), name='timestamp')
+    _worker.update({
+        'memories': memories,
+        'arrays': arrays,
+        'bars': pd.DataFrame({name: arrays[name] for name in ('open', 'high', 'low', 'close')}, index=index, copy=False),
+        'timeframe': timeframe,
+        'fill': FillModel(**fill),
+        'initial_balance': initial_balance
+    })
+
+
+def signal_generator(params: Dict[str, Any], model, timeframe: str) -> SignalGenerator:
+    """SignalGenerator running on TRADING_CONFIG with params applied"""
+    generator = SignalGenerator(model, timeframe=timeframe)
+    generator.config = apply_params(TRADING_CONFIG, params)
+    generator.technical_analyzer.config = generator.config
+    generator.tf_params = generator.config['timeframe_params'].get(timeframe, generator.config['timeframe_params']['5m'])
+    return generator
+
+
+def session_metrics(session) -> Dict[str, Any]:
+    """RESULT_METRICS of a finished backtest session"""
+    session._update_summary_stats()
+    metrics = {**session_performance(session), **session.summary}
+    return {metric: metrics[metric] for metric in RESULT_METRICS}
+
+
+def default_model(weights: Optional[str] = None, seed: int = 0):
+    """LorentzianModel with fixed weights: loaded from a file, or seeded initial weights"""
+    import tensorflow as tf
+    from src.models.neural import LorentzianModel
+    tf.keras.utils.set_random_seed(seed)
+    model = LorentzianModel()
+    if weights:
+        model.load_weights(weights)
+    return model
+
+
+def factory_key(factory: Callable) -> Any:
+    """Stable description of a model factory for fingerprints, with the arguments of a functools.partial"""
+    if isinstance(factory, functools.partial):
+        return {'factory': factory_key(factory.func), 'args': list(factory.args), 'keywords': factory.keywords}
+    return getattr(factory, '__qualname__', repr(factory))
+
+
+def _compute_signals(params: Dict[str, Any], model_factory: Callable) -> np.ndarray:
+    """Signal pass for one set of signal parameters"""
+    engine = BacktestEngine(signal_generator(params, model_factory(), _worker['timeframe']), fast=True)
+    return engine.compute_signals(_worker['bars'])
+
+
+def _run_batch(batch: List[Tuple[Dict[str, Any], int]]) -> List[Dict[str, Any]]:
+    """Backtest (params, signal row) pairs on the shared bars"""
+    arrays = _worker['arrays']
+    results = []
+    for params, row in batch:
+        engine = BacktestEngine(
+            signal_generator(params, None, _worker['timeframe']),
+            fill_model=_worker['fill'],
+            initial_balance=_worker['initial_balance'],
+            fast=True
+        )
+        precomputed = {'signals': arrays['signals'][row], 'volatility': arrays['volatility'], 'trend': arrays['trend']}
+        result = engine.run(_worker['bars'], precomputed)
+        results.append({
+            'key': params_key(params),
+            'params': params,
+            **session_metrics(result.session),
+            'bars_per_second': result.bars_per_second
+        })
+    return results
+
+
+class ParameterSweep:
+    """Backtests TRADING_CONFIG combinations in a process pool.
+
+    Bars and exit indicators are placed in shared memory once and attached
+    by every worker. Combinations that differ only in TRADE_PARAMS share one
+    signal pass: the distinct signal parameter sets are computed first (in
+    parallel) and their signals shared as one matrix, then every combination
+    runs as a fast-mode BacktestEngine. Finished combinations are appended to
+    a JSONL checkpoint so an interrupted sweep resumes where it stopped; each
+    row carries a fingerprint of the bars, settings and model it was run on,
+    so a rerun on other inputs does not pick up stale results.
+    """
+
+    def __init__(self, bars: pd.DataFrame, timeframe: str = '5m', signals: Optional[np.ndarray] = None,
+                 model_factory: Callable = default_model, workers: Optional[int] = None,
+                 checkpoint: Optional[str] = None, fill_model: Optional[FillModel] = None,
+                 initial_balance: Optional[float] = None, batch_size: Optional[int] = None):
+        """
+        Initialize ParameterSweep
+
+        Args:
+            bars: OHLC bars indexed by bar start time
+            timeframe: SignalGenerator timeframe ('1m' or '5m')
+            signals: Precomputed signals for the default signal parameters
+                (BacktestEngine.precompute), saves their signal pass
+            model_factory: Picklable callable returning the model for signal passes,
+                it must return the same model in every process (e.g.
+                functools.partial(default_model, weights, seed))
+            workers: Worker processes (defaults to BACKTEST_CONFIG['sweep_workers'] or the CPU count)
+            checkpoint: JSONL file finished combinations are appended to
+            fill_model: Fill model of every backtest
+            initial_balance: Starting balance of every backtest
+            batch_size: Combinations per pool task
+        """
+        self.bars = bars
+        self.timeframe = timeframe
+        self.signals = signals
+        self.model_factory = model_factory
+        self.workers = workers or BACKTEST_CONFIG['sweep_workers'] or os.cpu_count()
+        self.checkpoint = checkpoint
+        fill_model = fill_model or FillModel(BACKTEST_CONFIG['spread'], BACKTEST_CONFIG['slippage'])
+        self.fill = {'spread': fill_model.spread, 'slippage': fill_model.slippage}
+        self.initial_balance = initial_balance if initial_balance is not None else BACKTEST_CONFIG['initial_balance']
+        self.batch_size = batch_size or BACKTEST_CONFIG['sweep_batch_size']
+
+    def _inputs_key(self) -> str:
+        """Fingerprint of everything besides the parameters a result depends on: bars, settings and model"""
+        digest = hashlib.sha1()
+        digest.update(self.bars.index.values.astype('datetime64[ns]').tobytes())
+        for name in ('open', 'high', 'low', 'close'):
+            digest.update(self.bars[name].to_numpy(dtype=np.float64).tobytes())
+        if self.signals is not None:
+            digest.update(np.asarray(self.signals, dtype=np.int8).tobytes())
+        settings = {
+            'timeframe': self.timeframe,
+            'fill': self.fill,
+            'initial_balance': self.initial_balance,
+            'warmup_bars': BACKTEST_CONFIG['warmup_bars'],
+            'metrics': RESULT_METRICS,
+            'config': TRADING_CONFIG,
+            'model': factory_key(self.model_factory)
+        }
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        return digest.hexdigest()[:16]
+
+    def _load_checkpoint(self, inputs: str) -> Dict[str, Dict[str, Any]]:
+        """Checkpointed results of these inputs, rows written for other inputs or without every metric are ignored"""
+        finished = {}
+        if self.checkpoint and os.path.exists(self.checkpoint):
+            with open(self.checkpoint) as f:
+                for line in f:
+                    if line.strip():
+                        result = json.loads(line)
+                        if result.get('inputs') == inputs and all(metric in result for metric in RESULT_METRICS):
+                            finished[result['key']] = result
+        return finished
+
+    def _pool(self, specs: List[Dict]) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(specs, self.timeframe, self.fill, self.initial_balance)
+        )
+
+    def run(self, combinations: List[Dict[str, Any]], metric: str = 'return_percentage') -> pd.DataFrame:
+        """
+        Backtest every combination and rank the results
+
+        Args:
+            combinations: Parameter dicts (from grid or random_search)
+            metric: Result column the table is ranked by, best first
+
+        Returns:
+            One row per combination with its parameters and RESULT_METRICS
+        """
+        inputs = self._inputs_key()
+        finished = self._load_checkpoint(inputs)
+        pending = [params for params in combinations if params_key(params) not in finished]
+        print(colored(f"🧪 Sweep: {len(combinations)} combinations, {len(finished)} checkpointed, "
+                      f"{len(pending)} to run on {self.workers} workers", "cyan"))
+
+        if pending:
+            started = time.time()
+            closes = self.bars['close'].to_numpy(dtype=np.float64)
+            volatility, trend = exit_indicator_series(closes, TIMEFRAME_RESOLUTIONS.get(self.timeframe, 'MINUTE_5'))
+            shared_bars = SharedArrays({
+                'time': self.bars.index.values.astype('datetime64[ns]').view(np.int64),
+                **{name: self.bars[name].to_numpy(dtype=np.float64) for name in ('open', 'high', 'low', 'close')},
+                'volatility': volatility,
+                'trend': trend
+            })
+            shared_signals = None
+            try:
+                # One signal pass per distinct set of signal parameters
+                signal_sets: Dict[str, Dict[str, Any]] = {}
+                for params in pending:
+                    signal_params = {key: value for key, value in params.items() if key not in TRADE_PARAMS}
+                    signal_sets.setdefault(json.dumps(signal_params, sort_keys=True), signal_params)
+                rows = {key: row for row, key in enumerate(signal_sets)}
+                matrix = np.zeros((len(signal_sets), len(self.bars)), dtype=np.int8)
+
+                to_compute = {key: params for key, params in signal_sets.items()}
+                if self.signals is not None and '{}' in to_compute:
+                    matrix[rows['{}']] = self.signals
+                    del to_compute['{}']
+                if to_compute:
+                    print(colored(f"📡 Computing signals for {len(to_compute)} parameter set(s)", "cyan"))
+                    with self._pool([shared_bars.spec]) as pool:
+                        futures = {pool.submit(_compute_signals, params, self.model_factory): key
+                                   for key, params in to_compute.items()}
+                        for future in as_completed(futures):
+                            matrix[rows[futures[future]]] = future.result()
+
+                shared_signals = SharedArrays({'signals': matrix})
+                tasks = [
+                    (params, rows[json.dumps({k: v for k, v in params.items() if k not in TRADE_PARAMS}, sort_keys=True)])
+                    for params in pending
+                ]
+                batches = [tasks[i:i + self.batch_size] for i in range(0, len(tasks), self.batch_size)]
+                done = 0
+                with self._pool([shared_bars.spec, shared_signals.spec]) as pool:
+                    futures = [pool.submit(_run_batch, batch) for batch in batches]
+                    for future in as_completed(futures):
+                        results = future.result()
+                        for result in results:
+                            result['inputs'] = inputs
+                            finished[result['key']] = result
+                        if self.checkpoint:
+                            with open(self.checkpoint, 'a') as f:
+                                for result in results:
+                                    f.write(json.dumps(result, default=float) + '\n')
+                        done += len(results)
+                        print(f"\r⏳ {done}/{len(tasks)} combinations", end='', flush=True)
+                print()
+                print(colored(f"✅ Sweep finished in {time.time() - started:.1f}s", "green"))
+            finally:
+                shared_bars.close()
+                if shared_signals is not None:
+                    shared_signals.close()
+
+        rows = []
+        for params in combinations:
+            result = finished.get(params_key(params))
+            if result:
+                rows.append({**result['params'], **{metric_name: result[metric_name] for metric_name in RESULT_METRICS}})
+        table = pd.DataFrame(rows)
+        if not table.empty:
+            table = table.sort_values(metric, ascending=False, kind='stable').reset_index(drop=True)
+        return table
+
+
+def print_sweep_results(results: pd.DataFrame, top: int = 20):
+    """Print the best combinations of a sweep"""
+    if results.empty:
+        print("\nNo sweep results.")
+        return
+    print(colored(f"\n=== Top {min(top, len(results))} of {len(results)} combinations ===", "cyan"))
+    print(tabulate(results.head(top), headers='keys', tablefmt='grid', floatfmt='.4g', showindex=range(1, min(top, len(results)) + 1)))
+
+
+def _parse_value(value: str) -> Any:
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+
+def parse_space(items: List[str], ranges: bool = False) -> Dict[str, Any]:
+    """Search space from KEY=V1,V2 arguments, KEY=LOW:HIGH becomes a range when ranges is set"""
+    space = {}
+    for item in items:
+        key, values = item.split('=', 1)
+        if ranges and ':' in values:
+            low, high = values.split(':')
+            space[key] = (_parse_value(low), _parse_value(high))
+        else:
+            space[key] = [_parse_value(value) for value in values.split(',')]
+    return space
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parameter sweep over TRADING_CONFIG")
+    parser.add_argument('--bars', required=True, help="CSV with timestamp, open, high, low and close columns")
+    parser.add_argument('--timeframe', default='5m', choices=sorted(TIMEFRAME_RESOLUTIONS))
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=V1,V2',
+                        help="Values of a TRADING_CONFIG key (repeatable), or KEY=LOW:HIGH with --random")
+    parser.add_argument('--random', type=int, default=0, help="Random combinations instead of the full grid")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of --random and of the model weights without --weights")
+    parser.add_argument('--weights', help="LorentzianModel weights, without them the model is built from --seed")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--checkpoint', default=BACKTEST_CONFIG['sweep_checkpoint'])
+    parser.add_argument('--metric', default='return_percentage', choices=RESULT_METRICS)
+    parser.add_argument('--top', type=int, default=20)
+    args = parser.parse_args()
+
+    space = parse_space(args.param, ranges=bool(args.random))
+    combinations = random_search(space, args.random, args.seed) if args.random else grid(space)
+
+    bars = pd.read_csv(args.bars, parse_dates=['timestamp'], index_col='timestamp')
+    sweep = ParameterSweep(bars, timeframe=args.timeframe, model_factory=functools.partial(default_model, args.weights, args.seed),
+                           workers=args.workers, checkpoint=args.checkpoint)
+    print_sweep_results(sweep.run(combinations, metric=args.metric), top=args.top)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,367 @@
+import os
+import json
+import time
+import hashlib
+import argparse
+import functools
+import contextlib
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Callable, Dict, List, Optional
+from tabulate import tabulate
+from termcolor import colored
+
+from src.backtest.engine import BacktestEngine, TIMEFRAME_RESOLUTIONS
+from src.backtest.fills import FillModel
+from src.backtest.shared import SharedArrays
+from src.backtest.sweep import (
+    TRADE_PARAMS, RESULT_METRICS, default_model, factory_key, grid, random_search, params_key,
+    parse_space, signal_generator, session_metrics
+)
+from src.core.positions import exit_indicator_series
+from src.utils.config import BACKTEST_CONFIG, TRADING_CONFIG
+
+# Bars get_trading_signal predicts on per timeframe, the training features use the same slice
+FEATURE_LOOKBACK = {'1m': 60, '5m': 24}
+
+
+def training_set(bars: pd.DataFrame, timeframe: str, horizon: int) -> Dict[str, np.ndarray]:
+    """
+    Features and labels for LorentzianModel.train
+
+    Every bar gets the combined feature vector SignalGenerator predicts on.
+    The signal label is 1 when the close ``horizon`` bars later is higher and
+    the price label is the return over those bars.
+    """
+    generator = signal_generator({}, None, timeframe)
+    lookback = FEATURE_LOOKBACK.get(timeframe, 24)
+    closes = bars['close'].to_numpy(dtype=np.float64)
+    features, rows = [], []
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        for i in range(lookback, len(bars) - horizon):
+            vector = generator.prepare_combined_features(bars.iloc[i - lookback:i + 1])
+            if vector is not None and np.all(np.isfinite(vector)):
+                features.append(vector)
+                rows.append(i)
+    rows = np.asarray(rows, dtype=np.int64)
+    returns = closes[rows + horizon] / closes[rows] - 1 if len(rows) else np.zeros(0)
+    return {
+        'features': np.asarray(features, dtype=np.float32).reshape(len(rows), -1),
+        'signal': (returns > 0).astype(np.float32),
+        'price': returns.astype(np.float32)
+    }
+
+
+def train_model(model, bars: pd.DataFrame, timeframe: str):
+    """Retrain a LorentzianModel on a train window, the default walk-forward trainer"""
+    data = training_set(bars, timeframe, BACKTEST_CONFIG['walkforward_label_bars'])
+    if len(data['features']):
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            model.train(data['features'], data['signal'], data['price'],
+                        epochs=BACKTEST_CONFIG['walkforward_epochs'])
+    return model
+
+
+# Per-process state of the pool workers, set up once by _init_worker
+_worker: Dict[str, Any] = {}
+
+
+def _init_worker(spec: Dict, timeframe: str, fill: Dict[str, float], initial_balance: float, warmup_bars: int):
+    memory, arrays = SharedArrays.attach(spec)
+    index = pd.DatetimeIndex(arrays['time'].view('datetime64[ns]'), name='timestamp')
+    _worker.update({
+        'memory': memory,
+        'arrays': arrays,
+        'bars': pd.DataFrame({name: arrays[name] for name in ('open', 'high', 'low', 'close')}, index=index, copy=False),
+        'timeframe': timeframe,
+        'fill': FillModel(**fill),
+        'initial_balance': initial_balance,
+        'warmup_bars': warmup_bars
+    })
+
+
+def _backtest(start: int, end: int, combinations: List[Dict[str, Any]], model) -> List[Dict[str, Any]]:
+    """Backtest combinations on bars[start:end], preceded by warmup bars where history allows"""
+    first = max(0, start - _worker['warmup_bars'])
+    warmup = max(start - first, _worker['warmup_bars'] if first == 0 else 0)
+    bars = _worker['bars'].iloc[first:end]
+    arrays = _worker['arrays']
+
+    signals: Dict[str, np.ndarray] = {}
+    results = []
+    for params in combinations:
+        signal_params = {key: value for key, value in params.items() if key not in TRADE_PARAMS}
+        signal_key = json.dumps(signal_params, sort_keys=True)
+        engine = BacktestEngine(
+            signal_generator(params, model, _worker['timeframe']),
+            fill_model=_worker['fill'],
+            initial_balance=_worker['initial_balance'],
+            fast=True,
+            warmup_bars=warmup
+        )
+        # Combinations that only change trade parameters share a signal pass
+        if signal_key not in signals:
+            signals[signal_key] = engine.compute_signals(bars)
+        precomputed = {
+            'signals': signals[signal_key],
+            'volatility': arrays['volatility'][first:end],
+            'trend': arrays['trend'][first:end]
+        }
+        result = engine.run(bars, precomputed)
+        results.append({'params': params, **session_metrics(result.session)})
+    return results
+
+
+def _run_window(window: Dict[str, Any], combinations: List[Dict[str, Any]], metric: str,
+                model_factory: Callable, trainer: Optional[Callable]) -> Dict[str, Any]:
+    """Optimize on the train bars of a window, then evaluate the best combination on its test bars"""
+    started = time.time()
+    model = model_factory()
+    if trainer is not None:
+        train_bars = _worker['bars'].iloc[window['train_start']:window['train_end']]
+        model = trainer(model, train_bars, _worker['timeframe'])
+
+    train = _backtest(window['train_start'], window['train_end'], combinations, model)
+    best = max(train, key=lambda result: result[metric])
+    test = _backtest(window['test_start'], window['test_end'], [best['params']], model)[0]
+
+    return {
+        **window,
+        'params': best['params'],
+        'train': {name: best[name] for name in RESULT_METRICS},
+        'test': {name: test[name] for name in RESULT_METRICS},
+        'elapsed': time.time() - started
+    }
+
+
+class WalkForward:
+    """Walk-forward optimization over rolling train/test windows.
+
+    History is split into windows of ``train_bars`` followed by ``test_bars``,
+    advancing by ``step_bars``. Every window picks the best combination on
+    its train bars (optionally after retraining the model on them) and
+    reports that combination on the unseen test bars that follow, so the
+    stitched test results are out-of-sample.
+
+    Windows run in parallel worker processes that attach to the bars in
+    shared memory. Each finished window is cached as a JSON file keyed by the
+    bars it covers and the optimization settings, so rerunning on extended
+    history only computes the new windows.
+    """
+
+    def __init__(self, bars: pd.DataFrame, timeframe: str = '5m', train_bars: Optional[int] = None,
+                 test_bars: Optional[int] = None, step_bars: Optional[int] = None, anchored: Optional[bool] = None,
+                 model_factory: Callable = default_model, trainer: Optional[Callable] = None,
+                 workers: Optional[int] = None, cache_dir: Optional[str] = None,
+                 fill_model: Optional[FillModel] = None, initial_balance: Optional[float] = None):
+        """
+        Initialize WalkForward
+
+        Args:
+            bars: OHLC bars indexed by bar start time
+            timeframe: SignalGenerator timeframe ('1m' or '5m')
+            train_bars: Bars each combination is optimized on
+            test_bars: Out-of-sample bars after each train window
+            step_bars: Bars between window starts (defaults to test_bars)
+            anchored: Train windows all start at the first bar and grow
+            model_factory: Picklable callable returning the same model for every window
+                (e.g. functools.partial(default_model, weights, seed))
+            trainer: Picklable callable (model, train_bars, timeframe) -> model retraining
+                the model per window, e.g. train_model (None keeps the factory's model)
+            workers: Worker processes (defaults to BACKTEST_CONFIG['sweep_workers'] or the CPU count)
+            cache_dir: Directory of cached window results (None disables the cache)
+            fill_model: Fill model of every backtest
+            initial_balance: Starting balance of every backtest
+        """
+        self.bars = bars
+        self.timeframe = timeframe
+        self.train_bars = train_bars or BACKTEST_CONFIG['walkforward_train_bars']
+        self.test_bars = test_bars or BACKTEST_CONFIG['walkforward_test_bars']
+        self.step_bars = step_bars or self.test_bars
+        self.anchored = anchored if anchored is not None else BACKTEST_CONFIG['walkforward_anchored']
+        self.model_factory = model_factory
+        self.trainer = trainer
+        self.workers = workers or BACKTEST_CONFIG['sweep_workers'] or os.cpu_count()
+        self.cache_dir = cache_dir
+        fill_model = fill_model or FillModel(BACKTEST_CONFIG['spread'], BACKTEST_CONFIG['slippage'])
+        self.fill = {'spread': fill_model.spread, 'slippage': fill_model.slippage}
+        self.initial_balance = initial_balance if initial_balance is not None else BACKTEST_CONFIG['initial_balance']
+        self.warmup_bars = BACKTEST_CONFIG['warmup_bars']
+
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    def windows(self) -> List[Dict[str, int]]:
+        """Bar ranges of every complete train/test window, oldest first"""
+        windows = []
+        start = 0
+        while start + self.train_bars + self.test_bars <= len(self.bars):
+            train_end = start + self.train_bars
+            windows.append({
+                'train_start': 0 if self.anchored else start,
+                'train_end': train_end,
+                'test_start': train_end,
+                'test_end': train_end + self.test_bars
+            })
+            start += self.step_bars
+        return windows
+
+    def _window_key(self, window: Dict[str, int], combinations: List[Dict[str, Any]], metric: str) -> str:
+        """Cache key of a window: the bars it reads and everything its result depends on"""
+        digest = hashlib.sha1()
+        first = max(0, window['train_start'] - self.warmup_bars)
+        covered = self.bars.iloc[first:window['test_end']]
+        digest.update(covered.index.values.astype('datetime64[ns]').tobytes())
+        for name in ('open', 'high', 'low', 'close'):
+            digest.update(covered[name].to_numpy(dtype=np.float64).tobytes())
+        settings = {
+            'window': window,
+            'combinations': sorted(params_key(params) for params in combinations),
+            'metric': metric,
+            'metrics': RESULT_METRICS,
+            'timeframe': self.timeframe,
+            'fill': self.fill,
+            'initial_balance': self.initial_balance,
+            'warmup_bars': self.warmup_bars,
+            'config': TRADING_CONFIG,
+            'model': factory_key(self.model_factory),
+            'trainer': getattr(self.trainer, '__qualname__', None) if self.trainer else None,
+            'training': [BACKTEST_CONFIG['walkforward_epochs'], BACKTEST_CONFIG['walkforward_label_bars']] if self.trainer else None
+        }
+        digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+        return digest.hexdigest()[:16]
+
+    def _cache_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"window_{key}.json")
+
+    def run(self, combinations: List[Dict[str, Any]], metric: str = 'return_percentage') -> pd.DataFrame:
+        """
+        Walk forward through every window
+
+        Args:
+            combinations: Parameter dicts tried on every train window (from grid or random_search)
+            metric: Result column the best train combination is chosen by
+
+        Returns:
+            One row per window with its dates, chosen parameters, the train metric and the test RESULT_METRICS
+        """
+        if not combinations:
+            combinations = [{}]
+        windows = self.windows()
+        keys = [self._window_key(window, combinations, metric) for window in windows]
+        finished: Dict[str, Dict[str, Any]] = {}
+        if self.cache_dir:
+            for key in keys:
+                if os.path.exists(self._cache_path(key)):
+                    with open(self._cache_path(key)) as f:
+                        finished[key] = json.load(f)
+        pending = [(key, window) for key, window in zip(keys, windows) if key not in finished]
+        print(colored(f"🚶 Walk-forward: {len(windows)} windows, {len(windows) - len(pending)} cached, "
+                      f"{len(pending)} to run on {self.workers} workers", "cyan"))
+
+        if pending:
+            started = time.time()
+            closes = self.bars['close'].to_numpy(dtype=np.float64)
+            volatility, trend = exit_indicator_series(closes, TIMEFRAME_RESOLUTIONS.get(self.timeframe, 'MINUTE_5'))
+            shared_bars = SharedArrays({
+                'time': self.bars.index.values.astype('datetime64[ns]').view(np.int64),
+                **{name: self.bars[name].to_numpy(dtype=np.float64) for name in ('open', 'high', 'low', 'close')},
+                'volatility': volatility,
+                'trend': trend
+            })
+            try:
+                pool = ProcessPoolExecutor(
+                    max_workers=min(self.workers, len(pending)),
+                    initializer=_init_worker,
+                    initargs=(shared_bars.spec, self.timeframe, self.fill, self.initial_balance, self.warmup_bars)
+                )
+                with pool:
+                    futures = {
+                        pool.submit(_run_window, window, combinations, metric, self.model_factory, self.trainer): key
+                        for key, window in pending
+                    }
+                    done = 0
+                    for future in as_completed(futures):
+                        key = futures[future]
+                        finished[key] = future.result()
+                        if self.cache_dir:
+                            with open(self._cache_path(key), 'w') as f:
+                                json.dump(finished[key], f, default=float)
+                        done += 1
+                        print(f"\r⏳ {done}/{len(pending)} windows", end='', flush=True)
+                print()
+                print(colored(f"✅ Walk-forward finished in {time.time() - started:.1f}s", "green"))
+            finally:
+                shared_bars.close()
+
+        index = self.bars.index
+        rows = []
+        for key, window in zip(keys, windows):
+            result = finished[key]
+            rows.append({
+                'train_from': index[window['train_start']],
+                'test_from': index[window['test_start']],
+                'test_to': index[window['test_end'] - 1],
+                **result['params'],
+                f'train_{metric}': result['train'][metric],
+                **{f'test_{name}': result['test'][name] for name in RESULT_METRICS}
+            })
+        return pd.DataFrame(rows)
+
+
+def print_walkforward_results(results: pd.DataFrame):
+    """Print every window and the stitched out-of-sample result"""
+    if results.empty:
+        print("\nNo complete walk-forward windows.")
+        return
+    print(colored(f"\n=== Walk-forward: {len(results)} windows ===", "cyan"))
+    print(tabulate(results, headers='keys', tablefmt='grid', floatfmt='.4g', showindex=range(1, len(results) + 1)))
+
+    compounded = (np.prod(1 + results['test_return_percentage'].to_numpy(dtype=np.float64) / 100) - 1) * 100
+    profitable = (results['test_return_percentage'] > 0).mean() * 100
+    color = "green" if compounded >= 0 else "red"
+    print(colored(f"📈 Out-of-sample return: {compounded:.2f}% over {int(results['test_total_trades'].sum())} trades, "
+                  f"{profitable:.0f}% of test windows profitable", color))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Walk-forward optimization over TRADING_CONFIG")
+    parser.add_argument('--bars', required=True, help="CSV with timestamp, open, high, low and close columns")
+    parser.add_argument('--timeframe', default='5m', choices=sorted(TIMEFRAME_RESOLUTIONS))
+    parser.add_argument('--param', action='append', default=[], metavar='KEY=V1,V2',
+                        help="Values of a TRADING_CONFIG key (repeatable), or KEY=LOW:HIGH with --random")
+    parser.add_argument('--random', type=int, default=0, help="Random combinations instead of the full grid")
+    parser.add_argument('--seed', type=int, default=0, help="Seed of --random and of the model weights without --weights")
+    parser.add_argument('--weights', help="LorentzianModel weights (the starting weights with --retrain)")
+    parser.add_argument('--train-bars', type=int, default=None)
+    parser.add_argument('--test-bars', type=int, default=None)
+    parser.add_argument('--step-bars', type=int, default=None)
+    parser.add_argument('--anchored', action='store_true', default=None)
+    parser.add_argument('--retrain', action='store_true', help="Retrain LorentzianModel on every train window")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache-dir', default=BACKTEST_CONFIG['walkforward_cache_dir'])
+    parser.add_argument('--metric', default='return_percentage', choices=RESULT_METRICS)
+    args = parser.parse_args()
+
+    space = parse_space(args.param, ranges=bool(args.random))
+    combinations = random_search(space, args.random, args.seed) if args.random else grid(space)
+
+    bars = pd.read_csv(args.bars, parse_dates=['timestamp'], index_col='timestamp')
+    walk = WalkForward(
+        bars,
+        timeframe=args.timeframe,
+        train_bars=args.train_bars,
+        test_bars=args.test_bars,
+        step_bars=args.step_bars,
+        anchored=args.anchored,
+        model_factory=functools.partial(default_model, args.weights, args.seed),
+        trainer=train_model if args.retrain else None,
+        workers=args.workers,
+        cache_dir=args.cache_dir
+    )
+    print_walkforward_results(walk.run(combinations, metric=args.metric))
+
+
+if __name__ == '__main__':
+    main()
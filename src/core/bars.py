@@ -0,0 +1,327 @@
+import threading
+import numpy as np
+import pandas as pd
+from typing import Callable, Dict, Optional
+from termcolor import colored
+
+BAR_COLUMNS = ('open', 'high', 'low', 'close', 'volume')
+
+
+class _BarBuffer:
+    """Preallocated OHLCV columns for one epic.
+
+    Arrays hold twice the window so appending only copies the window back to
+    the front once every ``max_bars`` bars, and the live window is always a
+    contiguous slice.
+    """
+
+    def __init__(self, max_bars: int):
+        self.max_bars = max_bars
+        self.time = np.zeros(2 * max_bars, dtype=np.int64)  # Bar start in epoch milliseconds
+        self.columns = {column: np.zeros(2 * max_bars, dtype=np.float64) for column in BAR_COLUMNS}
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    def last_time(self) -> Optional[int]:
+        return int(self.time[self.end - 1]) if self.end > self.start else None
+
+    def append(self, t: int, values: Dict[str, float]):
+        if self.end == len(self.time):
+            keep = self.max_bars - 1
+            self.time[:keep] = self.time[self.end - keep:self.end]
+            for column in self.columns.values():
+                column[:keep] = column[self.end - keep:self.end]
+            self.start, self.end = 0, keep
+        self.time[self.end] = t
+        for name, column in self.columns.items():
+            column[self.end] = values[name]
+        self.end += 1
+        if self.end - self.start > self.max_bars:
+            self.start += 1
+
+    def set(self, index: int, values: Dict[str, float]):
+        for name, value in values.items():
+            self.columns[name][self.start + index] = value
+
+    def find(self, t: int) -> Optional[int]:
+        """Index of the bar starting at t within the window"""
+        window = self.time[self.start:self.end]
+        index = int(np.searchsorted(window, t))
+        return index if index < len(window) and window[index] == t else None
+
+    def replace(self, times: np.ndarray, columns: Dict[str, np.ndarray]):
+        times, columns = times[-self.max_bars:], {name: values[-self.max_bars:] for name, values in columns.items()}
+        self.start, self.end = 0, len(times)
+        self.time[:self.end] = times
+        for name, column in self.columns.items():
+            column[:self.end] = columns[name]
+
+    def view(self) -> Dict[str, np.ndarray]:
+        result = {'time': self.time[self.start:self.end]}
+        for name, column in self.columns.items():
+            result[name] = column[self.start:self.end]
+        return result
+
+
+class BarStore:
+    """Rolling OHLCV bars per epic, shared by the trader and its strategies.
+
+    History is loaded from REST once and then kept current by OHLC bars
+    streamed from the broker. Quotes are aggregated into a local shadow bar
+    that stands in for the forming bar while the stream has not delivered it,
+    and is reconciled against the streamed bar once that bar closes.
+    """
+
+    def __init__(self, bar_seconds: int, max_bars: int = 1000, tolerance: float = 0.001):
+        """
+        Initialize BarStore
+
+        Args:
+            bar_seconds: Bar length in seconds
+            max_bars: Bars kept per epic
+            tolerance: Relative OHLC difference between a streamed and a locally
+                aggregated bar above which the bar counts as a mismatch
+        """
+        self.bar_ms = bar_seconds * 1000
+        self.max_bars = max_bars
+        self.tolerance = tolerance
+        self._buffers: Dict[str, _BarBuffer] = {}
+        self._sources: Dict[str, str] = {}  # Source of the newest bar per epic ('history', 'stream' or 'local')
+        self._local: Dict[str, Dict[str, float]] = {}  # Forming shadow bar per epic
+        self._local_closed: Dict[str, Dict[int, Dict[str, float]]] = {}  # Recently closed shadow bars per epic
+        self._stream_times: Dict[str, int] = {}  # Newest streamed bar time per epic
+        self._versions: Dict[str, int] = {}
+        self._frames: Dict[str, tuple] = {}
+        self._bar_listeners = []
+        self._lock = threading.RLock()
+        self.stats = {'stream_updates': 0, 'local_bars': 0, 'reconciled': 0, 'mismatches': 0, 'max_deviation': 0.0}
+
+    def add_bar_listener(self, listener: Callable[[str, int], None]):
+        """Call listener(epic, bar_time_ms) whenever a bar of an epic closes"""
+        self._bar_listeners.append(listener)
+
+    def _buffer(self, epic: str) -> _BarBuffer:
+        if epic not in self._buffers:
+            self._buffers[epic] = _BarBuffer(self.max_bars)
+        return self._buffers[epic]
+
+    def _touch(self, epic: str):
+        self._versions[epic] = self._versions.get(epic, 0) + 1
+
+    def load(self, epic: str, columns: Dict[str, np.ndarray], replace: bool = True, since: Optional[int] = None):
+        """
+        Load decoded price history columns for an epic
+
+        Args:
+            epic: Instrument the bars belong to
+            columns: Columns as returned by decode_prices ('timestamp' as datetime64)
+            replace: Replace the stored bars, otherwise merge with them and let
+                the loaded bars win where both have the same bar time
+            since: Drop the bars starting before this time (epoch milliseconds),
+                so merged history does not skip from older bars to the loaded ones
+        """
+        times = columns['timestamp'].astype('datetime64[ms]').astype(np.int64)
+        values = {name: np.asarray(columns[name], dtype=np.float64) for name in BAR_COLUMNS}
+
+        with self._lock:
+            buffer = self._buffer(epic)
+            if not replace and len(buffer):
+                current = buffer.view()
+                keep = ~np.isin(current['time'], times)
+                times = np.concatenate([current['time'][keep], times])
+                values = {name: np.concatenate([current[name][keep], values[name]]) for name in BAR_COLUMNS}
+            if since is not None:
+                recent = times >= since
+                times = times[recent]
+                values = {name: column[recent] for name, column in values.items()}
+
+            order = np.argsort(times, kind='stable')
+            times = times[order]
+            values = {name: column[order] for name, column in values.items()}
+            # Drop duplicate bar times, keeping the last one
+            unique = np.append(times[1:] != times[:-1], True) if len(times) else np.ones(0, dtype=bool)
+            buffer.replace(times[unique], {name: column[unique] for name, column in values.items()})
+            self._sources[epic] = 'history'
+            self._touch(epic)
+
+    def update_bar(self, epic: str, t: int, open_: float, high: float, low: float, close: float) -> bool:
+        """
+        Apply a streamed OHLC bar, returns True when it opened a new bar
+
+        Args:
+            epic: Instrument the bar belongs to
+            t: Bar start in epoch milliseconds
+            open_, high, low, close: Bar prices so far
+        """
+        with self._lock:
+            buffer = self._buffer(epic)
+            shadow = self._local.get(epic)
+            ticks = shadow['volume'] if shadow and shadow['t'] == t else 0.0
+            values = {'open': open_, 'high': high, 'low': low, 'close': close}
+            last_time = buffer.last_time()
+            previous_stream = self._stream_times.get(epic)
+            self._stream_times[epic] = t if previous_stream is None else max(previous_stream, t)
+            self.stats['stream_updates'] += 1
+
+            opened = False
+            if last_time is None or t > last_time:
+                values['volume'] = ticks
+                buffer.append(t, values)
+                self._sources[epic] = 'stream'
+                opened = True
+            else:
+                index = buffer.find(t)
+                if index is None:
+                    return False  # Older than the window
+                if t == last_time:
+                    values['volume'] = max(ticks, buffer.columns['volume'][buffer.end - 1])
+                    self._sources[epic] = 'stream'
+                buffer.set(index, values)
+            self._touch(epic)
+
+            # The stream moving on to a new bar means its previous bar is final
+            if previous_stream is not None and t > previous_stream:
+                self._reconcile(epic, previous_stream)
+            if opened and last_time is not None:
+                self._notify_closed(epic, last_time)
+            return opened
+
+    def update_quote(self, epic: str, price: float, timestamp: int) -> bool:
+        """
+        Aggregate a quote into the local shadow bar, returns True when it opened a new bar
+
+        The shadow bar only becomes the stored bar while the stream has not
+        delivered the bar yet; a streamed bar for the same time replaces it.
+
+        Args:
+            epic: Instrument the quote belongs to
+            price: Quote price on the side the bars are built from
+            timestamp: Quote time in epoch milliseconds
+        """
+        with self._lock:
+            t = timestamp - timestamp % self.bar_ms
+            shadow = self._local.get(epic)
+            if shadow is None or t > shadow['t']:
+                if shadow is not None:
+                    closed = self._local_closed.setdefault(epic, {})
+                    closed[shadow['t']] = shadow
+                    # Streamed bars close within a few seconds, a handful of bars is plenty
+                    for old in sorted(closed)[:-3]:
+                        del closed[old]
+                    if self._stream_times.get(epic, -1) > shadow['t']:
+                        self._reconcile(epic, shadow['t'])
+                # A shadow bar is only comparable if quotes were seen from the start of the bar
+                complete = shadow is not None and shadow['t'] == t - self.bar_ms
+                shadow = self._local[epic] = {
+                    't': t, 'open': price, 'high': price, 'low': price, 'close': price, 'volume': 0.0, 'complete': complete
+                }
+            elif t < shadow['t']:
+                return False  # Late quote for a bar that already closed
+            shadow['high'] = max(shadow['high'], price)
+            shadow['low'] = min(shadow['low'], price)
+            shadow['close'] = price
+            shadow['volume'] += 1
+
+            buffer = self._buffer(epic)
+            last_time = buffer.last_time()
+            values = {name: shadow[name] for name in BAR_COLUMNS}
+            if last_time is None or t > last_time:
+                closed = last_time
+                buffer.append(t, values)
+                self._sources[epic] = 'local'
+                self.stats['local_bars'] += 1
+                self._touch(epic)
+                if closed is not None:
+                    self._notify_closed(epic, closed)
+                return True
+            if t == last_time and self._sources.get(epic) == 'local':
+                # Keep the forming bar current until the stream delivers it
+                buffer.set(len(buffer) - 1, values)
+                self._touch(epic)
+            elif t == last_time and self._sources.get(epic) == 'history':
+                # The loaded bar saw quotes we missed, only extend it
+                last = buffer.end - 1
+                buffer.set(len(buffer) - 1, {
+                    'high': max(buffer.columns['high'][last], price),
+                    'low': min(buffer.columns['low'][last], price),
+                    'close': price
+                })
+                self._touch(epic)
+            return False
+
+    def _reconcile(self, epic: str, t: int):
+        """
+        Compare a final streamed bar with the bar aggregated from local quotes
+
+        Runs once both the stream and the local quotes have moved past the bar,
+        whichever happens last.
+        """
+        shadow = self._local_closed.get(epic, {}).pop(t, None)
+        buffer = self._buffers[epic]
+        index = buffer.find(t)
+        if shadow is None or not shadow['complete'] or index is None:
+            return
+
+        deviation = 0.0
+        for name in ('open', 'high', 'low', 'close'):
+            streamed = buffer.columns[name][buffer.start + index]
+            if streamed:
+                deviation = max(deviation, float(abs(streamed - shadow[name]) / abs(streamed)))
+        self.stats['reconciled'] += 1
+        self.stats['max_deviation'] = max(self.stats['max_deviation'], deviation)
+        if deviation > self.tolerance:
+            self.stats['mismatches'] += 1
+            print(colored(f"⚠️ {epic} bar {pd.Timestamp(t, unit='ms')} differs from local quotes by {deviation:.3%}", "yellow"))
+
+    def _notify_closed(self, epic: str, t: int):
+        """Tell bar listeners that the bar of an epic starting at t closed"""
+        for listener in self._bar_listeners:
+            try:
+                listener(epic, t)
+            except Exception as e:
+                print(colored(f"❌ Error in bar listener: {e}", "red"))
+
+    def get_arrays(self, epic: str) -> Dict[str, np.ndarray]:
+        """Get copies of the time (epoch ms) and OHLCV columns of an epic"""
+        with self._lock:
+            if epic not in self._buffers:
+                return {}
+            return {name: values.copy() for name, values in self._buffers[epic].view().items()}
+
+    def get_frame(self, epic: str) -> Optional[pd.DataFrame]:
+        """Get the bars of an epic as a DataFrame indexed by timestamp, rebuilt only after changes"""
+        with self._lock:
+            if epic not in self._buffers or not len(self._buffers[epic]):
+                return None
+            version = self._versions.get(epic, 0)
+            cached = self._frames.get(epic)
+            if cached is not None and cached[0] == version:
+                return cached[1]
+
+            view = self._buffers[epic].view()
+            index = pd.DatetimeIndex(view.pop('time').astype('datetime64[ms]').astype('datetime64[ns]'), name='timestamp')
+            frame = pd.DataFrame({name: values.copy() for name, values in view.items()}, index=index)
+            self._frames[epic] = (version, frame)
+            return frame
+
+    def last_bar_time(self, epic: str) -> Optional[int]:
+        """Start of the newest bar of an epic in epoch milliseconds"""
+        with self._lock:
+            buffer = self._buffers.get(epic)
+            return buffer.last_time() if buffer else None
+
+    def last_close(self, epic: str) -> Optional[float]:
+        """Close of the newest bar of an epic"""
+        with self._lock:
+            buffer = self._buffers.get(epic)
+            if buffer is None or not len(buffer):
+                return None
+            return float(buffer.columns['close'][buffer.end - 1])
+
+    def get_stats(self) -> Dict[str, float]:
+        """Get streamed update, local fallback and reconciliation counts"""
+        with self._lock:
+            return dict(self.stats)
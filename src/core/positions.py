@@ -1,21 +1,179 @@
 from datetime import datetime
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple, Union
 from src.utils.visualization import print_positions
 from src.database import DatabaseManager, DB_CONFIG, TRADE_STATUS
-import pandas as pd
+from src.core.triggers import TriggerIndex
 import numpy as np
 import talib
 
+# Exit rule parameters per resolution
+EXIT_PARAMS = {
+    'MINUTE_1': {
+        'bars': 30,                    # Bars used for volatility and EMAs
+        'bars_per_day': 1440,
+        'ema_fast': 10,                # 10 minutes
+        'ema_slow': 30,                # 30 minutes
+        'min_hold_time': 5,            # 5 minutes minimum
+        'trend_threshold': 0.0005,     # 0.05%
+        'volatility_threshold': 0.10,  # 10% daily
+        'max_loss': -0.015             # -1.5%
+    },
+    'MINUTE_5': {
+        'bars': 12,
+        'bars_per_day': 288,
+        'ema_fast': 6,                 # 30 minutes
+        'ema_slow': 12,                # 1 hour
+        'min_hold_time': 15,           # 15 minutes minimum
+        'trend_threshold': 0.001,      # 0.1%
+        'volatility_threshold': 0.15,  # 15% daily
+        'max_loss': -0.02              # -2%
+    }
+}
+
+
+def exit_params(resolution: str) -> Dict:
+    """Exit parameters of a resolution (MINUTE and MINUTE_1 are the same)"""
+    if resolution == 'MINUTE':
+        resolution = 'MINUTE_1'
+    return EXIT_PARAMS.get(resolution, EXIT_PARAMS['MINUTE_5'])
+
+
+def _window_ema(windows: np.ndarray, period: int) -> np.ndarray:
+    """Last value of talib.EMA over each row (seeded with the SMA of the first period values)"""
+    ema = windows[:, :period].mean(axis=1)
+    alpha = 2.0 / (period + 1)
+    for column in range(period, windows.shape[1]):
+        ema = ema + alpha * (windows[:, column] - ema)
+    return ema
+
+
+def exit_indicator_series(closes: np.ndarray, resolution: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Exit rule volatility and trend strength at every bar at once
+
+    Values match what ActivePositions computes from the bar store when the bar
+    is the last one; bars without enough history are NaN.
+    """
+    params = exit_params(resolution)
+    closes = np.asarray(closes, dtype=np.float64)
+    volatility = np.full(len(closes), np.nan)
+    trend = np.full(len(closes), np.nan)
+    bars = params['bars']
+    if len(closes) < bars:
+        return volatility, trend
+    
+    windows = np.lib.stride_tricks.sliding_window_view(closes, bars)
+    returns = np.diff(windows, axis=1) / windows[:, :-1]
+    volatility[bars - 1:] = np.std(returns, axis=1, ddof=1) * np.sqrt(params['bars_per_day'])
+    ema_fast = _window_ema(windows, params['ema_fast'])
+    ema_slow = _window_ema(windows, params['ema_slow'])
+    trend[bars - 1:] = (ema_fast - ema_slow) / ema_slow
+    return volatility, trend
+
+
+class PositionBook:
+    """Open positions stored as parallel NumPy columns.
+
+    Numeric fields live in one array each so every position can be marked to
+    market with a single vectorized operation; the original position dicts
+    (trade and deal ids, symbol, ...) are kept in ``records`` in the same order.
+    """
+
+    COLUMNS = ('entry', 'size', 'side', 'stop_loss', 'take_profit', 'entry_time', 'pnl')
+    PARAM_COLUMNS = ('min_hold_time', 'trend_threshold', 'volatility_threshold', 'max_loss')
+
+    def __init__(self, capacity: int = 16):
+        self.columns = {name: np.zeros(capacity) for name in self.COLUMNS + self.PARAM_COLUMNS}
+        self.records: List[Dict] = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        """Column of the open positions"""
+        return self.columns[name][:len(self.records)]
+
+    def add(self, position: Dict):
+        """Append a position dict (signal, entry_price, position_size, stop_loss, take_profit, entry_time)"""
+        count = len(self.records)
+        if count == len(self.columns['entry']):
+            for name, column in self.columns.items():
+                self.columns[name] = np.concatenate([column, np.zeros(len(column))])
+
+        entry_time = position.get('entry_time')
+        values = {
+            'entry': position['entry_price'],
+            'size': position['position_size'],
+            'side': 1.0 if position['signal'] > 0 else -1.0,
+            'stop_loss': position.get('stop_loss') or np.nan,
+            'take_profit': position.get('take_profit') or np.nan,
+            'entry_time': entry_time.timestamp() if entry_time else np.nan,
+            'pnl': 0.0
+        }
+        # Exit rule parameters of the position's timeframe
+        params = exit_params(position.get('timeframe', 'MINUTE_5'))
+        values.update({name: params[name] for name in self.PARAM_COLUMNS})
+        for name, value in values.items():
+            self.columns[name][count] = value
+        self.records.append(position)
+
+    def mark_to_market(self, prices: np.ndarray) -> np.ndarray:
+        """Update and return the P&L of every position (as a fraction of size) at prices"""
+        count = len(self.records)
+        entry = self.columns['entry'][:count]
+        pnl = self.columns['pnl'][:count]
+        marked = self.columns['side'][:count] * self.columns['size'][:count] * (prices - entry) / entry
+        # Positions without a price keep their last P&L
+        np.copyto(pnl, marked, where=~np.isnan(marked))
+        return pnl
+
+    def remove(self, mask: np.ndarray) -> List[Dict]:
+        """Drop the positions selected by mask and return their records"""
+        count = len(self.records)
+        keep = ~mask
+        kept = int(keep.sum())
+        for column in self.columns.values():
+            column[:kept] = column[:count][keep]
+        removed = [record for record, drop in zip(self.records, mask) if drop]
+        self.records = [record for record, drop in zip(self.records, mask) if not drop]
+        return removed
+
+    def mask(self, keys) -> np.ndarray:
+        """Boolean mask of the positions whose position_key is in keys"""
+        return np.array([record['position_key'] in keys for record in self.records], dtype=bool)
+
+
 class ActivePositions:
-    def __init__(self, session_id: int):
-        self.positions = []
+    def __init__(self, session_id: int, bar_store=None, persist: bool = True):
+        self.book = PositionBook()
         self.session_id = session_id
-        self.db = DatabaseManager(**DB_CONFIG)
+        self.bar_store = bar_store  # Shared BarStore the exit rule indicators are computed from
+        self._indicators: Dict[Tuple[str, str], Tuple] = {}
+        self.triggers = TriggerIndex()  # Stop loss and take profit levels by price
+        self._next_key = 1
+        # Backtests track positions in memory only
+        self.db = DatabaseManager(**DB_CONFIG) if persist else None
+
+    @property
+    def positions(self) -> List[Dict]:
+        """Open position dicts with their current P&L"""
+        for record, pnl in zip(self.book.records, self.book['pnl']):
+            record['current_pnl'] = float(pnl)
+        return list(self.book.records)
         
     def add_position(self, position_data: Dict):
         """Add a new position to track and database"""
         # Add to local tracking
-        self.positions.append(position_data)
+        position_data['position_key'] = self._next_key
+        self._next_key += 1
+        self.book.add(position_data)
+        self.triggers.add(
+            position_data['position_key'], position_data['signal'],
+            stop_loss=position_data.get('stop_loss'), take_profit=position_data.get('take_profit')
+        )
+        
+        if self.db is None:
+            return
         
         # Add to database
         trade_id = self.db.create_trade(
@@ -33,116 +191,180 @@ class ActivePositions:
             print(f"✅ Position added to database with ID: {trade_id}")
         else:
             print("❌ Failed to add position to database")
+
+    def _exit_indicators(self, symbol: str, resolution: str) -> Optional[Tuple[float, float]]:
+        """Daily volatility and EMA trend strength of a symbol, computed once per bar"""
+        if self.bar_store is None:
+            cached = self._indicators.get((symbol, resolution))
+            return cached[1] if cached else None
+        bar_time = self.bar_store.last_bar_time(symbol)
+        if bar_time is None:
+            return None
+        key = (symbol, resolution)
+        cached = self._indicators.get(key)
+        if cached is not None and cached[0] == bar_time:
+            return cached[1]
         
-    def update_positions(self, current_price: float) -> List[Dict]:
-        """Update all positions and return closed ones"""
-        updated_positions = []
-        closed_positions = []
+        params = exit_params(resolution)
+        closes = self.bar_store.get_arrays(symbol)['close'][-params['bars']:]
+        if len(closes) < 2:
+            return None
         
-        for position in self.positions:
-            pnl = self.calculate_position_pnl(position, current_price)
-            position['current_pnl'] = pnl
+        # Calculate volatility adapted to timeframe (scaled to daily)
+        returns = np.diff(closes) / closes[:-1]
+        volatility = np.std(returns, ddof=1) * np.sqrt(params['bars_per_day'])
+        
+        # Calculate EMAs adapted to timeframe
+        ema_fast = talib.EMA(closes, timeperiod=params['ema_fast'])
+        ema_slow = talib.EMA(closes, timeperiod=params['ema_slow'])
+        trend_strength = (ema_fast[-1] - ema_slow[-1]) / ema_slow[-1]
+        
+        self._indicators[key] = (bar_time, (volatility, trend_strength))
+        return volatility, trend_strength
+
+    def set_exit_indicators(self, symbol: str, resolution: str, volatility: float, trend_strength: float):
+        """Provide precomputed exit rule indicators, used when there is no bar store"""
+        self._indicators[(symbol, resolution)] = (None, (volatility, trend_strength))
+        
+    def update_positions(self, current_price: Union[float, Dict[str, float]], now: Optional[datetime] = None) -> List[Dict]:
+        """
+        Mark all positions to market and return the ones closed by the exit rules
+        
+        Args:
+            current_price: Price of every position, or a price per symbol
+            now: Current time (defaults to the wall clock, backtests pass the bar time)
+        """
+        book = self.book
+        count = len(book)
+        if count == 0:
+            return []
+        
+        if isinstance(current_price, dict):
+            prices = np.array([current_price.get(record['symbol'], np.nan) for record in book.records])
+        else:
+            prices = np.full(count, float(current_price))
+        pnl = book.mark_to_market(prices)
+        
+        # Exit rule inputs per position: indicators are shared by positions of the same symbol and timeframe
+        groups: Dict[Tuple[str, str], List[int]] = {}
+        for i, record in enumerate(book.records):
+            groups.setdefault((record['symbol'], record.get('timeframe', 'MINUTE_5')), []).append(i)
+        volatility = np.full(count, np.nan)
+        trend = np.full(count, np.nan)
+        for (symbol, resolution), indices in groups.items():
+            indicators = self._exit_indicators(symbol, resolution)
+            if indicators is not None:
+                volatility[indices], trend[indices] = indicators
+        params = {name: book[name] for name in book.PARAM_COLUMNS}
+        
+        # Calculate time in minutes
+        now = now or datetime.now()
+        time_in_trade = (now.timestamp() - book['entry_time']) / 60
+        evaluated = ~np.isnan(book['entry_time']) & ~np.isnan(trend) & ~np.isnan(prices)
+        
+        # Longs close on a falling trend, shorts on a rising one (direction-adjusted trend)
+        side = book['side']
+        against = side * trend < -params['trend_threshold']
+        with_trend = side * trend > params['trend_threshold']
+        in_profit = pnl > 0
+        
+        close_winner = in_profit & against & (volatility > params['volatility_threshold'])
+        recovering = ~in_profit & with_trend & (time_in_trade > params['min_hold_time'])
+        close_loser = ~in_profit & ~recovering & (pnl < params['max_loss']) & against
+        should_close = evaluated & (close_winner | close_loser)
+        
+        kind = {1.0: 'long', -1.0: 'short'}
+        holding = evaluated & recovering
+        if holding.any():
+            for i in np.flatnonzero(holding):
+                print(f"💪 Holding losing {kind[side[i]]} position - Recovery signals detected")
+        if not should_close.any():
+            return []
+        for i in np.flatnonzero(should_close):
+            if close_winner[i]:
+                print(f"🔄 Closing winning {kind[side[i]]} position - Weak trend and high volatility")
+            else:
+                print(f"🔄 Closing losing {kind[side[i]]} position - No recovery signals")
+        
+        return self._close_positions(should_close, prices, now)
+
+    def _close_positions(self, mask: np.ndarray, prices: np.ndarray, now: Optional[datetime] = None) -> List[Dict]:
+        """Remove the positions selected by mask at their exit prices and record them in the database"""
+        closed_pnl = self.book['pnl'][mask].copy()
+        closed_prices = prices[mask]
+        closed_positions = self.book.remove(mask)
+        exit_time = now or datetime.now()
+        for position, position_pnl, exit_price in zip(closed_positions, closed_pnl, closed_prices):
+            self.triggers.remove(position['position_key'])
+            position['current_pnl'] = float(position_pnl)
+            position['exit_price'] = float(exit_price)
+            position['exit_time'] = exit_time
             
-            entry_time = position.get('entry_time')
-            if entry_time:
-                # Calculate time in minutes
-                time_in_trade = (datetime.now() - entry_time).total_seconds() / 60
-                
-                # Get historical data according to timeframe
-                resolution = position.get('timeframe', 'MINUTE_5')
-                bars_needed = 30 if resolution == 'MINUTE_1' else 12
-                
-                market_data = self.capital_api.get_price_history(
-                    position['symbol'],
-                    resolution=resolution,
-                    max_bars=bars_needed
+            # Update trade in database
+            if self.db is not None and 'trade_id' in position:
+                self.db.update_trade(
+                    trade_id=position['trade_id'],
+                    exit_price=float(exit_price),
+                    profit_loss=float(position_pnl),
+                    status=TRADE_STATUS['CLOSED']
                 )
-                
-                if market_data and 'prices' in market_data:
-                    df = pd.DataFrame([{
-                        'close': float(price['closePrice']['bid'])
-                    } for price in market_data['prices']])
-                    
-                    # Calculate volatility adapted to timeframe
-                    if resolution == 'MINUTE_1':
-                        volatility = df['close'].pct_change().std() * np.sqrt(1440)  # Scale to daily
-                    else:  # MINUTE_5
-                        volatility = df['close'].pct_change().std() * np.sqrt(288)   # Scale to daily
-                    
-                    # Calculate EMAs adapted to timeframe
-                    if resolution == 'MINUTE_1':
-                        ema_fast = talib.EMA(df['close'], timeperiod=10)  # 10 minutes
-                        ema_slow = talib.EMA(df['close'], timeperiod=30)  # 30 minutes
-                    else:  # MINUTE_5
-                        ema_fast = talib.EMA(df['close'], timeperiod=6)   # 30 minutes
-                        ema_slow = talib.EMA(df['close'], timeperiod=12)  # 1 hour
-                    
-                    trend_strength = (ema_fast[-1] - ema_slow[-1]) / ema_slow[-1]
-                    
-                    # Parameters adapted to timeframe
-                    params = {
-                        'MINUTE_1': {
-                            'min_hold_time': 5,        # 5 minutes minimum
-                            'trend_threshold': 0.0005,  # 0.05%
-                            'volatility_threshold': 0.10,  # 10% daily
-                            'max_loss': -0.015         # -1.5%
-                        },
-                        'MINUTE_5': {
-                            'min_hold_time': 15,       # 15 minutes minimum
-                            'trend_threshold': 0.001,   # 0.1%
-                            'volatility_threshold': 0.15,  # 15% daily
-                            'max_loss': -0.02          # -2%
-                        }
-                    }
-                    
-                    current_params = params.get(resolution, params['MINUTE_5'])
-                    
-                    should_close = False
-                    
-                    if position['signal'] > 0:  # Long position
-                        if pnl > 0:  # In profit
-                            if trend_strength < -current_params['trend_threshold'] and volatility > current_params['volatility_threshold']:
-                                should_close = True
-                                print(f"🔄 Closing winning long position - Weak trend and high volatility")
-                        else:  # In loss
-                            if trend_strength > current_params['trend_threshold'] and time_in_trade > current_params['min_hold_time']:
-                                print(f"💪 Holding losing long position - Recovery signals detected")
-                            elif (pnl < current_params['max_loss'] and trend_strength < -current_params['trend_threshold']):
-                                should_close = True
-                                print(f"🔄 Closing losing long position - No recovery signals")
-                    
-                    else:  # Short position
-                        if pnl > 0:  # In profit
-                            if trend_strength > current_params['trend_threshold'] and volatility > current_params['volatility_threshold']:
-                                should_close = True
-                                print(f"🔄 Closing winning short position - Weak trend and high volatility")
-                        else:  # In loss
-                            if trend_strength < -current_params['trend_threshold'] and time_in_trade > current_params['min_hold_time']:
-                                print(f"💪 Holding losing short position - Recovery signals detected")
-                            elif (pnl < current_params['max_loss'] and trend_strength > current_params['trend_threshold']):
-                                should_close = True
-                                print(f"🔄 Closing losing short position - No recovery signals")
-                    
-                    if should_close:
-                        position['exit_price'] = current_price
-                        position['exit_time'] = datetime.now()
-                        closed_positions.append(position)
-                        
-                        # Update trade in database
-                        if 'trade_id' in position:
-                            self.db.update_trade(
-                                trade_id=position['trade_id'],
-                                exit_price=current_price,
-                                profit_loss=pnl,
-                                status=TRADE_STATUS['CLOSED']
-                            )
-                            print(f"✅ Updated closed position {position['trade_id']} in database")
-                    else:
-                        updated_positions.append(position)
-        
-        self.positions = updated_positions
+                print(f"✅ Updated closed position {position['trade_id']} in database")
+        
         return closed_positions
         
+    def check_triggers(self, bid: float, ask: Optional[float] = None, now: Optional[datetime] = None) -> List[Dict]:
+        """
+        Close the positions whose stop loss or take profit was crossed
+
+        Args:
+            bid: Price longs exit at
+            ask: Price shorts exit at (defaults to bid)
+            now: Exit time (defaults to the wall clock)
+
+        Returns:
+            Closed positions with hit_price and exit_reason set
+        """
+        hits = self.triggers.check(bid, ask)
+        if not hits:
+            return []
+        
+        ask = bid if ask is None else ask
+        sides = {record['position_key']: record['signal'] for record in self.book.records}
+        exit_prices = {key: bid if sides[key] > 0 else ask for key, _, _ in hits}
+        return self.close_positions(exit_prices, {key: kind for key, kind, _ in hits}, now)
+
+    def close_positions(self, exit_prices: Dict[int, float], reasons: Optional[Dict[int, str]] = None,
+                        now: Optional[datetime] = None) -> List[Dict]:
+        """
+        Close positions at given fill prices
+        
+        Args:
+            exit_prices: Fill price per position_key
+            reasons: Exit reason per position_key ('stop_loss', 'take_profit', ...)
+            now: Exit time (defaults to the wall clock)
+        
+        Returns:
+            Closed positions with hit_price and exit_reason set
+        """
+        mask = self.book.mask(exit_prices)
+        prices = np.array([exit_prices.get(record['position_key'], np.nan) for record in self.book.records])
+        self.book.mark_to_market(prices)
+        closed_positions = self._close_positions(mask, prices, now)
+        for position in closed_positions:
+            position['hit_price'] = position['exit_price']
+            if reasons:
+                position['exit_reason'] = reasons.get(position['position_key'])
+        return closed_positions
+
+    def trail_stop(self, position: Dict, stop_loss: float) -> bool:
+        """Move the stop loss of a position in its favour, returns whether it moved"""
+        key = position['position_key']
+        if key not in self.triggers or not self.triggers.trail_stop(key, stop_loss):
+            return False
+        position['stop_loss'] = stop_loss
+        self.book['stop_loss'][self.book.mask({key})] = stop_loss
+        return True
+
     def calculate_position_pnl(self, position: Dict, current_price: float) -> float:
         """Calculate current P&L for a position"""
         if position['signal'] > 0:  # Long position
@@ -162,9 +384,7 @@ class ActivePositions:
             
     def get_positions_summary(self) -> Tuple[int, float]:
         """Get summary of active positions"""
-        total_positions = len(self.positions)
-        total_pnl = sum(pos.get('current_pnl', 0) for pos in self.positions)
-        return total_positions, total_pnl
+        return len(self.book), float(self.book['pnl'].sum())
 
     def display_positions(self):
         """Display current active positions"""
@@ -172,7 +392,7 @@ class ActivePositions:
 
     def has_positions(self) -> bool:
         """Check if there are any active positions"""
-        return len(self.positions) > 0
+        return len(self.book) > 0
         
     def __del__(self):
         """Cleanup when object is destroyed"""
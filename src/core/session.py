@@ -9,14 +9,26 @@ from src.utils.config import DATA_DIR
 from src.database import DatabaseManager, DB_CONFIG, SESSION_STATUS, TRADE_STATUS, TRADE_TYPE
 
 class TradingSession:
-    def __init__(self, initial_balance=1000):
-        # Initialize database connection
-        self.db = DatabaseManager(**DB_CONFIG)
+    def __init__(self, initial_balance=1000, persist: bool = True):
+        """
+        Initialize TradingSession
         
-        # Create new session in database
-        self.session_id = self.db.create_session(initial_balance)
-        if not self.session_id:
-            raise Exception("Failed to create trading session in database")
+        Args:
+            initial_balance: Starting account balance
+            persist: Store the session, its trades and reports in the database and DATA_DIR;
+                backtests keep everything in memory
+        """
+        self.persist = persist
+        self.db = None
+        self.session_id = 0
+        if persist:
+            # Initialize database connection
+            self.db = DatabaseManager(**DB_CONFIG)
+            
+            # Create new session in database
+            self.session_id = self.db.create_session(initial_balance)
+            if not self.session_id:
+                raise Exception("Failed to create trading session in database")
             
         self.trades = []
         self.session_start = datetime.now()
@@ -36,6 +48,8 @@ class TradingSession:
             'largest_loss': 0.0,
             'average_win': 0.0,
             'average_loss': 0.0,
+            'average_pnl': 0.0,
+            'pnl_std': 0.0,
             'win_rate': 0.0,
             'profit_factor': 0.0,
             'initial_balance': initial_balance,
@@ -49,15 +63,24 @@ class TradingSession:
         
         self.equity_curve = [initial_balance]
         self.max_balance = initial_balance
+        # Welford running mean and sum of squared deviations of closed trade P&L
+        self.closed_trades = 0
+        self.pnl_mean = 0.0
+        self.pnl_m2 = 0.0
+        # Trades and columns already written to the CSV report, later saves only append
+        self.report_rows = 0
+        self.report_columns = None
         
         # Create directory for reports if it doesn't exist
-        os.makedirs(DATA_DIR, exist_ok=True)
+        if persist:
+            os.makedirs(DATA_DIR, exist_ok=True)
         
         # Initialize active positions with session_id
-        self.active_positions = ActivePositions(self.session_id)
+        self.active_positions = ActivePositions(self.session_id, persist=persist)
         
         self.last_candle_time = None
         self.last_trade_time = None
+        self.latency_tracker = None  # Set by the trader to dump stage latencies with each report
         self.min_time_between_trades = timedelta(minutes=15)
         
     def simulate_trade_outcome(self, trade_data: Dict) -> tuple[float, str]:
@@ -102,6 +125,14 @@ class TradingSession:
         # Simulate trade outcome
         pnl, outcome = self.simulate_trade_outcome(trade_data)
         
+        # Trades closed at a known fill book the realized P&L, exits between the levels included
+        exit_price = trade_data.get('exit_price')
+        if exit_price is not None and outcome != 'INVALID':
+            direction = 1 if trade_data['signal'] > 0 else -1
+            pnl = position_size * direction * (exit_price - trade_data['entry_price']) / trade_data['entry_price']
+            if outcome == 'OPEN':
+                outcome = 'EXIT'
+        
         trade_data.update({
             'outcome': outcome,
             'pnl': pnl,
@@ -109,15 +140,18 @@ class TradingSession:
         })
         
         # Add trade to database
-        trade_id = self.db.create_trade(
-            session_id=self.session_id,
-            symbol=trade_data['symbol'],
-            trade_type=TRADE_TYPE['BUY'] if trade_data['signal'] > 0 else TRADE_TYPE['SELL'],
-            entry_price=trade_data['entry_price'],
-            quantity=position_size,
-            stop_loss=trade_data['stop_loss'],
-            take_profit=trade_data['take_profit']
-        )
+        if self.db is None:
+            trade_id = len(self.trades) + 1
+        else:
+            trade_id = self.db.create_trade(
+                session_id=self.session_id,
+                symbol=trade_data['symbol'],
+                trade_type=TRADE_TYPE['BUY'] if trade_data['signal'] > 0 else TRADE_TYPE['SELL'],
+                entry_price=trade_data['entry_price'],
+                quantity=position_size,
+                stop_loss=trade_data['stop_loss'],
+                take_profit=trade_data['take_profit']
+            )
         
         if not trade_id:
             print("❌ Failed to create trade in database")
@@ -135,40 +169,45 @@ class TradingSession:
         # Update statistics based on outcome
         if outcome == 'TP':
             self.summary['tp_hits'] += 1
-            self.summary['winning_trades'] += 1
-            self.summary['total_profit'] += pnl
-            self.summary['largest_win'] = max(self.summary['largest_win'], pnl)
-            # Update trade in database
-            self.db.update_trade(
-                trade_id=trade_id,
-                exit_price=trade_data['take_profit'],
-                profit_loss=pnl,
-                status=TRADE_STATUS['CLOSED']
-            )
         elif outcome == 'SL':
             self.summary['sl_hits'] += 1
-            self.summary['losing_trades'] += 1
-            self.summary['total_loss'] -= pnl  # Convert loss to positive for stats
-            self.summary['largest_loss'] = max(self.summary['largest_loss'], -pnl)
+        if outcome in ('TP', 'SL', 'EXIT'):
+            if pnl > 0:
+                self.summary['winning_trades'] += 1
+                self.summary['total_profit'] += pnl
+                self.summary['largest_win'] = max(self.summary['largest_win'], pnl)
+            else:
+                self.summary['losing_trades'] += 1
+                self.summary['total_loss'] -= pnl  # Convert loss to positive for stats
+                self.summary['largest_loss'] = max(self.summary['largest_loss'], -pnl)
+            self.closed_trades += 1
+            delta = pnl - self.pnl_mean
+            self.pnl_mean += delta / self.closed_trades
+            self.pnl_m2 += delta * (pnl - self.pnl_mean)
             # Update trade in database
-            self.db.update_trade(
-                trade_id=trade_id,
-                exit_price=trade_data['stop_loss'],
-                profit_loss=pnl,
-                status=TRADE_STATUS['CLOSED']
-            )
+            if self.db is not None:
+                levels = {'TP': trade_data['take_profit'], 'SL': trade_data['stop_loss']}
+                self.db.update_trade(
+                    trade_id=trade_id,
+                    exit_price=exit_price if exit_price is not None else levels[outcome],
+                    profit_loss=pnl,
+                    status=TRADE_STATUS['CLOSED']
+                )
             
         # Update balance and equity curve
         self.current_balance += pnl
         self.equity_curve.append(self.current_balance)
         self.max_balance = max(self.max_balance, self.current_balance)
+        drawdown = (self.max_balance - self.current_balance) / self.max_balance * 100
+        self.summary['max_drawdown'] = max(self.summary['max_drawdown'], drawdown)
         
         # Update session in database
-        self.db.update_session(
-            session_id=self.session_id,
-            final_balance=self.current_balance,
-            profit_loss=self.current_balance - self.initial_balance
-        )
+        if self.db is not None:
+            self.db.update_session(
+                session_id=self.session_id,
+                final_balance=self.current_balance,
+                profit_loss=self.current_balance - self.initial_balance
+            )
         
     def print_trades_table(self):
         """Print table of all trades"""
@@ -231,6 +270,7 @@ class TradingSession:
             ['Largest Loss', f"{Fore.RED}${self.summary['largest_loss']:.2f}{Style.RESET_ALL}"],
             ['Average Win', f"{Fore.GREEN}${self.summary['average_win']:.2f}{Style.RESET_ALL}"],
             ['Average Loss', f"{Fore.RED}${self.summary['average_loss']:.2f}{Style.RESET_ALL}"],
+            ['Average P&L', f"${self.summary['average_pnl']:.2f} ± ${self.summary['pnl_std']:.2f}"],
             ['Profit Factor', f"{Fore.CYAN}{self.summary['profit_factor']:.2f}{Style.RESET_ALL}"],
         ]
         print(f"\n{Fore.CYAN}┌─ 💹 Financial Results ─┐{Style.RESET_ALL}")
@@ -247,7 +287,7 @@ class TradingSession:
         print(f"\n{Fore.CYAN}╚════════════════════════════════════════════════════════════════════╝{Style.RESET_ALL}")
 
     def _update_summary_stats(self):
-        """Update session summary statistics"""
+        """Update the summary fields derived from the running totals kept by add_trade"""
         self.summary['end_time'] = datetime.now()
         self.summary['duration'] = (self.summary['end_time'] - self.summary['start_time']).total_seconds() / 60
         self.summary['final_balance'] = self.current_balance
@@ -265,22 +305,17 @@ class TradingSession:
             self.summary['average_win'] = self.summary['total_profit'] / winning_trades
         if self.summary['losing_trades'] > 0:
             self.summary['average_loss'] = self.summary['total_loss'] / self.summary['losing_trades']
-        
-        # Calculate drawdown
-        peak = self.initial_balance
-        max_dd = 0
-        for balance in self.equity_curve:
-            if balance > peak:
-                peak = balance
-            dd = (peak - balance) / peak * 100
-            max_dd = max(max_dd, dd)
-        self.summary['max_drawdown'] = max_dd
+        self.summary['average_pnl'] = self.pnl_mean
+        if self.closed_trades > 1:
+            self.summary['pnl_std'] = (self.pnl_m2 / (self.closed_trades - 1)) ** 0.5
 
     def save_report(self):
         """Save session report and update database"""
         try:
             # Update summary statistics
             self._update_summary_stats()
+            if not self.persist:
+                return
             
             # Update session in database
             self.db.update_session(
@@ -290,13 +325,25 @@ class TradingSession:
                 status=SESSION_STATUS['COMPLETED']
             )
             
-            # Save local report
+            # Save local report, appending the trades added since the last save
             report_path = os.path.join(DATA_DIR, f"session_{self.session_id}.csv")
-            df = pd.DataFrame(self.trades)
-            df.to_csv(report_path, index=False)
+            new_trades = self.trades[self.report_rows:]
+            if new_trades or self.report_columns is None:
+                df = pd.DataFrame(new_trades)
+                if self.report_columns is None or not set(df.columns) <= set(self.report_columns):
+                    # First save, or trades with fields the header lacks: rewrite with every column
+                    df = pd.DataFrame(self.trades)
+                    self.report_columns = list(df.columns)
+                    df.to_csv(report_path, index=False)
+                else:
+                    df.reindex(columns=self.report_columns).to_csv(report_path, mode='a', header=False, index=False)
+                self.report_rows = len(self.trades)
             
             print(f"📊 Session report saved to {report_path}")
             
+            if self.latency_tracker is not None:
+                self.latency_tracker.save(os.path.join(DATA_DIR, f"latency_{self.session_id}.json"))
+            
         except Exception as e:
             print(f"❌ Error saving session report: {e}")
 
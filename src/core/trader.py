@@ -6,20 +6,26 @@ import numpy as np
 from datetime import datetime, timezone, timedelta
 import time
 import asyncio
-from typing import Optional, Dict
+import threading
+from typing import Callable, Optional, Dict, List
 
 from termcolor import colored
 
 from src.api.capital import CapitalAPI
 from src.api.capital_ws import CapitalWebSocket
+from src.api.order_manager import OrderManager
+from src.api.rate_limiter import REQUEST_PRIORITY
+from src.api.session_manager import SessionManager
+from src.core.bars import BarStore
 from src.core.session import TradingSession
 from src.core.positions import ActivePositions
 from src.models.neural import LorentzianModel
 from ..features.signals import SignalGenerator
-from src.utils.config import TRADING_CONFIG, DEFAULT_PAIR, DEFAULT_TIMEFRAME, ENV_CONFIG
+from src.utils.config import TRADING_CONFIG, DEFAULT_PAIR, DEFAULT_EPIC, DEFAULT_TIMEFRAME, ENV_CONFIG, API_CONFIG, WEBSOCKET_CONFIG
+from src.utils.latency import LatencyTrace, LatencyTracker
 from src.utils.visualization import (
-    print_header, print_market_data, print_bot_config,
-    print_active_filters, print_positions, print_error, print_trading_signal, print_account_info, print_account_status
+    print_header, print_market_data, print_bot_config, print_active_filters, print_positions,
+    print_error, print_trading_signal, print_account_info, print_account_status, print_latency_summary
 )
 
 # Configure warnings and environment
@@ -27,72 +33,169 @@ warnings.filterwarnings('ignore')
 for key, value in ENV_CONFIG.items():
     os.environ[key] = value
 
+# Decision stages from the quote's exchange timestamp to the order confirmation
+LATENCY_STAGES = ['received', 'handler', 'display', 'signal', 'order_sent', 'confirmed']
+
 class LorentzianTrader:
-    def __init__(self):
+    def __init__(self, capital_api=None, order_manager=None, session: Optional[TradingSession] = None,
+                 model=None, clock: Callable[[], float] = time.time, display: bool = True,
+                 epic: str = DEFAULT_EPIC, timeframe: str = DEFAULT_TIMEFRAME):
+        """
+        Initialize LorentzianTrader
+        
+        Args:
+            capital_api: Broker API, the simulator passes an in-process stand-in; without one a
+                Capital.com session, WebSocket and session keepalive are created
+            order_manager: Order manager (defaults to an OrderManager on capital_api)
+            session: Trading session (defaults to a persisted session at the account balance)
+            model: Prediction model (defaults to a new LorentzianModel)
+            clock: Epoch seconds source for throttling and report timing, replays pass market time
+            display: Redraw the market dashboard on processed quotes
+            epic: Instrument to trade
+            timeframe: Bar timeframe
+        """
         # Trading parameters
         self.trading_pair = DEFAULT_PAIR
-        self.timeframe = DEFAULT_TIMEFRAME
+        self.epic = epic
+        self.timeframe = timeframe
         self.config = TRADING_CONFIG.copy()
+        self.clock = clock
+        self.display = display
         
-        # Initialize Capital.com API
-        self.capital_api = CapitalAPI()
-        if not self.capital_api.create_session():
-            raise Exception("Could not create session with Capital.com")
+        self.ws_client = None
+        self.session_manager = None
+        if capital_api is None:
+            # Initialize Capital.com API
+            capital_api = CapitalAPI()
+            if not capital_api.create_session():
+                raise Exception("Could not create session with Capital.com")
 
-        # Initialize WebSocket
-        self.ws_client = CapitalWebSocket(
-            self.capital_api.cst,
-            self.capital_api.security_token
+            # Initialize WebSocket
+            self.ws_client = CapitalWebSocket(
+                capital_api.cst,
+                capital_api.security_token
+            )
+            self.ws_client.add_quote_handler(self.epic, self.handle_quote_update)
+            self.ws_client.add_bar_handler(self.epic, self.handle_bar_update)
+            self.ws_client.set_connection_callbacks(
+                on_disconnect=self.handle_disconnect,
+                on_reconnect=self.backfill_gap
+            )
+            
+            # Keep session tokens alive and share refreshed tokens with the WebSocket
+            self.session_manager = SessionManager(
+                capital_api,
+                keepalive_interval=API_CONFIG['session_keepalive_interval']
+            )
+            self.session_manager.add_token_listener(self.ws_client.update_tokens)
+            self.session_manager.start()
+        self.capital_api = capital_api
+        
+        # Orders are submitted and confirmed in the background, results are picked up on later quotes
+        self.order_manager = order_manager or OrderManager(
+            self.capital_api,
+            max_quote_age=API_CONFIG['order_max_quote_age'],
+            confirm_poll_interval=API_CONFIG['confirm_poll_interval'],
+            confirm_timeout=API_CONFIG['confirm_timeout'],
+            workers=API_CONFIG['order_workers']
         )
-        self.ws_client.set_quote_callback(self.handle_quote_update)
+        self.order_manager.start()
+        self.pending_orders = []  # (order, position_data, trace, previous last_trade_time)
         
         # Historical data control
         self.last_historical_update = None
         self.historical_update_interval = 300  # 5 minutes
-        self.historical_data = None
+        
+        # Bars from REST history, kept current by streamed OHLC bars and local quotes
+        self.bar_store = BarStore(
+            bar_seconds=self.get_timeframe_minutes() * 60,
+            max_bars=self.config['max_bars_back'],
+            tolerance=WEBSOCKET_CONFIG['bar_reconcile_tolerance']
+        )
+        
+        # Signals are held while bars missed during a WebSocket outage are backfilled
+        self.history_consistent = threading.Event()
+        self.history_consistent.set()
+        self.pending_gap = None
+        self.backfill_lock = threading.Lock()
         
         # Initialize components
-        self.model = LorentzianModel()
+        self.model = model or LorentzianModel()
         self.signal_generator = SignalGenerator(
             self.model,
             timeframe=self.timeframe
         )
-        self.session = TradingSession(self.capital_api.account_info['accountInfo']['balance'])
+        self.session = session or TradingSession(self.capital_api.account_info['accountInfo']['balance'])
+        
+        # Stage latencies of every decision, dumped with the session report
+        self.latency_tracker = LatencyTracker(LATENCY_STAGES)
+        self.session.latency_tracker = self.latency_tracker
         
-        # Initialize active positions with session ID
-        self.active_positions = ActivePositions(self.session.session_id)
+        # Initialize active positions with session ID, exit rules read the shared bars
+        self.active_positions = ActivePositions(self.session.session_id, bar_store=self.bar_store, persist=self.session.persist)
         
-        self.last_report_save = time.time()
+        self.last_report_save = self.clock()
         self.report_save_interval = 300
         
+    @property
+    def historical_data(self) -> Optional[pd.DataFrame]:
+        """Bars of the traded epic as a DataFrame"""
+        return self.bar_store.get_frame(self.epic)
+
+    def handle_bar_update(self, bar_data: Dict):
+        """Apply an OHLC bar streamed by the broker to the bar store"""
+        if bar_data.get('resolution') != self.get_resolution() or bar_data.get('priceType', 'bid') != 'bid':
+            return
+        self.bar_store.update_bar(
+            bar_data['epic'],
+            int(bar_data['t']),
+            float(bar_data['o']),
+            float(bar_data['h']),
+            float(bar_data['l']),
+            float(bar_data['c'])
+        )
+
     def handle_quote_update(self, quote_data: Dict):
         """Handle real-time quote updates from WebSocket"""
+        handler_start = self.clock()
         try:
+            current_price = float(quote_data['bid'])
+            timestamp = datetime.fromtimestamp(quote_data['timestamp'] / 1000)
+            
+            # Every processed quote feeds the local bar used until the streamed bar arrives
+            self.bar_store.update_quote(self.epic, current_price, int(quote_data['timestamp']))
+            self.order_manager.update_quote(self.epic, quote_data)
+            
+            # The broker closes positions at their attached levels on any quote, keep the local book in step
+            triggered = self.active_positions.check_triggers(current_price, float(quote_data['ofr']), now=timestamp)
+            if triggered:
+                print(f"🎯 {len(triggered)} position(s) closed at their stop loss or take profit")
+            
             # Throttle updates
-            current_time = time.time()
+            current_time = self.clock()
             if hasattr(self, 'last_update_time') and current_time - self.last_update_time < 5:
                 return
             self.last_update_time = current_time
             
-            # Get current market price
-            market_data = self.capital_api.get_price_history('BTCUSD', resolution='MINUTE_5', max_bars=1)
+            # Retry a backfill that failed right after the reconnect
+            if self.pending_gap is not None and not self.backfill_lock.locked():
+                self.backfill_gap(*self.pending_gap)
             
-            if market_data and 'prices' in market_data and len(market_data['prices']) > 0:
-                current_price = float(market_data['prices'][0]['closePrice']['bid'])
-            else:
-                current_price = float(quote_data['bid'])
+            trace = self.latency_tracker.start('exchange', quote_data['timestamp'] / 1000)
+            trace.mark('received', quote_data.get('receivedAt', handler_start))
+            trace.mark('handler', handler_start)
             
-            timestamp = datetime.fromtimestamp(quote_data['timestamp'] / 1000)
-            
-            # Update historical data
-            if self.historical_data is not None and len(self.historical_data) > 0:
-                self.historical_data.iloc[-1, self.historical_data.columns.get_loc('close')] = current_price
-                
+            if self.bar_store.last_bar_time(self.epic) is not None:
                 # Display market information
-                self._display_market_info(timestamp, current_price, quote_data)
+                if self.display:
+                    self._display_market_info(timestamp, current_price, quote_data)
+                trace.mark('display', self.clock())
                 
-                # Process trading logic
-                self._process_trading_logic(timestamp, current_price)
+                # Process trading logic, a trace handed to an order is finished once it is confirmed
+                if self._process_trading_logic(timestamp, current_price, trace):
+                    return
+            
+            self.latency_tracker.finish(trace)
                 
         except Exception as e:
             print_error("Error processing quote update", e)
@@ -147,6 +250,8 @@ class LorentzianTrader:
         positions = self.capital_api.get_positions()
         print_positions(positions)
 
+        print_latency_summary(self.latency_tracker.get_summary())
+
         # Print trading signal
         print(colored("\n🔍 Looking for a signal...", "cyan"))
         #current_idx = len(self.historical_data) - 1
@@ -155,28 +260,40 @@ class LorentzianTrader:
         #stop_loss, take_profit = self.signal_generator.get_trade_levels(current_price, signal)
         #print_trading_signal(signal_type, current_price, stop_loss, take_profit)
 
-    def _process_trading_logic(self, timestamp: datetime, current_price: float):
-        """Process trading logic based on current market conditions"""
+    def _process_trading_logic(self, timestamp: datetime, current_price: float, trace: Optional[LatencyTrace] = None) -> bool:
+        """Process trading logic based on current market conditions, returns True if an order was submitted"""
         try:
+            self._process_completed_orders()
+            
             # Check if it's time to save the report
-            current_time = time.time()
+            current_time = self.clock()
             if current_time - self.last_report_save >= self.report_save_interval:
                 self.session.save_report()
                 self.last_report_save = current_time
                 print("📊 Session report updated - Periodic save")
             
             # Update active positions
-            closed_positions = self.active_positions.update_positions(current_price)
+            closed_positions = self.active_positions.update_positions(current_price, timestamp)
             
-            # If positions were closed, save the report
+            # If positions were closed, close them at the broker in parallel and save the report
             if closed_positions:
+                deal_ids = [position['deal_id'] for position in closed_positions if position.get('deal_id')]
+                if deal_ids:
+                    self.order_manager.close_positions(deal_ids)
                 self.session.save_report()
                 print(f"📊 Session report updated - {len(closed_positions)} position(s) closed")
             
             # Check for new trading opportunities
-            if self.session.can_open_new_position(timestamp):
-                current_idx = len(self.historical_data) - 1
-                signal = self.signal_generator.get_trading_signal(self.historical_data, current_idx)
+            if not self.history_consistent.is_set():
+                print("⏸️ Signals on hold until missing bars are backfilled")
+            elif self.pending_orders:
+                print(f"⏳ Waiting for {len(self.pending_orders)} order(s) to be confirmed")
+            elif self.session.can_open_new_position(timestamp):
+                history = self.historical_data
+                current_idx = len(history) - 1
+                signal = self.signal_generator.get_trading_signal(history, current_idx)
+                if trace:
+                    trace.mark('signal', self.clock())
                 
                 if signal != 0:
                     stop_loss, take_profit = self.signal_generator.get_trade_levels(current_price, signal)
@@ -184,34 +301,55 @@ class LorentzianTrader:
                     
                     if size > 0:
                         direction = 'BUY' if signal > 0 else 'SELL'
-                        position = self.capital_api.create_position(
-                            epic='BTCUSD',
+                        order = self.order_manager.submit_open(
+                            epic=self.epic,
                             direction=direction,
                             size=size,
                             stop_level=stop_loss,
-                            profit_level=take_profit
+                            profit_level=take_profit,
+                            trace=trace
                         )
-                        
-                        if position:
-                            # Add position to tracking
-                            position_data = {
-                                'symbol': 'BTCUSD',
-                                'signal': 1 if direction == 'BUY' else -1,
-                                'entry_price': current_price,
-                                'position_size': size,
-                                'stop_loss': stop_loss,
-                                'take_profit': take_profit,
-                                'entry_time': timestamp
-                            }
-                            self.active_positions.add_position(position_data)
-                            
-                            self.session.last_trade_time = timestamp
-                            print(f"🚀 Opened {direction} position with size {size} at {current_price}")
-                            self.session.save_report()
-                            print("📊 Session report updated - New position opened")
+                        position_data = {
+                            'symbol': self.epic,
+                            'signal': 1 if direction == 'BUY' else -1,
+                            'entry_price': current_price,
+                            'position_size': size,
+                            'stop_loss': stop_loss,
+                            'take_profit': take_profit,
+                            'entry_time': timestamp,
+                            'timeframe': self.get_resolution()
+                        }
+                        self.pending_orders.append((order, position_data, trace, self.session.last_trade_time))
+                        self.session.last_trade_time = timestamp
+                        return True
             
         except Exception as e:
             print_error("Error in trading logic", e)
+        return False
+
+    def _process_completed_orders(self):
+        """Track positions of confirmed orders and release the others"""
+        still_pending = []
+        for order, position_data, trace, previous_trade_time in self.pending_orders:
+            if not order.future.done():
+                still_pending.append((order, position_data, trace, previous_trade_time))
+                continue
+            
+            if trace:
+                self.latency_tracker.finish(trace)
+            if order.state == 'CONFIRMED':
+                # Add position to tracking
+                position_data['deal_id'] = order.deal_id
+                position_data['entry_price'] = float(order.confirm.get('level') or position_data['entry_price'])
+                self.active_positions.add_position(position_data)
+                print(f"🚀 Opened {order.direction} position with size {order.size} at {position_data['entry_price']}")
+                self.session.save_report()
+                print("📊 Session report updated - New position opened")
+            else:
+                # The trade never happened, so it does not count for the time between trades
+                self.session.last_trade_time = previous_trade_time
+                print_error(f"Order #{order.order_id} {order.state.lower()}: {order.error}")
+        self.pending_orders = still_pending
 
     def _calculate_position_size(self, current_price: float) -> float:
         """Calculate position size based on risk parameters"""
@@ -262,7 +400,7 @@ class LorentzianTrader:
             if start_date is not None:
                 start_time = datetime.strptime(start_date, '%Y-%m-%dT%H:%M:%S').replace(tzinfo=timezone.utc)
             
-            all_candles = []
+            batches = []
             current_start = end_time - timedelta(minutes=minutes_per_request)
             remaining_candles = self.config['max_bars_back']
             
@@ -271,41 +409,30 @@ class LorentzianTrader:
                 to_date = (current_start + timedelta(minutes=minutes_per_request)).strftime('%Y-%m-%dT%H:%M:%S')
                 
                 historical_data = self.capital_api.get_price_history(
-                    epic="BTCUSD",
-                    resolution=f"MINUTE_{minutes_per_candle}" if minutes_per_candle > 1 else "MINUTE",
+                    epic=self.epic,
+                    resolution=self.get_resolution(),
                     from_date=from_date,
                     to_date=to_date,
-                    max_bars=candles_per_request
+                    max_bars=candles_per_request,
+                    decode='bid'
                 )
                 
-                if historical_data and 'prices' in historical_data:
-                    batch_candles = historical_data['prices']
-                    if batch_candles:
-                        all_candles.extend(batch_candles)
-                        remaining_candles -= len(batch_candles)
+                if historical_data and len(historical_data['timestamp']) > 0:
+                    batches.append(historical_data)
+                    remaining_candles -= len(historical_data['timestamp'])
                 
                 current_start = current_start - timedelta(minutes=minutes_per_request)
                 # Print pretty progress bar with library
                 print(f"Loading historical data: {remaining_candles} candles remaining")
-
-                time.sleep(0.5)  # Avoid rate limits
-            
-            if all_candles:
-                df = pd.DataFrame([{
-                    'timestamp': pd.to_datetime(candle['snapshotTime']),
-                    'open': float(candle['openPrice']['bid']),
-                    'high': float(candle['highPrice']['bid']),
-                    'low': float(candle['lowPrice']['bid']),
-                    'close': float(candle['closePrice']['bid']),
-                    'volume': float(candle.get('lastTradedVolume', 0))
-                } for candle in all_candles])
-                
-                df.set_index('timestamp', inplace=True)
-                df.sort_index(inplace=True)
-                df = df[~df.index.duplicated(keep='last')]
-                
-                self.historical_data = df
-                self.last_historical_update = time.time()
+            
+            if batches:
+                # The store sorts the batches and drops duplicate bars
+                columns = {
+                    column: np.concatenate([batch[column] for batch in batches])
+                    for column in batches[0]
+                }
+                self.bar_store.load(self.epic, columns)
+                self.last_historical_update = self.clock()
                 return True
             
             return False
@@ -314,6 +441,83 @@ class LorentzianTrader:
             print_error("Error loading historical data", e)
             return False
 
+    def handle_disconnect(self, disconnected_at: float):
+        """Hold signal generation as soon as the WebSocket drops"""
+        self.history_consistent.clear()
+        print("⏸️ WebSocket disconnected - holding signals until history is repaired")
+
+    def backfill_gap(self, epics: List[str], disconnected_at: float, reconnected_at: float) -> bool:
+        """
+        Fetch the bars missed during a WebSocket outage and merge them into the history
+        
+        Args:
+            epics: Epics subscribed when the connection dropped
+            disconnected_at: Outage start in epoch seconds
+            reconnected_at: Outage end in epoch seconds
+        """
+        with self.backfill_lock:
+            self.pending_gap = (epics, disconnected_at, reconnected_at)
+            
+            if self.bar_store.last_bar_time(self.epic) is None or self.epic not in epics:
+                self.pending_gap = None
+                self.history_consistent.set()
+                return True
+            
+            # Start one bar before the outage so the stale last bar is refreshed too
+            bar_seconds = self.get_timeframe_minutes() * 60
+            start = disconnected_at - disconnected_at % bar_seconds - bar_seconds
+            missing_bars = int(np.ceil((reconnected_at - start) / bar_seconds)) + 1
+            
+            max_bars = WEBSOCKET_CONFIG['max_gap_backfill_bars']
+            capped = missing_bars > max_bars
+            if capped:
+                print(f"⚠️ Outage spans {missing_bars} bars, backfilling only the last {max_bars}")
+                start = reconnected_at - max_bars * bar_seconds
+                missing_bars = max_bars
+            
+            print(f"🩹 Backfilling {missing_bars} bars missed during the outage...")
+            bars = self.capital_api.get_price_history(
+                epic=self.epic,
+                resolution=self.get_resolution(),
+                from_date=datetime.fromtimestamp(start, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S'),
+                to_date=datetime.fromtimestamp(reconnected_at, timezone.utc).strftime('%Y-%m-%dT%H:%M:%S'),
+                max_bars=missing_bars,
+                priority=REQUEST_PRIORITY['ACCOUNT'],
+                decode='bid'
+            )
+            
+            if bars is None:
+                print_error("Failed to backfill missing bars, will retry on the next quote")
+                return False
+            
+            if capped and len(bars['timestamp']) > 0:
+                # Bars before the backfill would leave a hole, history restarts at its first bar
+                first = int(bars['timestamp'][0].astype('datetime64[ms]').astype(np.int64))
+                self.bar_store.load(self.epic, bars, replace=False, since=first)
+                print(f"⚠️ History restarted with the last {len(bars['timestamp'])} bars, older bars dropped - signals resumed")
+            elif len(bars['timestamp']) > 0:
+                self.bar_store.load(self.epic, bars, replace=False)
+                print(f"✅ History repaired with {len(bars['timestamp'])} bars - signals resumed")
+            elif capped:
+                # Nothing came back for the outage, the stored bars cannot be made contiguous
+                print_error("Backfill returned no bars for the outage, will retry on the next quote")
+                return False
+            else:
+                print("✅ No bars missed during the outage - signals resumed")
+            
+            self.pending_gap = None
+            self.history_consistent.set()
+            return True
+
+    def get_resolution(self) -> str:
+        """Convert timeframe to a Capital.com price resolution"""
+        minutes = self.get_timeframe_minutes()
+        if minutes % 1440 == 0:
+            return "DAY"
+        if minutes % 60 == 0:
+            return "HOUR" if minutes == 60 else f"HOUR_{minutes // 60}"
+        return f"MINUTE_{minutes}" if minutes > 1 else "MINUTE"
+
     def get_timeframe_minutes(self) -> int:
         """Convert timeframe string to minutes"""
         timeframe = self.timeframe.lower()
@@ -332,7 +536,8 @@ class LorentzianTrader:
             
             if await self.ws_client.connect_with_retry():
                 print("\n📊 Subscribing to market data...")
-                if await self.ws_client.subscribe_market_data("BTCUSD"):
+                if await self.ws_client.subscribe_market_data(self.epic):
+                    await self.ws_client.subscribe_ohlc(self.epic, [self.get_resolution()])
                     print("✅ WebSocket initialization complete")
                     await self.ws_client.listen()
                 else:
@@ -348,5 +553,5 @@ class LorentzianTrader:
         if self.last_historical_update is None:
             return True
             
-        time_since_update = time.time() - self.last_historical_update
+        time_since_update = self.clock() - self.last_historical_update
         return time_since_update >= self.historical_update_interval 
\ No newline at end of file
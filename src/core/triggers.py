@@ -0,0 +1,146 @@
+import heapq
+from typing import Dict, List, Optional, Tuple
+
+TRIGGER_KINDS = ('stop_loss', 'take_profit')
+
+
+class TriggerIndex:
+    """Stop-loss and take-profit levels indexed by price.
+
+    Levels live in four heaps: long stops and short take-profits fire when the
+    price falls to them (max-heaps), long take-profits and short stops fire
+    when it rises to them (min-heaps). A price update pops only the crossed
+    levels, O(log n) each. Moving a level (e.g. a trailing stop) pushes the
+    new level and leaves the old heap entry behind as stale; stale entries are
+    skipped when they reach the top, and the heaps are rebuilt when they pile up.
+    """
+
+    def __init__(self):
+        # Heap entries are (heap key, key, kind, version); falling heaps store -level
+        self._falling: Dict[int, List[Tuple]] = {1: [], -1: []}   # Long stop loss, short take profit
+        self._rising: Dict[int, List[Tuple]] = {1: [], -1: []}    # Long take profit, short stop loss
+        self._levels: Dict[Tuple, Tuple[float, int]] = {}         # (key, kind) -> (level, version)
+        self._sides: Dict[object, int] = {}
+        self._version = 0
+        self._entries = 0
+
+    def __len__(self) -> int:
+        return len(self._sides)
+
+    def __contains__(self, key) -> bool:
+        return key in self._sides
+
+    def add(self, key, side: int, stop_loss: Optional[float] = None, take_profit: Optional[float] = None):
+        """
+        Index the exit levels of a position
+
+        Args:
+            key: Hashable position key
+            side: 1 for long, -1 for short
+            stop_loss: Stop loss level, None for no stop
+            take_profit: Take profit level, None for no target
+        """
+        self._sides[key] = 1 if side > 0 else -1
+        self.set_level(key, 'stop_loss', stop_loss)
+        self.set_level(key, 'take_profit', take_profit)
+
+    def set_level(self, key, kind: str, level: Optional[float]):
+        """Move (or with None, drop) one trigger level of an indexed position"""
+        if kind not in TRIGGER_KINDS:
+            raise ValueError(f"Invalid trigger kind: {kind}")
+        side = self._sides[key]
+        if level is None:
+            self._levels.pop((key, kind), None)
+            return
+
+        self._version += 1
+        self._levels[(key, kind)] = (level, self._version)
+        self._push(key, kind, side, level, self._version)
+        if self._entries > 4 * len(self._levels) + 64:
+            self._compact()
+
+    def _push(self, key, kind: str, side: int, level: float, version: int):
+        # Longs stop out and shorts take profit on falling prices
+        if (kind == 'stop_loss') == (side > 0):
+            heapq.heappush(self._falling[side], (-level, key, kind, version))
+        else:
+            heapq.heappush(self._rising[side], (level, key, kind, version))
+        self._entries += 1
+
+    def _compact(self):
+        """Rebuild the heaps without stale entries"""
+        for heaps in (self._falling, self._rising):
+            for side in heaps:
+                heaps[side] = []
+        self._entries = 0
+        for (key, kind), (level, version) in self._levels.items():
+            self._push(key, kind, self._sides[key], level, version)
+
+    def trail_stop(self, key, stop_loss: float) -> bool:
+        """Move a stop only in the position's favour, returns whether it moved"""
+        side = self._sides[key]
+        current = self._levels.get((key, 'stop_loss'))
+        if current is not None and (stop_loss - current[0]) * side <= 0:
+            return False
+        self.set_level(key, 'stop_loss', stop_loss)
+        return True
+
+    def get_level(self, key, kind: str) -> Optional[float]:
+        level = self._levels.get((key, kind))
+        return level[0] if level else None
+
+    def remove(self, key):
+        """Stop tracking a position, its heap entries become stale"""
+        if self._sides.pop(key, None) is not None:
+            for kind in TRIGGER_KINDS:
+                self._levels.pop((key, kind), None)
+
+    def _pop_crossed(self, heap: List[Tuple], crossed, sign: int, hits: Dict):
+        while heap:
+            heap_key, key, kind, version = heap[0]
+            current = self._levels.get((key, kind))
+            if current is None or current[1] != version:
+                heapq.heappop(heap)  # Stale: level moved or position removed
+                self._entries -= 1
+                continue
+            if not crossed(sign * heap_key):
+                break
+            heapq.heappop(heap)
+            self._entries -= 1
+            # A position exits once, by the first level found
+            if key not in hits:
+                hits[key] = (kind, current[0])
+
+    def check(self, bid: float, ask: Optional[float] = None) -> List[Tuple[object, str, float]]:
+        """
+        Pop every position whose stop loss or take profit was crossed
+
+        Args:
+            bid: Price longs exit at
+            ask: Price shorts exit at (defaults to bid)
+
+        Returns:
+            (key, kind, level) per triggered position; triggered positions are removed
+        """
+        ask = bid if ask is None else ask
+        return self._check(bid, bid, ask, ask)
+
+    def check_range(self, low: float, high: float) -> List[Tuple[object, str, float]]:
+        """
+        Pop every position with a level inside a bar's low-high range
+
+        When both levels of a position are inside the range the order of the
+        crossings is unknown and the stop loss is assumed to come first.
+        """
+        return self._check(low, high, low, high)
+
+    def _check(self, long_low: float, long_high: float, short_low: float, short_high: float) -> List[Tuple]:
+        hits: Dict = {}
+        # Stops are popped first so they win when both levels were crossed
+        self._pop_crossed(self._falling[1], lambda level: long_low <= level, -1, hits)
+        self._pop_crossed(self._rising[-1], lambda level: short_high >= level, 1, hits)
+        self._pop_crossed(self._rising[1], lambda level: long_high >= level, 1, hits)
+        self._pop_crossed(self._falling[-1], lambda level: short_low <= level, -1, hits)
+        for key in hits:
+            self.remove(key)
+        return [(key, kind, level) for key, (kind, level) in hits.items()]
@@ -8,18 +8,27 @@ class FeatureCalculator:
     @staticmethod
     def calculate_feature(df: pd.DataFrame, feature_type: str, param_a: int, param_b: int) -> Optional[np.ndarray]:
         """Calculate a single technical feature"""
+        return FeatureCalculator.calculate_feature_values(
+            df['high'].values, df['low'].values, df['close'].values, feature_type, param_a, param_b
+        )
+
+    @staticmethod
+    def calculate_feature_values(highs: np.ndarray, lows: np.ndarray, closes: np.ndarray,
+                                 feature_type: str, param_a: int, param_b: int) -> Optional[np.ndarray]:
+        """Calculate a single technical feature from price arrays, normalized over all of them"""
         try:
             if feature_type == 'RSI':
-                values = talib.RSI(df['close'].values, timeperiod=param_a)
+                values = talib.RSI(closes, timeperiod=param_a)
             elif feature_type == 'CCI':
-                values = talib.CCI(df['high'].values, df['low'].values, df['close'].values, timeperiod=param_a)
+                values = talib.CCI(highs, lows, closes, timeperiod=param_a)
             elif feature_type == 'ADX':
-                values = talib.ADX(df['high'].values, df['low'].values, df['close'].values, timeperiod=param_a)
+                values = talib.ADX(highs, lows, closes, timeperiod=param_a)
             elif feature_type == 'WT':
-                hlc3 = (df['high'] + df['low'] + df['close']) / 3
+                hlc3 = (highs + lows + closes) / 3
                 esa = talib.EMA(hlc3, timeperiod=param_a)
                 d = talib.EMA(abs(hlc3 - esa), timeperiod=param_a)
-                ci = (hlc3 - esa) / (0.015 * d)
+                with np.errstate(divide='ignore', invalid='ignore'):
+                    ci = (hlc3 - esa) / (0.015 * d)
                 wt1 = talib.EMA(ci, timeperiod=param_b)
                 wt2 = talib.EMA(wt1, timeperiod=4)
                 values = wt1 - wt2
@@ -47,18 +47,26 @@ class FractalAnalyzer:
 
     def identify_fractals(self, data: pd.DataFrame) -> Tuple[List[bool], List[bool]]:
         """Identify both bullish and bearish fractals in the data"""
-        length = len(data)
-        top_fractals = [False] * length
-        bottom_fractals = [False] * length
-        
-        for i in range(4, length):
-            if self.filter_bw:
-                top_fractals[i] = self.is_regular_fractal(data, i, 1)
-                bottom_fractals[i] = self.is_regular_fractal(data, i, -1)
-            else:
-                top_fractals[i] = self.is_bw_fractal(data, i, 1)
-                bottom_fractals[i] = self.is_bw_fractal(data, i, -1)
-                
+        top_fractals, bottom_fractals = self.fractal_flags(data['high'].values, data['low'].values)
+        return top_fractals.tolist(), bottom_fractals.tolist()
+
+    def fractal_flags(self, highs: np.ndarray, lows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Top and bottom fractal flags of every bar, a fractal at i only depends on bars i-4..i"""
+        length = len(highs)
+        top_fractals = np.zeros(length, dtype=bool)
+        bottom_fractals = np.zeros(length, dtype=bool)
+        if length < 5:
+            return top_fractals, bottom_fractals
+
+        # h[k][j] and l[k][j] are the bar j+k, so index 4 is the bar the fractal is reported at
+        h = [highs[k:length - 4 + k] for k in range(5)]
+        l = [lows[k:length - 4 + k] for k in range(5)]
+        if self.filter_bw:
+            top_fractals[4:] = (h[0] < h[1]) & (h[1] < h[2]) & (h[2] > h[3]) & (h[3] > h[4])
+            bottom_fractals[4:] = (l[0] > l[1]) & (l[1] > l[2]) & (l[2] < l[3]) & (l[3] < l[4])
+        else:
+            top_fractals[4:] = (h[0] < h[2]) & (h[1] <= h[2]) & (h[2] >= h[3]) & (h[2] > h[4])
+            bottom_fractals[4:] = (l[0] > l[2]) & (l[1] >= l[2]) & (l[2] <= l[3]) & (l[2] < l[4])
         return top_fractals, bottom_fractals
 
     def calculate_ratios(self, points: List[float]) -> Tuple[float, float, float, float]:
@@ -97,32 +105,41 @@ class FractalAnalyzer:
         return patterns
 
     def _is_bat_pattern(self, xab: float, xad: float, abc: float, bcd: float, mode: int) -> bool:
-        return (0.382 <= xab <= 0.5 and
-                abc >= 0.382 and abc <= 0.886 and
-                bcd >= 1.618 and bcd <= 2.618 and
-                xad <= 0.886 and
-                (mode == 1 and bcd > 0 or mode == -1 and bcd < 0))
+        return ((0.382 <= xab) & (xab <= 0.5) &
+                (abc >= 0.382) & (abc <= 0.886) &
+                (bcd >= 1.618) & (bcd <= 2.618) &
+                (xad <= 0.886) &
+                self._direction_matches(bcd, mode))
 
     def _is_butterfly_pattern(self, xab: float, xad: float, abc: float, bcd: float, mode: int) -> bool:
-        return (xab <= 0.786 and
-                abc >= 0.382 and abc <= 0.886 and
-                bcd >= 1.618 and bcd <= 2.618 and
-                xad >= 1.27 and xad <= 1.618 and
-                (mode == 1 and bcd > 0 or mode == -1 and bcd < 0))
+        return ((xab <= 0.786) &
+                (abc >= 0.382) & (abc <= 0.886) &
+                (bcd >= 1.618) & (bcd <= 2.618) &
+                (xad >= 1.27) & (xad <= 1.618) &
+                self._direction_matches(bcd, mode))
 
     def _is_gartley_pattern(self, xab: float, xad: float, abc: float, bcd: float, mode: int) -> bool:
-        return (0.5 <= xab <= 0.618 and
-                abc >= 0.382 and abc <= 0.886 and
-                bcd >= 1.13 and bcd <= 2.618 and
-                xad >= 0.75 and xad <= 0.875 and
-                (mode == 1 and bcd > 0 or mode == -1 and bcd < 0))
+        return ((0.5 <= xab) & (xab <= 0.618) &
+                (abc >= 0.382) & (abc <= 0.886) &
+                (bcd >= 1.13) & (bcd <= 2.618) &
+                (xad >= 0.75) & (xad <= 0.875) &
+                self._direction_matches(bcd, mode))
 
     def _is_crab_pattern(self, xab: float, xad: float, abc: float, bcd: float, mode: int) -> bool:
-        return (0.75 <= xab <= 0.875 and
-                abc >= 0.382 and abc <= 0.886 and
-                bcd >= 2.0 and bcd <= 3.618 and
-                xad >= 1.5 and xad <= 1.625 and
-                (mode == 1 and bcd > 0 or mode == -1 and bcd < 0))
+        return ((0.75 <= xab) & (xab <= 0.875) &
+                (abc >= 0.382) & (abc <= 0.886) &
+                (bcd >= 2.0) & (bcd <= 3.618) &
+                (xad >= 1.5) & (xad <= 1.625) &
+                self._direction_matches(bcd, mode))
+
+    @staticmethod
+    def _direction_matches(bcd, mode: int):
+        """Whether the CD leg agrees with the pattern direction, for scalars or arrays"""
+        if mode == 1:
+            return bcd > 0
+        if mode == -1:
+            return bcd < 0
+        return False
 
     def _get_significant_points(self, data: pd.DataFrame, idx: int) -> Optional[List[float]]:
         """Get the last 5 significant price points for pattern recognition"""
@@ -135,33 +152,49 @@ class FractalAnalyzer:
             points.append(data['close'].iloc[i])
         return points
 
+    def pattern_signal_values(self, closes: np.ndarray) -> np.ndarray:
+        """Harmonic pattern signal of every bar, the sum of direction * probability
+        of the patterns identify_harmonic_patterns finds on the last 5 closes"""
+        length = len(closes)
+        signals = np.zeros(length)
+        if length < 5:
+            return signals
+
+        x, a, b, c, d = (np.asarray(closes[k:length - 4 + k], dtype=np.float64) for k in range(5))
+        xab = self._ratio_values(b - a, x - a)
+        xad = self._ratio_values(a - d, x - a)
+        abc = self._ratio_values(b - c, a - b)
+        bcd = self._ratio_values(c - d, b - c)
+
+        # Same order as identify_harmonic_patterns so the sums round identically
+        pattern_signals = np.zeros(length - 4)
+        for direction in [1, -1]:
+            for check, probability in [(self._is_bat_pattern, 0.8), (self._is_butterfly_pattern, 0.8),
+                                       (self._is_gartley_pattern, 0.7), (self._is_crab_pattern, 0.9)]:
+                matches = check(xab, xad, abc, bcd, direction)
+                pattern_signals = np.where(matches, pattern_signals + direction * probability, pattern_signals)
+        signals[4:] = pattern_signals
+        return signals
+
+    @staticmethod
+    def _ratio_values(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+        """abs(numerator) / abs(denominator), 0 where the denominator is not positive"""
+        denominator = np.abs(denominator)
+        ratios = np.zeros(len(denominator))
+        np.divide(np.abs(numerator), denominator, out=ratios, where=denominator > 0)
+        return ratios
+
     def get_fractal_features(self, data: pd.DataFrame) -> Dict[str, List[float]]:
         """Generate fractal-based features for the neural network"""
-        top_fractals, bottom_fractals = self.identify_fractals(data)
-        
-        features = {
-            'top_fractals': top_fractals,
-            'bottom_fractals': bottom_fractals,
-            'distance_to_top': [],
-            'distance_to_bottom': [],
-            'pattern_signals': []
+        top_fractals, bottom_fractals = self.fractal_flags(data['high'].values, data['low'].values)
+        positions = np.arange(len(data))
+        last_top_idx = np.maximum.accumulate(np.where(top_fractals, positions, -1))
+        last_bottom_idx = np.maximum.accumulate(np.where(bottom_fractals, positions, -1))
+
+        return {
+            'top_fractals': top_fractals.tolist(),
+            'bottom_fractals': bottom_fractals.tolist(),
+            'distance_to_top': np.where(last_top_idx != -1, positions - last_top_idx, -1).tolist(),
+            'distance_to_bottom': np.where(last_bottom_idx != -1, positions - last_bottom_idx, -1).tolist(),
+            'pattern_signals': self.pattern_signal_values(data['close'].values).tolist()
         }
-        
-        last_top_idx = -1
-        last_bottom_idx = -1
-        
-        for i in range(len(data)):
-            if top_fractals[i]:
-                last_top_idx = i
-            if bottom_fractals[i]:
-                last_bottom_idx = i
-                
-            features['distance_to_top'].append(i - last_top_idx if last_top_idx != -1 else -1)
-            features['distance_to_bottom'].append(i - last_bottom_idx if last_bottom_idx != -1 else -1)
-            
-            # Add harmonic pattern signals
-            patterns = self.identify_harmonic_patterns(data, i)
-            pattern_signal = sum(p.direction * p.probability for p in patterns)
-            features['pattern_signals'].append(pattern_signal)
-        
-        return features
@@ -1,12 +1,41 @@
 import numpy as np
 import talib
 import pandas as pd
-from typing import Tuple, Dict
-from src.utils.config import TRADING_CONFIG
+from numpy.lib.stride_tricks import sliding_window_view
+from typing import Tuple, Dict, Optional
+from src.utils.config import TRADING_CONFIG, BACKTEST_CONFIG, FEATURE_PARAMS
 from src.features.calculator import FeatureCalculator
 from src.features.fractals import FractalAnalyzer
 from src.features.technical import TechnicalAnalyzer
 
+# Bars before the current one the signal features are computed on
+LOOKBACK_PERIODS = {
+    '1m': 60,    # 1 hour of data in 1m
+    '5m': 24     # 2 hours of data in 5m
+}
+# Bars per year, annualizes the volatility of the slice
+ANNUALIZATION_PERIODS = {
+    '1m': 525600,  # minutes in a year
+    '5m': 105120   # 5m periods in a year
+}
+VOLATILITY_THRESHOLDS = {
+    '1m': {'high': 0.05, 'low': 0.02},  # 5% and 2% for 1m
+    '5m': {'high': 0.08, 'low': 0.03}   # 8% and 3% for 5m
+}
+TREND_ADX_THRESHOLDS = {'1m': 20, '5m': 25}
+REGIME_LOOKBACK = 20
+REGIME_THRESHOLD = -0.05  # Less restrictive threshold
+# signal_pred values a signal changes at (direction and momentum agreement)
+SIGNAL_PRED_THRESHOLDS = (0.45, 0.5)
+# Batched model inference can differ from row-wise inference in the last bits
+# (float32 sums in another order); rows predicted this close to a threshold
+# are predicted again row by row
+BATCH_PREDICTION_TOLERANCE = 1e-4
+
+# Columns of SignalGenerator.get_signals
+SIGNAL_COLUMNS = ['signal', 'signal_pred', 'price_pred', 'confidence', 'adjusted_confidence',
+                  'volatility', 'adx', 'momentum', 'adx_filter', 'regime_filter']
+
 class SignalGenerator:
     def __init__(self, model, timeframe='5m'):
         """
@@ -72,38 +101,24 @@ class SignalGenerator:
         if current_idx >= len(df):
             return 0
         
-        # Validate that timeframe is valid
-        if self.timeframe not in ['1m', '5m']:
-            print(f"❌ Invalid timeframe: {self.timeframe}. Using 5m as default.")
-            self.timeframe = '5m'
-            self.tf_params = self.config['timeframe_params']['5m']
+        self._validate_timeframe()
         
         # Adjust data slice according to timeframe
-        lookback_periods = {
-            '1m': 60,    # 1 hour of data in 1m
-            '5m': 24     # 2 hours of data in 5m
-        }
-        
-        periods = lookback_periods.get(self.timeframe, 24)
+        periods = LOOKBACK_PERIODS[self.timeframe]
         df_slice = df.iloc[max(0, current_idx-periods):current_idx+1]
         
-        # Calculate volatility adapted to timeframe
-        if self.timeframe == '1m':
-            # 60-minute volatility, annualized
-            volatility = df_slice['close'].pct_change().std() * np.sqrt(525600)  # minutes in a year
-        else:  # 5m
-            # 2-hour volatility, annualized
-            volatility = df_slice['close'].pct_change().std() * np.sqrt(105120)  # 5m periods in a year
+        # Calculate volatility adapted to timeframe (60-minute for 1m, 2-hour for 5m), annualized
+        volatility = df_slice['close'].pct_change().std() * np.sqrt(ANNUALIZATION_PERIODS[self.timeframe])
         
         # Calculate ADX adapted to timeframe
-        adx_period = 14 if self.timeframe == '5m' else 30  # More periods for 1m
+        adx_period = self.tf_params['adx_period']
         adx = talib.ADX(df_slice['high'].values, df_slice['low'].values, df_slice['close'].values, 
                         timeperiod=adx_period)
         current_adx = adx[-1] if not np.isnan(adx[-1]) else 0
         
         # Calculate short-term momentum
-        roc_period = 10 if self.timeframe == '5m' else 20  # Rate of Change
-        momentum = talib.ROC(df_slice['close'], timeperiod=roc_period)
+        roc_period = self.tf_params['momentum_period']
+        momentum = talib.ROC(df_slice['close'].values, timeperiod=roc_period)
         current_momentum = momentum[-1] if not np.isnan(momentum[-1]) else 0
         
         # Prepare combined features
@@ -126,12 +141,7 @@ class SignalGenerator:
             _, confidence = self.technical_analyzer.predict_price_movement(df_slice)
             
             # Adjust confidence factors according to timeframe
-            volatility_thresholds = {
-                '1m': {'high': 0.05, 'low': 0.02},  # 5% and 2% for 1m
-                '5m': {'high': 0.08, 'low': 0.03}   # 8% and 3% for 5m
-            }
-            
-            current_thresholds = volatility_thresholds.get(self.timeframe, {'high': 0.08, 'low': 0.03})
+            current_thresholds = VOLATILITY_THRESHOLDS[self.timeframe]
             
             volatility_factor = 1.0
             if volatility > current_thresholds['high']:
@@ -140,7 +150,7 @@ class SignalGenerator:
                 volatility_factor = 1.2
             
             # Adjust trend factor according to timeframe
-            adx_threshold = 20 if self.timeframe == '1m' else 25
+            adx_threshold = TREND_ADX_THRESHOLDS[self.timeframe]
             trend_factor = min(current_adx / adx_threshold, 1.2)
             
             # Incorporate momentum into confidence
@@ -179,6 +189,242 @@ class SignalGenerator:
             print(f"❌ Error generating signal: {e}")
             return 0
 
+    def _validate_timeframe(self):
+        """Fall back to 5m when the timeframe is not supported"""
+        if self.timeframe not in ['1m', '5m']:
+            print(f"❌ Invalid timeframe: {self.timeframe}. Using 5m as default.")
+            self.timeframe = '5m'
+            self.tf_params = self.config['timeframe_params']['5m']
+
+    def get_signals(self, df: pd.DataFrame, window: Optional[int] = None) -> pd.DataFrame:
+        """
+        Signals of every bar in one pass
+
+        Row i holds what ``get_trading_signal`` computes for bar i from the
+        bars up to it: all of them when window is None, as
+        ``get_trading_signal(df, i)``, otherwise the last window bars, as the
+        live trader's bar store holds them. The signals match those calls
+        exactly. Features smoothed and normalized over a bar's lookback slice
+        are computed per bar on arrays; fractals, patterns, volatility,
+        momentum, the confidence factors and the filters are computed for all
+        bars at once, and the model predicts all bars in batches when it has
+        a ``predict_batch`` method (see ``_predict_all`` for how batched
+        predictions near a threshold are kept exact).
+
+        Args:
+            df: OHLC bars, oldest first
+            window: Bars of history each bar sees, None for all bars before it
+
+        Returns:
+            DataFrame indexed like df with the SIGNAL_COLUMNS, the filter
+            columns are True where the filter lets the bar's direction pass
+        """
+        self._validate_timeframe()
+        count = len(df)
+        if count == 0:
+            return pd.DataFrame(columns=SIGNAL_COLUMNS, index=df.index)
+
+        highs, lows, closes = (df[column].values for column in ('high', 'low', 'close'))
+        positions = np.arange(count)
+        history_starts = np.zeros(count, dtype=np.int64) if window is None else np.maximum(positions - window + 1, 0)
+        starts = np.maximum(history_starts, positions - LOOKBACK_PERIODS[self.timeframe])
+        lengths = positions - starts + 1
+
+        features, adx, filter_adx = self._slice_values(highs, lows, closes, starts, None if window is None else history_starts)
+        feature_count = self.config['feature_count']
+
+        # Fractals only depend on the last 5 bars, so the flags of the whole series serve every slice
+        top_fractals, bottom_fractals = self.fractal_analyzer.fractal_flags(highs, lows)
+        for column, flags in ((feature_count, top_fractals), (feature_count + 1, bottom_fractals)):
+            last_fractal = np.maximum.accumulate(np.where(flags, positions, -1))
+            features[:, column] = np.where(last_fractal >= starts + 4, positions - last_fractal, -1)
+        features[:, feature_count + 2] = np.where(lengths >= 5, self.fractal_analyzer.pattern_signal_values(closes), 0.0)
+        tech_signal = self.technical_analyzer.technical_signal_values(features[:, feature_count + 3], features[:, feature_count + 5])
+        features[:, feature_count + 6] = tech_signal
+
+        volatility = self._slice_volatility(closes, starts, lengths) * np.sqrt(ANNUALIZATION_PERIODS[self.timeframe])
+        roc_period = self.tf_params['momentum_period']
+        momentum = talib.ROC(closes, timeperiod=roc_period)
+        momentum = np.where((lengths > roc_period) & ~np.isnan(momentum), momentum, 0)
+
+        signal_pred, price_pred = self._predict_all(features)
+
+        # Confidence factors, as get_trading_signal applies them
+        confidence = np.minimum(np.abs(tech_signal) / 2, 1.0)
+        thresholds = VOLATILITY_THRESHOLDS[self.timeframe]
+        volatility_factor = np.where(volatility > thresholds['high'], 0.7, np.where(volatility < thresholds['low'], 1.2, 1.0))
+        trend_factor = np.minimum(adx / TREND_ADX_THRESHOLDS[self.timeframe], 1.2)
+        momentum_factor = np.where(
+            np.abs(momentum) > 0.1,
+            np.where(np.sign(momentum) == np.sign(signal_pred - 0.5), 1.1, 0.9),
+            1.0
+        )
+        adjusted_confidence = confidence * volatility_factor * trend_factor * momentum_factor
+        direction = np.where(signal_pred > 0.45, 1, np.where(signal_pred < 0.55, -1, 0))
+
+        adx_filter = np.ones(count, dtype=bool)
+        if self.config['use_adx_filter']:
+            if filter_adx is None:
+                filter_adx = talib.ADX(highs, lows, closes, timeperiod=14)
+            adx_filter = ~(filter_adx < self.config['adx_threshold'])
+
+        regime_filter = np.ones(count, dtype=bool)
+        if self.config['use_regime_filter']:
+            slopes = self._regime_slopes(closes, positions - history_starts >= REGIME_LOOKBACK)
+            regime_filter = ~(((direction > 0) & (slopes < REGIME_THRESHOLD)) |
+                              ((direction < 0) & (slopes > -REGIME_THRESHOLD)))
+
+        confirmed = ~(adjusted_confidence < self.config['confidence_threshold']) & adx_filter & regime_filter
+        return pd.DataFrame({
+            'signal': np.where(confirmed, direction, 0).astype(np.int8),
+            'signal_pred': signal_pred.astype(np.float64),
+            'price_pred': price_pred.astype(np.float64),
+            'confidence': confidence,
+            'adjusted_confidence': adjusted_confidence,
+            'volatility': volatility,
+            'adx': adx,
+            'momentum': momentum,
+            'adx_filter': adx_filter,
+            'regime_filter': regime_filter
+        }, index=df.index)
+
+    def _slice_values(self, highs: np.ndarray, lows: np.ndarray, closes: np.ndarray, starts: np.ndarray,
+                      history_starts: Optional[np.ndarray]) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        """
+        Values that depend on where a bar's slice starts, computed bar by bar
+
+        Returns:
+            Feature rows holding the normalized features and the Bollinger
+            Band position, width and RSI columns, the slice ADX (0 where not
+            defined) and, when history_starts is given, the filter ADX of
+            each bar's history
+        """
+        count = len(closes)
+        feature_count = self.config['feature_count']
+        feature_params = [FEATURE_PARAMS[f'f{k + 1}'] for k in range(feature_count)]
+        adx_period = self.tf_params['adx_period']
+
+        features = np.zeros((count, feature_count + 7))
+        adx = np.zeros(count)
+        filter_adx = None
+        if history_starts is not None and self.config['use_adx_filter']:
+            filter_adx = np.empty(count)
+
+        for i in range(count):
+            start, end = starts[i], i + 1
+            h, l, c = highs[start:end], lows[start:end], closes[start:end]
+            for column, params in enumerate(feature_params):
+                values = FeatureCalculator.calculate_feature_values(h, l, c, params['type'], params['param_a'], params['param_b'])
+                features[i, column] = values[-1] if values is not None else np.nan
+
+            bb_position, bb_width, rsi = self.technical_analyzer.indicator_values(c)
+            features[i, feature_count + 3:feature_count + 6] = bb_position[-1], bb_width[-1], rsi[-1]
+
+            current_adx = talib.ADX(h, l, c, timeperiod=adx_period)[-1]
+            adx[i] = current_adx if not np.isnan(current_adx) else 0
+
+            if filter_adx is not None:
+                history = slice(history_starts[i], end)
+                filter_adx[i] = talib.ADX(highs[history], lows[history], closes[history], timeperiod=14)[-1]
+
+        return features, adx, filter_adx
+
+    @staticmethod
+    def _slice_volatility(closes: np.ndarray, starts: np.ndarray, lengths: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """Standard deviation of the close to close returns of every slice, as pandas computes it"""
+        volatility = np.empty(len(closes))
+        size = lengths.max()
+        full = np.flatnonzero(lengths == size) if size >= 3 else np.array([], dtype=np.int64)
+        windows = sliding_window_view(closes, size) if len(full) else None
+
+        # pandas takes the mean and the squared deviations of the returns with the
+        # NaN of the first one zeroed, summing the same arrays rounds identically
+        unmatched = []
+        for offset in range(0, len(full), chunk_size):
+            bars = full[offset:offset + chunk_size]
+            prices = windows[bars - size + 1]
+            returns = np.zeros(prices.shape)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                returns[:, 1:] = prices[:, 1:] / prices[:, :-1] - 1
+            finite = np.isfinite(returns).all(axis=1)
+            average = returns.sum(axis=1, dtype=np.float64) / (size - 1)
+            deviations = (average[:, None] - returns) ** 2
+            deviations[:, 0] = 0
+            volatility[bars] = np.sqrt(deviations.sum(axis=1, dtype=np.float64) / (size - 2))
+            unmatched.extend(bars[~finite])
+
+        # Short slices at the start and slices with gaps in the prices go through pandas
+        rest = np.setdiff1d(np.arange(len(closes)), full, assume_unique=True)
+        for i in np.concatenate([rest, np.array(unmatched, dtype=np.int64)]):
+            volatility[i] = pd.Series(closes[starts[i]:i + 1]).pct_change().std()
+        return volatility
+
+    def _predict_all(self, features: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Signal and price predictions of every feature row, NaN where the model fails
+
+        Rows are predicted in batches when the model has ``predict_batch``.
+        Rows whose batched signal prediction lies within
+        BATCH_PREDICTION_TOLERANCE of a SIGNAL_PRED_THRESHOLDS value are
+        predicted again row by row, as get_trading_signal predicts them, so the
+        signals match as long as batched and row-wise predictions differ by
+        less than the tolerance. Predictions away from the thresholds keep
+        their batched values.
+        """
+        predict_batch = getattr(self.model, 'predict_batch', None)
+        if predict_batch is not None:
+            try:
+                signal_pred, price_pred = predict_batch(features, batch_size=BACKTEST_CONFIG['signal_batch_size'], verbose=0)
+            except Exception as e:
+                print(f"❌ Batch prediction failed, predicting bar by bar: {e}")
+            else:
+                signal_pred, price_pred = np.array(signal_pred), np.array(price_pred)
+                near = np.zeros(len(signal_pred), dtype=bool)
+                for threshold in SIGNAL_PRED_THRESHOLDS:
+                    near |= np.abs(signal_pred - threshold) <= BATCH_PREDICTION_TOLERANCE
+                for i in np.flatnonzero(near):
+                    try:
+                        signal_pred[i], price_pred[i] = self.model.predict(features[i].reshape(1, -1), verbose=0)
+                    except Exception:
+                        signal_pred[i], price_pred[i] = np.nan, np.nan
+                return signal_pred, price_pred
+
+        predictions = []
+        for row in features:
+            try:
+                predictions.append(self.model.predict(row.reshape(1, -1), verbose=0))
+            except Exception:
+                predictions.append(None)
+
+        # Keep the dtype the model returns, the thresholds compare in it
+        returned = [prediction for prediction in predictions if prediction is not None]
+        dtypes = (np.asarray(returned[0][0]).dtype, np.asarray(returned[0][1]).dtype) if returned else (np.float64, np.float64)
+        missing = (np.nan, np.nan)
+        signal_pred = np.array([(prediction or missing)[0] for prediction in predictions], dtype=dtypes[0])
+        price_pred = np.array([(prediction or missing)[1] for prediction in predictions], dtype=dtypes[1])
+        return signal_pred, price_pred
+
+    @staticmethod
+    def _regime_slopes(closes: np.ndarray, evaluated: np.ndarray, chunk_size: int = 65536) -> np.ndarray:
+        """Slope of the line fitted to the last REGIME_LOOKBACK + 1 closes of the evaluated bars, NaN elsewhere"""
+        slopes = np.full(len(closes), np.nan)
+        bars = np.flatnonzero(evaluated)
+        if len(bars) == 0:
+            return slopes
+
+        x = np.arange(REGIME_LOOKBACK + 1)
+        windows = sliding_window_view(closes, REGIME_LOOKBACK + 1)
+        for offset in range(0, len(bars), chunk_size):
+            chunk = bars[offset:offset + chunk_size]
+            slopes[chunk] = np.polyfit(x, windows[chunk - REGIME_LOOKBACK].T, 1)[0]
+
+        # Fitting many bars at once rounds differently than one np.polyfit per bar,
+        # so the bars close enough to a threshold for that to matter are refitted
+        tolerance = 1e-9 * max(1.0, np.nanmax(np.abs(closes)))
+        for i in bars[np.abs(np.abs(slopes[bars]) - abs(REGIME_THRESHOLD)) <= tolerance]:
+            slopes[i] = np.polyfit(x, closes[i - REGIME_LOOKBACK:i + 1], 1)[0]
+        return slopes
+
     def _get_lorentzian_signal(self, df: pd.DataFrame) -> float:
         """Get signal from Lorentzian model"""
         if not self.config['use_lorentzian']:
@@ -240,12 +486,12 @@ class SignalGenerator:
                     return False
 
         if self.config['use_regime_filter']:
-            lookback = 20
+            lookback = REGIME_LOOKBACK
             if current_idx >= lookback:
                 y = df['close'].values[current_idx-lookback:current_idx+1]
                 x = np.arange(lookback+1)
                 slope, _ = np.polyfit(x, y, 1)
-                regime_threshold = -0.05  # Less restrictive threshold
+                regime_threshold = REGIME_THRESHOLD
                 print(f"📈 Trend slope: {slope:.4f}, threshold: {regime_threshold}")
                 if prediction > 0 and slope < regime_threshold:
                     return False
@@ -10,62 +10,41 @@ class TechnicalAnalyzer:
 
     def calculate_technical_features(self, df: pd.DataFrame) -> Dict[str, List[float]]:
         """Calculate technical indicators and their signals"""
-        features = {}
-        
-        # Calculate Bollinger Bands
+        bb_position, bb_width, rsi = self.indicator_values(df['close'].values)
+        return {
+            'bb_position': bb_position.tolist(),
+            'bb_width': bb_width.tolist(),
+            'rsi': rsi.tolist(),
+            'tech_signal': self._generate_technical_signals(df['close'].values, bb_position, rsi)
+        }
+
+    def indicator_values(self, closes: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Bollinger Band position, Bollinger Band width and RSI of every close"""
         upper, middle, lower = talib.BBANDS(
-            df['close'],
+            closes,
             timeperiod=self.config['bollinger_length'],
             nbdevup=self.config['bollinger_std'],
             nbdevdn=self.config['bollinger_std']
         )
-        
-        # Calculate BB position
-        bb_position = (df['close'] - lower) / (upper - lower)
-        features['bb_position'] = bb_position.tolist()
-        
-        # Calculate BB width
-        bb_width = (upper - lower) / middle
-        features['bb_width'] = bb_width.tolist()
-        
-        # Calculate RSI
-        rsi = talib.RSI(df['close'], timeperiod=self.config['rsi_length'])
-        features['rsi'] = rsi.tolist()
-        
-        # Generate technical signals
-        features['tech_signal'] = self._generate_technical_signals(
-            df['close'].values,
-            bb_position.values,
-            rsi.values
-        )
-        
-        return features
+        with np.errstate(divide='ignore', invalid='ignore'):
+            bb_position = (closes - lower) / (upper - lower)
+            bb_width = (upper - lower) / middle
+        rsi = talib.RSI(closes, timeperiod=self.config['rsi_length'])
+        return bb_position, bb_width, rsi
+
+    @staticmethod
+    def technical_signal_values(bb_position: np.ndarray, rsi: np.ndarray) -> np.ndarray:
+        """Combined RSI and Bollinger Band signal, from -2 (overbought) to 2 (oversold)"""
+        rsi_signal = np.where(rsi < 30, 1, np.where(rsi > 70, -1, 0))
+        bb_signal = np.where(bb_position < 0.2, 1, np.where(bb_position > 0.8, -1, 0))
+        return rsi_signal + bb_signal
 
     def _generate_technical_signals(self, 
                                   prices: np.ndarray, 
                                   bb_position: np.ndarray, 
                                   rsi: np.ndarray) -> List[float]:
         """Generate combined technical signals"""
-        signals = []
-        
-        for i in range(len(prices)):
-            signal = 0
-            
-            # RSI signals
-            if rsi[i] < 30:
-                signal += 1
-            elif rsi[i] > 70:
-                signal -= 1
-                
-            # Bollinger Bands signals
-            if bb_position[i] < 0.2:  # Price near lower band
-                signal += 1
-            elif bb_position[i] > 0.8:  # Price near upper band
-                signal -= 1
-                
-            signals.append(signal)
-            
-        return signals
+        return self.technical_signal_values(np.asarray(bb_position), np.asarray(rsi)).tolist()
 
     def predict_price_movement(self, df: pd.DataFrame) -> Tuple[float, float]:
         """Predict price movement using technical indicators"""
@@ -75,6 +75,14 @@ class LorentzianModel:
         predictions = self.model.predict(features, verbose=verbose)
         return predictions[0][0][0], predictions[1][0][0]  # signal_pred, price_pred
 
+    def predict_batch(self, features, batch_size=4096, verbose=0):
+        """Predict signal and price for every row, returns two 1-D arrays"""
+        if features.shape[1] != 11:
+            raise ValueError(f"Expected 11 features, but got {features.shape[1]}")
+            
+        predictions = self.model.predict(features, batch_size=batch_size, verbose=verbose)
+        return predictions[0][:, 0], predictions[1][:, 0]  # signal_preds, price_preds
+
     def train(self, X_train, y_train_signal, y_train_price, epochs=10, batch_size=32, validation_split=0.2):
         """Train the model with both signal and price targets"""
         return self.model.fit(
@@ -0,0 +1,5 @@
+from .broker import SimulatedBroker
+from .ticks import SyntheticTickSource, load_recorded_ticks, load_history_bars
+from .server import CapitalSimulator
+
+__all__ = ['SimulatedBroker', 'SyntheticTickSource', 'load_recorded_ticks', 'load_history_bars', 'CapitalSimulator']
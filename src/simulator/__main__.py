@@ -0,0 +1,64 @@
+import asyncio
+import argparse
+from termcolor import colored
+
+from src.simulator import CapitalSimulator, SimulatedBroker, SyntheticTickSource, load_recorded_ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local Capital.com REST + WebSocket simulator")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--rest-port', type=int, default=8080)
+    parser.add_argument('--ws-port', type=int, default=8081)
+    parser.add_argument('--epics', default='BTCUSD', help="Comma separated epics for synthetic ticks")
+    parser.add_argument('--ticks', help="Recorded ticks, CSV (timestamp,epic,bid,ofr) or a TickRecorder .bin file")
+    parser.add_argument('--speed', type=float, default=1.0, help="Replay speed multiplier (1 to 1000)")
+    parser.add_argument('--tick-interval', type=float, default=0.5, help="Seconds between synthetic ticks")
+    parser.add_argument('--history-minutes', type=int, default=7 * 24 * 60, help="Synthetic history to seed")
+    parser.add_argument('--balance', type=float, default=10000.0)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--latency-jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--reject-rate', type=float, default=0.0)
+    parser.add_argument('--disconnect-interval', type=float, default=None)
+    parser.add_argument('--session-ttl', type=float, default=None)
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+
+    broker = SimulatedBroker(initial_balance=args.balance, reject_rate=args.reject_rate, seed=args.seed)
+
+    if args.ticks:
+        ticks = load_recorded_ticks(args.ticks)
+    else:
+        source = SyntheticTickSource(
+            epics=args.epics.split(','),
+            tick_interval=args.tick_interval,
+            seed=args.seed
+        )
+        for epic in source.epics:
+            broker.seed_bars(epic, source.generate_history(epic, args.history_minutes))
+        ticks = iter(source)
+
+    simulator = CapitalSimulator(
+        ticks,
+        broker=broker,
+        host=args.host,
+        rest_port=args.rest_port,
+        ws_port=args.ws_port,
+        speed=args.speed,
+        latency=args.latency,
+        latency_jitter=args.latency_jitter,
+        error_rate=args.error_rate,
+        disconnect_interval=args.disconnect_interval,
+        session_ttl=args.session_ttl,
+        seed=args.seed
+    )
+
+    try:
+        asyncio.run(simulator.serve_forever())
+    except KeyboardInterrupt:
+        print(colored(f"\nSimulator stopped: {simulator.stats}", "yellow"))
+
+
+if __name__ == '__main__':
+    main()
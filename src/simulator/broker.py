@@ -0,0 +1,339 @@
+import uuid
+import random
+import threading
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+# Bar length in seconds per Capital.com resolution
+RESOLUTION_SECONDS = {
+    'MINUTE': 60,
+    'MINUTE_5': 300,
+    'MINUTE_15': 900,
+    'MINUTE_30': 1800,
+    'HOUR': 3600,
+    'HOUR_4': 14400,
+    'DAY': 86400,
+    'WEEK': 604800
+}
+
+TIME_FORMAT = '%Y-%m-%dT%H:%M:%S'
+
+
+def format_time(timestamp: float) -> str:
+    """Format epoch seconds the way Capital.com formats snapshot times"""
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime(TIME_FORMAT)
+
+
+def parse_time(value: str) -> float:
+    """Parse a Capital.com date parameter into epoch seconds"""
+    return datetime.strptime(value[:19], TIME_FORMAT).replace(tzinfo=timezone.utc).timestamp()
+
+
+class SimulatedBroker:
+    """In-memory order book and account used by the Capital.com simulator.
+
+    Quotes are pushed in with ``update_quote``. Market orders fill at the
+    current ofr (BUY) or bid (SELL) and positions close on the opposite side,
+    market fills and stop exits moved against the trader by ``slippage``.
+    Attached stop and profit levels are checked on every quote. One-minute
+    bars are built from the quotes so /prices can serve history at any
+    resolution.
+    """
+
+    def __init__(self, initial_balance: float = 10000.0, leverage: float = 2.0, reject_rate: float = 0.0,
+                 seed: Optional[int] = None, slippage: float = 0.0):
+        """
+        Initialize SimulatedBroker
+
+        Args:
+            initial_balance: Starting account balance
+            leverage: Leverage used to compute used margin
+            reject_rate: Fraction of orders rejected at confirmation
+            seed: Random seed for order rejections
+            slippage: Adverse move of market fills and stop exits as a fraction of the quote
+        """
+        self._random = random.Random(seed)
+        self.balance = initial_balance
+        self.deposit = initial_balance
+        self.leverage = leverage
+        self.reject_rate = reject_rate
+        self.slippage = slippage
+
+        self.quotes: Dict[str, Dict] = {}
+        self.bars: Dict[str, List[Dict]] = {}
+        self.positions: Dict[str, Dict] = {}
+        self.confirms: Dict[str, Dict] = {}
+        self.closed_positions: List[Dict] = []
+        self._lock = threading.RLock()
+
+    def seed_bars(self, epic: str, bars: List[Dict]):
+        """Load one-minute history bars (t, bid and ask OHLC, volume) for an epic"""
+        with self._lock:
+            self.bars[epic] = list(bars)
+
+    def update_quote(self, epic: str, bid: float, ofr: float, timestamp: float) -> List[Dict]:
+        """Apply a new quote and return the positions closed by stop or profit levels"""
+        with self._lock:
+            self.quotes[epic] = {'bid': bid, 'ofr': ofr, 'timestamp': timestamp}
+            self._update_bar(epic, bid, ofr, timestamp)
+            return self._check_levels(epic, bid, ofr)
+
+    def _update_bar(self, epic: str, bid: float, ofr: float, timestamp: float):
+        """Aggregate the quote into the current one-minute bar"""
+        bars = self.bars.setdefault(epic, [])
+        bar_start = timestamp - timestamp % 60
+        if bars and bars[-1]['t'] == bar_start:
+            bar = bars[-1]
+            bar['bid'][1] = max(bar['bid'][1], bid)
+            bar['bid'][2] = min(bar['bid'][2], bid)
+            bar['bid'][3] = bid
+            bar['ask'][1] = max(bar['ask'][1], ofr)
+            bar['ask'][2] = min(bar['ask'][2], ofr)
+            bar['ask'][3] = ofr
+            bar['volume'] += 1
+        elif not bars or bars[-1]['t'] < bar_start:
+            bars.append({'t': bar_start, 'bid': [bid, bid, bid, bid], 'ask': [ofr, ofr, ofr, ofr], 'volume': 1})
+
+    def _check_levels(self, epic: str, bid: float, ofr: float) -> List[Dict]:
+        """Close positions whose stop or profit level was crossed"""
+        closed = []
+        for deal_id, position in list(self.positions.items()):
+            if position['epic'] != epic:
+                continue
+            exit_price = bid if position['direction'] == 'BUY' else ofr
+            stop, profit = position.get('stopLevel'), position.get('profitLevel')
+            if position['direction'] == 'BUY':
+                stopped = stop is not None and exit_price <= stop
+                hit = stopped or (profit is not None and exit_price >= profit)
+            else:
+                stopped = stop is not None and exit_price >= stop
+                hit = stopped or (profit is not None and exit_price <= profit)
+            if hit:
+                # Stops execute as market orders, profit levels as limits
+                if stopped:
+                    exit_price = self._slipped(exit_price, 'SELL' if position['direction'] == 'BUY' else 'BUY')
+                closed.append(self._close(deal_id, exit_price))
+        return closed
+
+    def _slipped(self, price: float, direction: str) -> float:
+        """Market fill price of a BUY or SELL after slippage"""
+        return price * (1 + self.slippage) if direction == 'BUY' else price * (1 - self.slippage)
+
+    def open_position(self, epic: str, direction: str, size: float,
+                      stop_level: Optional[float] = None, profit_level: Optional[float] = None) -> Dict:
+        """Fill a market order against the current quote and return its confirm"""
+        with self._lock:
+            deal_reference = f"o_{uuid.uuid4()}"
+            quote = self.quotes.get(epic)
+            confirm = {
+                'date': format_time(quote['timestamp']) if quote else None,
+                'status': 'REJECTED',
+                'dealStatus': 'REJECTED',
+                'epic': epic,
+                'dealReference': deal_reference,
+                'dealId': None,
+                'affectedDeals': [],
+                'level': None,
+                'size': size,
+                'direction': direction,
+                'stopLevel': stop_level,
+                'profitLevel': profit_level,
+                'guaranteedStop': False
+            }
+
+            if quote is None:
+                confirm['reason'] = 'MARKET_CLOSED'
+            elif size <= 0:
+                confirm['reason'] = 'INVALID_SIZE'
+            elif self._random.random() < self.reject_rate:
+                confirm['reason'] = 'SIMULATED_REJECTION'
+            else:
+                level = self._slipped(quote['ofr'] if direction == 'BUY' else quote['bid'], direction)
+                deal_id = str(uuid.uuid4())
+                self.positions[deal_id] = {
+                    'dealId': deal_id,
+                    'dealReference': deal_reference,
+                    'epic': epic,
+                    'direction': direction,
+                    'size': size,
+                    'level': level,
+                    'stopLevel': stop_level,
+                    'profitLevel': profit_level,
+                    'createdDateUTC': format_time(quote['timestamp'])
+                }
+                confirm.update({
+                    'status': 'OPEN',
+                    'dealStatus': 'ACCEPTED',
+                    'dealId': deal_id,
+                    'level': level,
+                    'affectedDeals': [{'dealId': deal_id, 'status': 'OPENED'}]
+                })
+
+            self.confirms[deal_reference] = confirm
+            return confirm
+
+    def close_position(self, deal_id: str) -> Optional[Dict]:
+        """Close a position at market and return its closing record"""
+        with self._lock:
+            position = self.positions.get(deal_id)
+            if position is None:
+                return None
+            quote = self.quotes[position['epic']]
+            if position['direction'] == 'BUY':
+                exit_price = self._slipped(quote['bid'], 'SELL')
+            else:
+                exit_price = self._slipped(quote['ofr'], 'BUY')
+            return self._close(deal_id, exit_price)
+
+    def _close(self, deal_id: str, exit_price: float) -> Dict:
+        """Realize the P&L of a position"""
+        position = self.positions.pop(deal_id)
+        pnl = self._position_upl(position, exit_price)
+        self.balance += pnl
+        record = dict(position, exitLevel=exit_price, profitLoss=pnl, dealReference=f"c_{uuid.uuid4()}")
+        self.closed_positions.append(record)
+        self.confirms[record['dealReference']] = {
+            'dealReference': record['dealReference'],
+            'dealId': deal_id,
+            'status': 'CLOSED',
+            'dealStatus': 'ACCEPTED',
+            'level': exit_price,
+            'profit': pnl,
+            'affectedDeals': [{'dealId': deal_id, 'status': 'FULLY_CLOSED'}]
+        }
+        return record
+
+    def _position_upl(self, position: Dict, price: float) -> float:
+        """Unrealized P&L of a position at price"""
+        sign = 1 if position['direction'] == 'BUY' else -1
+        return sign * (price - position['level']) * position['size']
+
+    def get_confirm(self, deal_reference: str) -> Optional[Dict]:
+        """Get the confirmation for a deal reference"""
+        with self._lock:
+            return self.confirms.get(deal_reference)
+
+    def get_positions(self) -> List[Dict]:
+        """Get open positions in /positions response format"""
+        with self._lock:
+            result = []
+            for position in self.positions.values():
+                quote = self.quotes[position['epic']]
+                exit_price = quote['bid'] if position['direction'] == 'BUY' else quote['ofr']
+                result.append({
+                    'position': dict(position, upl=self._position_upl(position, exit_price)),
+                    'market': {
+                        'epic': position['epic'],
+                        'bid': quote['bid'],
+                        'offer': quote['ofr'],
+                        'marketStatus': 'TRADEABLE'
+                    }
+                })
+            return result
+
+    def get_account(self) -> Dict:
+        """Get the account in /accounts response format"""
+        with self._lock:
+            upl = 0.0
+            used_margin = 0.0
+            for position in self.positions.values():
+                quote = self.quotes[position['epic']]
+                exit_price = quote['bid'] if position['direction'] == 'BUY' else quote['ofr']
+                upl += self._position_upl(position, exit_price)
+                used_margin += position['level'] * position['size'] / self.leverage
+            return {
+                'accountId': 'SIMULATOR',
+                'accountName': 'Simulator',
+                'preferred': True,
+                'accountType': 'CFD',
+                'currency': 'USD',
+                'balance': {
+                    'balance': self.balance,
+                    'deposit': self.deposit,
+                    'profitLoss': upl,
+                    'available': self.balance + upl - used_margin,
+                    'usedMargin': used_margin
+                }
+            }
+
+    def get_market(self, epic: str) -> Optional[Dict]:
+        """Get market details in /markets/{epic} response format"""
+        with self._lock:
+            quote = self.quotes.get(epic)
+            if quote is None:
+                return None
+            return {
+                'instrument': {'epic': epic, 'name': epic, 'type': 'CRYPTOCURRENCIES', 'currency': 'USD'},
+                'dealingRules': {'minDealSize': {'unit': 'POINTS', 'value': 0.001}},
+                'snapshot': {
+                    'marketStatus': 'TRADEABLE',
+                    'bid': quote['bid'],
+                    'offer': quote['ofr'],
+                    'updateTime': format_time(quote['timestamp'])
+                }
+            }
+
+    def current_bar(self, epic: str, resolution: str = 'MINUTE') -> Optional[Dict]:
+        """Get the forming bar of an epic at a resolution (t, bid and ask OHLC)"""
+        seconds = RESOLUTION_SECONDS.get(resolution, 60)
+        with self._lock:
+            bars = self.bars.get(epic)
+            if not bars:
+                return None
+            start = bars[-1]['t'] - bars[-1]['t'] % seconds
+            current = None
+            for bar in reversed(bars):
+                if bar['t'] < start:
+                    break
+                if current is None:
+                    current = {'t': start, 'bid': list(bar['bid']), 'ask': list(bar['ask'])}
+                    continue
+                # Walking backwards, so earlier bars set the open
+                for side in ('bid', 'ask'):
+                    current[side][0] = bar[side][0]
+                    current[side][1] = max(current[side][1], bar[side][1])
+                    current[side][2] = min(current[side][2], bar[side][2])
+            return current
+
+    def get_prices(self, epic: str, resolution: str = 'MINUTE', max_bars: int = 10,
+                   from_time: Optional[float] = None, to_time: Optional[float] = None) -> List[Dict]:
+        """Get history bars in /prices/{epic} response format"""
+        seconds = RESOLUTION_SECONDS.get(resolution, 60)
+        with self._lock:
+            # Include every minute of the first bar so it is complete, like the real API
+            first = None if from_time is None else from_time - from_time % seconds
+            source = [
+                bar for bar in self.bars.get(epic, [])
+                if (first is None or bar['t'] >= first) and (to_time is None or bar['t'] - bar['t'] % seconds <= to_time)
+            ]
+
+        # Aggregate one-minute bars into the requested resolution
+        grouped = []
+        for bar in source:
+            start = bar['t'] - bar['t'] % seconds
+            if grouped and grouped[-1]['t'] == start:
+                current = grouped[-1]
+                for side in ('bid', 'ask'):
+                    current[side][1] = max(current[side][1], bar[side][1])
+                    current[side][2] = min(current[side][2], bar[side][2])
+                    current[side][3] = bar[side][3]
+                current['volume'] += bar['volume']
+            else:
+                grouped.append({'t': start, 'bid': list(bar['bid']), 'ask': list(bar['ask']), 'volume': bar['volume']})
+
+        if from_time is not None:
+            grouped = [bar for bar in grouped if bar['t'] >= from_time]
+
+        prices = []
+        for bar in grouped[-max_bars:] if max_bars else grouped:
+            snapshot = format_time(bar['t'])
+            prices.append({
+                'snapshotTime': snapshot,
+                'snapshotTimeUTC': snapshot,
+                'openPrice': {'bid': bar['bid'][0], 'ask': bar['ask'][0]},
+                'highPrice': {'bid': bar['bid'][1], 'ask': bar['ask'][1]},
+                'lowPrice': {'bid': bar['bid'][2], 'ask': bar['ask'][2]},
+                'closePrice': {'bid': bar['bid'][3], 'ask': bar['ask'][3]},
+                'lastTradedVolume': bar['volume']
+            })
+        return prices
@@ -0,0 +1,217 @@
+import sys
+import json
+import time
+import difflib
+import argparse
+from typing import Any, Callable, Dict, List, Optional
+from termcolor import colored
+
+from src.api.order_manager import Order
+from src.core.trader import LorentzianTrader
+from src.simulator.replay import TickSimulation, print_simulation_results
+from src.simulator.ticks import load_history_bars, load_recorded_ticks
+from src.utils.config import DEFAULT_EPIC, DEFAULT_TIMEFRAME
+from src.utils.latency import LatencyHistogram
+from src.utils.visualization import print_latency_summary
+
+# Wall-clock stages of a replayed tick, in pipeline order
+HARNESS_STAGES = ['broker', 'orders', 'quote_handler', 'triggers', 'exit_rules', 'signal']
+
+
+class DecisionLog:
+    """Ordered trading decisions of a replay, one JSON object per decision.
+
+    Entries carry the market time and only values that follow from the
+    ticks, history and model (no deal ids or wall-clock times), so two
+    replays of the same input produce identical logs.
+    """
+
+    def __init__(self, entries: Optional[List[Dict[str, Any]]] = None):
+        self.entries = entries or []
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def record(self, t: float, kind: str, **fields):
+        """Append a decision of the given kind at market time t"""
+        self.entries.append({'t': t, 'kind': kind, **fields})
+
+    def lines(self) -> List[str]:
+        return [json.dumps(entry, sort_keys=True) for entry in self.entries]
+
+    def save(self, path: str):
+        """Write the log as JSON lines"""
+        with open(path, 'w') as f:
+            for line in self.lines():
+                f.write(line + '\n')
+
+    @classmethod
+    def load(cls, path: str) -> 'DecisionLog':
+        with open(path) as f:
+            return cls([json.loads(line) for line in f if line.strip()])
+
+    def diff(self, baseline: 'DecisionLog', context: int = 1) -> List[str]:
+        """Unified diff of this log against a baseline, empty when both are identical"""
+        return list(difflib.unified_diff(baseline.lines(), self.lines(), 'baseline', 'replay', n=context, lineterm=''))
+
+    def counts(self) -> Dict[str, int]:
+        """Decisions per kind"""
+        counts: Dict[str, int] = {}
+        for entry in self.entries:
+            counts[entry['kind']] = counts.get(entry['kind'], 0) + 1
+        return counts
+
+
+class ReplayHarness(TickSimulation):
+    """Deterministic TickSimulation that logs decisions and times the pipeline.
+
+    The trader runs on the replay clock against the simulated broker and an
+    in-memory session, so its decisions depend only on the ticks, the
+    starting history and the model. Signal evaluations, orders, exit rule
+    closes and broker stop/profit fills are written to a DecisionLog that
+    can be diffed against the log of a baseline run. Every stage of a tick
+    is also timed on the wall clock, so a refactor can be checked for both
+    identical behaviour and speed in one run.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.decisions = DecisionLog()
+        self.stages: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in HARNESS_STAGES}
+
+    def _timed(self, stage: str, func: Callable, on_result: Optional[Callable] = None) -> Callable:
+        """Wrap func so every call is timed into a stage and its result passed to on_result"""
+        histogram = self.stages[stage]
+
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            result = func(*args, **kwargs)
+            histogram.record(time.perf_counter() - started)
+            if on_result is not None:
+                on_result(result, *args)
+            return result
+        return wrapper
+
+    def _build_trader(self) -> LorentzianTrader:
+        trader = super()._build_trader()
+        generator, positions = trader.signal_generator, trader.active_positions
+
+        def log_signal(signal, history, current_idx):
+            self.decisions.record(self.clock(), 'signal', signal=int(signal), close=float(history['close'].iloc[current_idx]))
+
+        def log_exits(closed, *args):
+            for position in closed:
+                self.decisions.record(
+                    self.clock(), 'exit', reason=position.get('exit_reason', 'exit_rule'),
+                    signal=position['signal'], entry=position['entry_price'], exit=position['exit_price']
+                )
+
+        generator.get_trading_signal = self._timed('signal', generator.get_trading_signal, log_signal)
+        positions.update_positions = self._timed('exit_rules', positions.update_positions, log_exits)
+        positions.check_triggers = self._timed('triggers', positions.check_triggers, log_exits)
+        trader.order_manager.add_order_listener(self._log_order)
+        return trader
+
+    def _log_order(self, order: Order):
+        self.decisions.record(
+            self.clock(), 'order', action=order.action, state=order.state, direction=order.direction,
+            size=order.size, stop=order.stop_level, profit=order.profit_level,
+            level=(order.confirm or {}).get('level'), error=order.error
+        )
+
+    def _replay_tick(self, timestamp: float, epic: str, bid: float, ofr: float) -> List[Dict]:
+        stages = self.stages
+        started = time.perf_counter()
+        closed = self.broker.update_quote(epic, bid, ofr, timestamp)
+        broker_done = time.perf_counter()
+        self.trader.order_manager.process()
+        orders_done = time.perf_counter()
+        self.trader.handle_quote_update({'epic': epic, 'bid': bid, 'ofr': ofr, 'timestamp': int(timestamp * 1000)})
+        stages['quote_handler'].record(time.perf_counter() - orders_done)
+        stages['orders'].record(orders_done - broker_done)
+        stages['broker'].record(broker_done - started)
+
+        for position in closed:
+            self.decisions.record(
+                timestamp, 'broker_close', direction=position['direction'], size=position['size'],
+                level=position['level'], exit=position['exitLevel'], profit_loss=position['profitLoss']
+            )
+        return closed
+
+    def run(self, limit: Optional[int] = None) -> Dict:
+        """
+        Replay the ticks
+
+        Args:
+            limit: Ticks replayed through the trader at most
+
+        Returns:
+            TickSimulation statistics plus 'decisions' (DecisionLog) and
+            'stages' (wall-clock milliseconds per HARNESS_STAGES stage)
+        """
+        results = super().run(limit)
+        results['decisions'] = self.decisions
+        results['stages'] = {stage: histogram.summary() for stage, histogram in self.stages.items()}
+        return results
+
+
+def default_model(weights: Optional[str] = None, seed: int = 0):
+    """LorentzianModel with fixed weights: loaded from a file, or seeded initial weights"""
+    import tensorflow as tf
+    from src.models.neural import LorentzianModel
+    tf.keras.utils.set_random_seed(seed)
+    model = LorentzianModel()
+    if weights:
+        model.load_weights(weights)
+    return model
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded session and diff its decisions against a baseline")
+    parser.add_argument('--ticks', required=True, help="Recorded ticks, CSV (timestamp,epic,bid,ofr) or a TickRecorder .bin file")
+    parser.add_argument('--history', help="CSV of one-minute bars (timestamp,open,high,low,close) before the first tick")
+    parser.add_argument('--baseline', help="Decision log of a baseline run to compare against")
+    parser.add_argument('--save', help="Write this run's decision log here (e.g. to create a baseline)")
+    parser.add_argument('--weights', help="LorentzianModel weights, without them the model is built from --seed")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--epic', default=DEFAULT_EPIC)
+    parser.add_argument('--timeframe', default=DEFAULT_TIMEFRAME)
+    parser.add_argument('--latency', type=float, default=None, help="Seconds between an order and its fill")
+    parser.add_argument('--slippage', type=float, default=None)
+    parser.add_argument('--warmup-minutes', type=int, default=None, help="Warmup ticks when no --history is given")
+    parser.add_argument('--limit', type=int, default=None, help="Ticks replayed at most")
+    args = parser.parse_args()
+
+    harness = ReplayHarness(
+        load_recorded_ticks(args.ticks),
+        epic=args.epic,
+        timeframe=args.timeframe,
+        model=default_model(args.weights, args.seed),
+        latency=args.latency,
+        slippage=args.slippage,
+        warmup_minutes=args.warmup_minutes,
+        history=load_history_bars(args.history) if args.history else None
+    )
+    print(colored("🎞️ Replaying session...", "cyan"))
+    results = harness.run(limit=args.limit)
+    decisions = results['decisions']
+
+    print_simulation_results(results)
+    print_latency_summary(results['stages'])
+    print(colored(f"\n📝 {len(decisions)} decisions: {decisions.counts()}", "cyan"))
+
+    if args.save:
+        decisions.save(args.save)
+        print(f"💾 Decision log saved to {args.save}")
+
+    if args.baseline:
+        differences = decisions.diff(DecisionLog.load(args.baseline))
+        if differences:
+            print(colored(f"❌ Decisions differ from {args.baseline}:", "red"))
+            print('\n'.join(differences[:200]))
+            sys.exit(1)
+        print(colored(f"✅ Decisions match {args.baseline}", "green"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,412 @@
+import os
+import time
+import heapq
+import argparse
+import contextlib
+import concurrent.futures
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from tabulate import tabulate
+from termcolor import colored
+
+from src.api.capital import CapitalAPI
+from src.api.decoding import decode_prices
+from src.api.order_manager import Order, ORDER_STATES
+from src.core.session import TradingSession
+from src.core.trader import LorentzianTrader
+from src.simulator.broker import SimulatedBroker, format_time, parse_time
+from src.simulator.ticks import Tick, SyntheticTickSource, load_recorded_ticks
+from src.utils.config import BACKTEST_CONFIG, DEFAULT_EPIC, DEFAULT_TIMEFRAME
+from src.utils.latency import LatencyTrace
+
+
+class ReplayClock:
+    """Market time of a replay, called like time.time"""
+
+    def __init__(self, now: float = 0.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class SimulatedCapitalAPI:
+    """In-process stand-in for the CapitalAPI calls the trader makes, served by a SimulatedBroker"""
+
+    validate_order = CapitalAPI.validate_order
+
+    def __init__(self, broker: SimulatedBroker):
+        self.broker = broker
+
+    @property
+    def account_info(self) -> Dict:
+        balance = self.broker.get_account()['balance']
+        return {
+            'accountInfo': {
+                'balance': balance['balance'],
+                'available': balance['available'],
+                'profitLoss': balance['profitLoss'],
+                'deposit': balance['deposit'],
+                'usedMargin': balance['usedMargin']
+            }
+        }
+
+    def get_positions(self) -> List[Dict]:
+        return self.broker.get_positions()
+
+    def get_market_info(self, epic: str, priority: Optional[int] = None) -> Optional[Dict]:
+        return self.broker.get_market(epic)
+
+    def get_price_history(self, epic: str, resolution: str = 'MINUTE', from_date: Optional[str] = None,
+                          to_date: Optional[str] = None, max_bars: int = 1000, priority: Optional[int] = None,
+                          decode: Optional[str] = None) -> Dict:
+        prices = self.broker.get_prices(
+            epic, resolution, max_bars,
+            from_time=parse_time(from_date) if from_date else None,
+            to_time=parse_time(to_date) if to_date else None
+        )
+        return decode_prices(prices, decode) if decode else {'prices': prices}
+
+    def invalidate_cache(self, *categories: str):
+        pass
+
+
+class SimulatedOrderManager:
+    """OrderManager interface that fills orders on a SimulatedBroker in market time.
+
+    Orders are validated against the last quote when submitted and reach the
+    broker ``latency`` seconds of market time later, where they fill at the
+    bid or ofr of that moment. The replay calls ``process`` after every quote,
+    so fills, confirmations and order futures advance with the ticks instead
+    of with the wall clock.
+    """
+
+    def __init__(self, capital_api: SimulatedCapitalAPI, clock: ReplayClock, latency: float = 0.0):
+        """
+        Initialize SimulatedOrderManager
+
+        Args:
+            capital_api: Simulated API of the broker orders fill on
+            clock: Market time source
+            latency: Seconds between submitting an order and its fill
+        """
+        self.capital_api = capital_api
+        self.broker = capital_api.broker
+        self.clock = clock
+        self.latency = latency
+
+        self.quotes: Dict[str, Dict] = {}
+        self.orders: Dict[int, Order] = {}
+        self._next_id = 1
+        self._queue: List[Tuple[float, int, Order, Optional[LatencyTrace]]] = []
+        self._listeners: List[Callable[[Order], None]] = []
+
+    def add_order_listener(self, listener: Callable[[Order], None]):
+        """Call listener(order) whenever an order reaches a final state"""
+        self._listeners.append(listener)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def update_quote(self, epic: str, quote: Dict):
+        """Remember the last quote (bid, ofr) of an epic for validation"""
+        self.quotes[epic] = {'bid': float(quote['bid']), 'ofr': float(quote['ofr']), 'time': self.clock()}
+
+    def _new_order(self, action: str, **kwargs) -> Order:
+        order = Order(order_id=self._next_id, action=action, future=concurrent.futures.Future(), **kwargs)
+        self._next_id += 1
+        self._set_state(order, 'CREATED')
+        self.orders[order.order_id] = order
+        return order
+
+    def _set_state(self, order: Order, state: str, error: Optional[str] = None):
+        if state not in ORDER_STATES:
+            raise ValueError(f"Invalid order state: {state}")
+        order.states.append((state, self.clock()))
+        if error:
+            order.error = error
+        if order.done:
+            self._finish(order)
+
+    def submit_open(self, epic: str, direction: str, size: float, stop_level: float = None,
+                    profit_level: float = None, trace: Optional[LatencyTrace] = None) -> Order:
+        """Validate a market order and queue it for the broker"""
+        order = self._new_order('OPEN', epic=epic, direction=direction, size=round(size, 2),
+                                stop_level=stop_level, profit_level=profit_level)
+        quote = self.quotes.get(epic)
+        if order.size < 0.01:
+            self._set_state(order, 'REJECTED', "Position size too small (minimum 0.01)")
+        elif quote is None:
+            self._set_state(order, 'FAILED', "Could not get current market price")
+        else:
+            price = quote['ofr'] if direction == 'BUY' else quote['bid']
+            error = self.capital_api.validate_order(direction, price, stop_level, profit_level)
+            if error:
+                self._set_state(order, 'REJECTED', error)
+            else:
+                self._set_state(order, 'VALIDATED')
+                self._queue_order(order, trace)
+        return order
+
+    def submit_close(self, deal_id: str) -> Order:
+        """Queue the close of a position"""
+        order = self._new_order('CLOSE', deal_id=deal_id)
+        self._queue_order(order, None)
+        return order
+
+    def close_positions(self, deal_ids: List[str]) -> List[Order]:
+        """Close several positions"""
+        return [self.submit_close(deal_id) for deal_id in deal_ids]
+
+    def _queue_order(self, order: Order, trace: Optional[LatencyTrace]):
+        if trace:
+            trace.mark('order_sent', self.clock())
+        heapq.heappush(self._queue, (self.clock() + self.latency, order.order_id, order, trace))
+
+    def process(self):
+        """Send the orders whose latency has elapsed to the broker"""
+        now = self.clock()
+        while self._queue and self._queue[0][0] <= now:
+            _, _, order, trace = heapq.heappop(self._queue)
+            if order.action == 'OPEN':
+                confirm = self.broker.open_position(order.epic, order.direction, order.size,
+                                                    order.stop_level, order.profit_level)
+            else:
+                confirm = self.broker.close_position(order.deal_id)
+                confirm = confirm and self.broker.get_confirm(confirm['dealReference'])
+            if trace:
+                trace.mark('confirmed', now)
+            if not confirm:
+                self._set_state(order, 'FAILED', f"Close request for {order.deal_id} failed")
+                continue
+
+            order.confirm = confirm
+            order.deal_reference = confirm.get('dealReference')
+            if confirm.get('dealStatus') == 'ACCEPTED':
+                if order.action == 'OPEN':
+                    order.deal_id = confirm.get('dealId')
+                self._set_state(order, 'CONFIRMED')
+            else:
+                self._set_state(order, 'REJECTED', confirm.get('reason', confirm.get('status')))
+
+    def _finish(self, order: Order):
+        order.future.set_result(order)
+        for listener in self._listeners:
+            listener(order)
+        if order.state == 'CONFIRMED':
+            print(colored(f"✅ {order.action} order #{order.order_id} confirmed ({order.deal_reference})", "green"))
+        else:
+            print(colored(f"❌ {order.action} order #{order.order_id} {order.state.lower()}: {order.error}", "red"))
+
+    def get_stats(self) -> Dict[str, int]:
+        """Count orders per current state"""
+        counts: Dict[str, int] = {}
+        for order in self.orders.values():
+            counts[order.state] = counts.get(order.state, 0) + 1
+        return counts
+
+
+class TickSimulation:
+    """Replays ticks through the live quote pipeline against a simulated broker.
+
+    Every tick is applied to a SimulatedBroker (which fills stop and profit
+    levels at the tick's bid or ofr) and then handed to
+    ``LorentzianTrader.handle_quote_update`` exactly as the WebSocket would,
+    with the trader's clock set to the tick time. Orders fill at the bid or
+    ofr ``latency`` seconds of market time after they are sent, moved by
+    ``slippage``. Nothing waits on the wall clock, so a replay runs as fast
+    as the strategy code allows.
+
+    The ticks of the first ``warmup_minutes`` only build broker bars, which
+    the trader then loads as its history through the simulated /prices.
+    """
+
+    def __init__(self, ticks: Iterable[Tick], epic: str = DEFAULT_EPIC, timeframe: str = DEFAULT_TIMEFRAME,
+                 model=None, initial_balance: Optional[float] = None, latency: Optional[float] = None,
+                 slippage: Optional[float] = None, warmup_minutes: Optional[int] = None,
+                 history: Optional[List[Dict]] = None, quiet: bool = True):
+        """
+        Initialize TickSimulation
+
+        Args:
+            ticks: (timestamp, epic, bid, ofr) ticks in time order, ticks of other epics are skipped
+            epic: Instrument traded
+            timeframe: Trader bar timeframe
+            model: Prediction model (defaults to a new LorentzianModel)
+            initial_balance: Starting broker balance
+            latency: Seconds between an order and its fill (defaults to BACKTEST_CONFIG['order_latency'])
+            slippage: Adverse fill move as a fraction of price (defaults to BACKTEST_CONFIG['slippage'])
+            warmup_minutes: Ticks used only to build history bars
+            history: One-minute broker bars (t, bid and ask OHLC, volume) to start from instead of a warmup
+            quiet: Silence the trader's console output while running
+        """
+        self.ticks = ticks
+        self.epic = epic
+        self.timeframe = timeframe
+        self.model = model
+        self.initial_balance = initial_balance if initial_balance is not None else BACKTEST_CONFIG['initial_balance']
+        self.latency = latency if latency is not None else BACKTEST_CONFIG['order_latency']
+        self.slippage = slippage if slippage is not None else BACKTEST_CONFIG['slippage']
+        self.warmup_minutes = warmup_minutes if warmup_minutes is not None else BACKTEST_CONFIG['tick_warmup_minutes']
+        self.history = history
+        self.quiet = quiet
+
+        self.broker: Optional[SimulatedBroker] = None
+        self.trader: Optional[LorentzianTrader] = None
+        self.clock = ReplayClock()
+
+    @contextlib.contextmanager
+    def _output(self):
+        if not self.quiet:
+            yield
+            return
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            yield
+
+    def _build_trader(self) -> LorentzianTrader:
+        api = SimulatedCapitalAPI(self.broker)
+        return LorentzianTrader(
+            capital_api=api,
+            order_manager=SimulatedOrderManager(api, self.clock, self.latency),
+            session=TradingSession(self.initial_balance, persist=False),
+            model=self.model,
+            clock=self.clock,
+            display=False,
+            epic=self.epic,
+            timeframe=self.timeframe
+        )
+
+    def _replay_tick(self, timestamp: float, epic: str, bid: float, ofr: float) -> List[Dict]:
+        """Apply a tick to the broker, due orders and the trader, returns positions the broker closed at their levels"""
+        closed = self.broker.update_quote(epic, bid, ofr, timestamp)
+        self.trader.order_manager.process()
+        self.trader.handle_quote_update({'epic': epic, 'bid': bid, 'ofr': ofr, 'timestamp': int(timestamp * 1000)})
+        return closed
+
+    def run(self, limit: Optional[int] = None) -> Dict:
+        """
+        Replay the ticks
+
+        Args:
+            limit: Ticks replayed through the trader at most
+
+        Returns:
+            Replay statistics and the broker's realized results
+        """
+        self.broker = SimulatedBroker(initial_balance=self.initial_balance, slippage=self.slippage)
+        if self.history:
+            self.broker.seed_bars(self.epic, self.history)
+        warmup_end = None
+        replayed = 0
+        first_time = last_time = None
+
+        started = time.perf_counter()
+        with self._output():
+            for timestamp, epic, bid, ofr in self.ticks:
+                if epic != self.epic:
+                    continue
+                self.clock.now = timestamp
+                if warmup_end is None:
+                    warmup_end = timestamp + (0 if self.history else self.warmup_minutes * 60)
+                if timestamp < warmup_end:
+                    self.broker.update_quote(epic, bid, ofr, timestamp)
+                    continue
+
+                if self.trader is None:
+                    self.trader = self._build_trader()
+                    self.trader.load_historical_data(end_date=format_time(timestamp))
+                    first_time = timestamp
+                self._replay_tick(timestamp, epic, bid, ofr)
+                last_time = timestamp
+                replayed += 1
+                if limit and replayed >= limit:
+                    break
+
+            # Positions still open at the end are closed at the last quote
+            open_positions = list(self.broker.positions)
+            for deal_id in open_positions:
+                self.broker.close_position(deal_id)
+        elapsed = time.perf_counter() - started
+
+        closed = self.broker.closed_positions
+        pnl = [position['profitLoss'] for position in closed]
+        market_seconds = (last_time - first_time) if replayed else 0.0
+        return {
+            'ticks': replayed,
+            'market_seconds': market_seconds,
+            'elapsed': elapsed,
+            'ticks_per_second': replayed / elapsed if elapsed > 0 else 0.0,
+            'speedup': market_seconds / elapsed if elapsed > 0 else 0.0,
+            'orders': self.trader.order_manager.get_stats() if self.trader else {},
+            'trades': len(closed),
+            'closed_at_end': len(open_positions),
+            'winning_trades': sum(1 for value in pnl if value > 0),
+            'profit_loss': sum(pnl),
+            'final_balance': self.broker.balance,
+            'return_percentage': (self.broker.balance / self.initial_balance - 1) * 100,
+            'latency': self.trader.latency_tracker.get_summary() if self.trader else {}
+        }
+
+
+def print_simulation_results(results: Dict):
+    """Print the statistics of a tick simulation"""
+    hours = results['market_seconds'] / 3600
+    rows = [
+        ['Ticks', results['ticks']],
+        ['Market Time', f"{hours:.2f} hours"],
+        ['Wall Time', f"{results['elapsed']:.2f}s"],
+        ['Throughput', f"{results['ticks_per_second']:.0f} ticks/s"],
+        ['Speed', f"{results['speedup']:.0f}x real time"],
+        ['Orders', ', '.join(f"{state}: {count}" for state, count in sorted(results['orders'].items())) or '-'],
+        ['Trades', f"{results['trades']} ({results['closed_at_end']} closed at the end)"],
+        ['Winning Trades', results['winning_trades']],
+        ['Profit/Loss', f"${results['profit_loss']:.2f}"],
+        ['Final Balance', f"${results['final_balance']:.2f}"],
+        ['Return', f"{results['return_percentage']:.2f}%"]
+    ]
+    print(colored("\n=== Tick Simulation ===", "cyan"))
+    print(tabulate(rows, tablefmt='grid'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay ticks through the trader against a simulated broker")
+    parser.add_argument('--ticks', help="Recorded ticks, CSV (timestamp,epic,bid,ofr) or a TickRecorder .bin file")
+    parser.add_argument('--hours', type=float, default=24.0, help="Synthetic ticks to generate without --ticks")
+    parser.add_argument('--tick-interval', type=float, default=0.5, help="Seconds between synthetic ticks")
+    parser.add_argument('--epic', default=DEFAULT_EPIC)
+    parser.add_argument('--timeframe', default=DEFAULT_TIMEFRAME)
+    parser.add_argument('--balance', type=float, default=None)
+    parser.add_argument('--latency', type=float, default=None, help="Seconds between an order and its fill")
+    parser.add_argument('--slippage', type=float, default=None, help="Adverse fill move as a fraction of price")
+    parser.add_argument('--warmup-minutes', type=int, default=None)
+    parser.add_argument('--limit', type=int, default=None, help="Ticks replayed at most")
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--verbose', action='store_true', help="Show the trader's output")
+    args = parser.parse_args()
+
+    if args.ticks:
+        ticks = load_recorded_ticks(args.ticks)
+    else:
+        source = SyntheticTickSource(epics=[args.epic], tick_interval=args.tick_interval,
+                                     start_time=time.time() - args.hours * 3600, seed=args.seed)
+        count = int(args.hours * 3600 / args.tick_interval)
+        ticks = (tick for tick, _ in zip(source, range(count)))
+
+    simulation = TickSimulation(
+        ticks,
+        epic=args.epic,
+        timeframe=args.timeframe,
+        initial_balance=args.balance,
+        latency=args.latency,
+        slippage=args.slippage,
+        warmup_minutes=args.warmup_minutes,
+        quiet=not args.verbose
+    )
+    print(colored("🎞️ Replaying ticks...", "cyan"))
+    print_simulation_results(simulation.run(limit=args.limit))
+
+
+if __name__ == '__main__':
+    main()
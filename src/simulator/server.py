@@ -0,0 +1,387 @@
+import json
+import time
+import uuid
+import random
+import asyncio
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, Optional, Set, Tuple
+from urllib.parse import urlparse, parse_qs
+
+import websockets
+from websockets.asyncio.server import serve
+from termcolor import colored
+
+from src.simulator.broker import SimulatedBroker, parse_time
+from src.simulator.ticks import Tick
+
+
+class _RestHandler(BaseHTTPRequestHandler):
+    """Forward HTTP requests to CapitalSimulator.handle_rest"""
+
+    def _dispatch(self, method: str):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        status, headers, payload = self.server.simulator.handle_rest(method, self.path, self.headers, body)
+
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._dispatch('GET')
+
+    def do_POST(self):
+        self._dispatch('POST')
+
+    def do_DELETE(self):
+        self._dispatch('DELETE')
+
+    def log_message(self, format, *args):
+        """Keep the simulator quiet"""
+        pass
+
+
+class CapitalSimulator:
+    """Local stand-in for the Capital.com REST and streaming APIs.
+
+    Serves the REST endpoints CapitalAPI uses (session, ping, accounts,
+    prices, markets, positions, confirms) and the streaming protocol
+    CapitalWebSocket speaks (marketData and OHLCMarketData subscribe and
+    unsubscribe, ping, quote and ohlc.event pushes). Ticks from any iterable of (timestamp, epic, bid, ofr) are
+    replayed at ``speed`` times real time and fed to a SimulatedBroker that
+    fills orders. Latency, REST errors, session expiry and socket drops can
+    be injected.
+
+    Point the bot at it with CAPITAL_API_URL=http://host:rest_port and
+    CAPITAL_WS_URL=ws://host:ws_port/connect.
+    """
+
+    def __init__(
+        self,
+        ticks: Iterable[Tick],
+        broker: Optional[SimulatedBroker] = None,
+        host: str = '127.0.0.1',
+        rest_port: int = 8080,
+        ws_port: int = 8081,
+        speed: float = 1.0,
+        latency: float = 0.0,
+        latency_jitter: float = 0.0,
+        error_rate: float = 0.0,
+        disconnect_interval: Optional[float] = None,
+        session_ttl: Optional[float] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Initialize CapitalSimulator
+
+        Args:
+            ticks: Tick iterable to replay (synthetic or recorded)
+            broker: Simulated broker, a new one is created if omitted
+            host: Interface to bind both servers to
+            rest_port: REST API port
+            ws_port: Streaming API port
+            speed: Replay speed multiplier (1 = real time, 1000 = 1000x)
+            latency: Mean injected delay in seconds for REST responses and quote pushes
+            latency_jitter: Maximum random extra delay in seconds
+            error_rate: Fraction of authenticated REST requests answered with HTTP 500
+            disconnect_interval: Seconds between forced WebSocket disconnects
+            session_ttl: Seconds before issued session tokens expire (401)
+            seed: Random seed for fault injection
+        """
+        self.ticks = ticks
+        self.broker = broker or SimulatedBroker(seed=seed)
+        self.host = host
+        self.rest_port = rest_port
+        self.ws_port = ws_port
+        self.speed = speed
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.error_rate = error_rate
+        self.disconnect_interval = disconnect_interval
+        self.session_ttl = session_ttl
+
+        self._random = random.Random(seed)
+        self._sessions: Dict[str, Tuple[str, float]] = {}
+        self._connections: Dict[object, Set[str]] = {}
+        self._ohlc_connections: Dict[object, Dict[str, Set[str]]] = {}  # Connection -> epic -> resolutions
+        self._rest_server: Optional[ThreadingHTTPServer] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop_event: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self.replay_finished = False
+        self.stats = {'ticks': 0, 'quotes_sent': 0, 'rest_requests': 0, 'rest_errors': 0, 'disconnects': 0, 'bars_sent': 0}
+
+    def _delay(self) -> float:
+        """Injected latency for one response"""
+        return self.latency + self._random.uniform(0, self.latency_jitter)
+
+    # ------------------------------------------------------------------ REST
+
+    def _authenticate(self, headers) -> bool:
+        """Check the CST/X-SECURITY-TOKEN pair of a request"""
+        session = self._sessions.get(headers.get('CST'))
+        if session is None or session[0] != headers.get('X-SECURITY-TOKEN'):
+            return False
+        return self.session_ttl is None or time.time() - session[1] < self.session_ttl
+
+    def handle_rest(self, method: str, raw_path: str, headers, body: bytes) -> Tuple[int, Dict[str, str], Dict]:
+        """Route a REST request and return (status, extra headers, JSON payload)"""
+        self.stats['rest_requests'] += 1
+        delay = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+
+        url = urlparse(raw_path)
+        parts = [part for part in url.path.split('/') if part][2:]  # strip api/v1
+        query = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        resource = parts[0] if parts else ''
+
+        if method == 'POST' and resource == 'session':
+            cst, token = uuid.uuid4().hex, uuid.uuid4().hex
+            self._sessions[cst] = (token, time.time())
+            return 200, {'CST': cst, 'X-SECURITY-TOKEN': token}, {'currentAccountId': 'SIMULATOR'}
+
+        if not self._authenticate(headers):
+            return 401, {}, {'errorCode': 'error.invalid.session.token'}
+
+        if self._random.random() < self.error_rate:
+            self.stats['rest_errors'] += 1
+            return 500, {}, {'errorCode': 'error.simulated'}
+
+        if resource == 'ping':
+            return 200, {}, {'status': 'OK'}
+        if resource == 'accounts':
+            return 200, {}, {'accounts': [self.broker.get_account()]}
+        if resource == 'markets' and len(parts) > 1:
+            market = self.broker.get_market(parts[1])
+            return (200, {}, market) if market else (404, {}, {'errorCode': 'error.not-found.epic'})
+        if resource == 'prices' and len(parts) > 1:
+            prices = self.broker.get_prices(
+                parts[1],
+                resolution=query.get('resolution', 'MINUTE'),
+                max_bars=int(query.get('max', query.get('max_bars', 10))),
+                from_time=parse_time(query['from']) if 'from' in query else None,
+                to_time=parse_time(query['to']) if 'to' in query else None
+            )
+            return 200, {}, {'prices': prices, 'instrumentType': 'CRYPTOCURRENCIES'}
+        if resource == 'confirms' and len(parts) > 1:
+            confirm = self.broker.get_confirm(parts[1])
+            return (200, {}, confirm) if confirm else (404, {}, {'errorCode': 'error.not-found.dealReference'})
+        if resource == 'positions':
+            if method == 'GET':
+                return 200, {}, {'positions': self.broker.get_positions()}
+            if method == 'POST':
+                order = json.loads(body or b'{}')
+                confirm = self.broker.open_position(
+                    order.get('epic'),
+                    order.get('direction'),
+                    float(order.get('size', 0)),
+                    stop_level=order.get('stopLevel'),
+                    profit_level=order.get('profitLevel')
+                )
+                return 200, {}, {'dealReference': confirm['dealReference']}
+            if method == 'DELETE' and len(parts) > 1:
+                record = self.broker.close_position(parts[1])
+                if record is None:
+                    return 404, {}, {'errorCode': 'error.not-found.dealId'}
+                return 200, {}, {'dealReference': record['dealReference']}
+
+        return 404, {}, {'errorCode': 'error.not-found'}
+
+    # ------------------------------------------------------------- Streaming
+
+    async def _handle_connection(self, websocket):
+        """Serve one streaming client"""
+        subscriptions: Set[str] = set()
+        ohlc_subscriptions: Dict[str, Set[str]] = {}
+        self._connections[websocket] = subscriptions
+        self._ohlc_connections[websocket] = ohlc_subscriptions
+        try:
+            async for message in websocket:
+                request = json.loads(message)
+                destination = request.get('destination')
+                response = {
+                    'destination': destination,
+                    'correlationId': request.get('correlationId'),
+                    'status': 'OK',
+                    'payload': {}
+                }
+                if request.get('cst') not in self._sessions:
+                    response['status'] = 'ERROR'
+                    response['payload'] = {'errorCode': 'error.invalid.session.token'}
+                elif destination == 'marketData.subscribe':
+                    epics = request.get('payload', {}).get('epics', [])
+                    subscriptions.update(epics)
+                    response['payload'] = {'subscriptions': {epic: 'PROCESSED' for epic in epics}}
+                elif destination == 'marketData.unsubscribe':
+                    epics = request.get('payload', {}).get('epics', [])
+                    subscriptions.difference_update(epics)
+                    response['payload'] = {'subscriptions': {epic: 'PROCESSED' for epic in epics}}
+                elif destination == 'OHLCMarketData.subscribe':
+                    payload = request.get('payload', {})
+                    resolutions = payload.get('resolutions', ['MINUTE'])
+                    bar_type = payload.get('type', 'classic')
+                    for epic in payload.get('epics', []):
+                        ohlc_subscriptions.setdefault(epic, set()).update(resolutions)
+                    response['payload'] = {'subscriptions': {
+                        f"{epic}:{resolution}:{bar_type}": 'PROCESSED'
+                        for epic in payload.get('epics', []) for resolution in resolutions
+                    }}
+                elif destination == 'OHLCMarketData.unsubscribe':
+                    payload = request.get('payload', {})
+                    for epic in payload.get('epics', []):
+                        remaining = ohlc_subscriptions.get(epic, set()) - set(payload.get('resolutions', []))
+                        if remaining:
+                            ohlc_subscriptions[epic] = remaining
+                        else:
+                            ohlc_subscriptions.pop(epic, None)
+                elif destination != 'ping':
+                    response['status'] = 'ERROR'
+                    response['payload'] = {'errorCode': 'error.unsupported.destination'}
+                await websocket.send(json.dumps(response))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            self._connections.pop(websocket, None)
+            self._ohlc_connections.pop(websocket, None)
+
+    async def _broadcast(self, timestamp: float, epic: str, bid: float, ofr: float):
+        """Push a quote to every client subscribed to the epic"""
+        message = json.dumps({
+            'status': 'OK',
+            'destination': 'quote',
+            'payload': {
+                'epic': epic,
+                'product': 'CFD',
+                'bid': bid,
+                'bidQty': 1.0,
+                'ofr': ofr,
+                'ofrQty': 1.0,
+                'timestamp': int(timestamp * 1000)
+            }
+        })
+        for websocket, subscriptions in list(self._connections.items()):
+            if epic in subscriptions:
+                try:
+                    await websocket.send(message)
+                    self.stats['quotes_sent'] += 1
+                except websockets.exceptions.ConnectionClosed:
+                    pass
+
+        # Push the forming bar of every subscribed resolution, bid and ask like the real stream
+        bars = {}
+        for websocket, subscriptions in list(self._ohlc_connections.items()):
+            for resolution in subscriptions.get(epic, ()):
+                if resolution not in bars:
+                    bars[resolution] = self.broker.current_bar(epic, resolution)
+                bar = bars[resolution]
+                if bar is None:
+                    continue
+                for side in ('bid', 'ask'):
+                    o, h, l, c = bar[side]
+                    try:
+                        await websocket.send(json.dumps({
+                            'status': 'OK',
+                            'destination': 'ohlc.event',
+                            'payload': {
+                                'resolution': resolution,
+                                'epic': epic,
+                                'type': 'classic',
+                                'priceType': side,
+                                't': int(bar['t'] * 1000),
+                                'o': o, 'h': h, 'l': l, 'c': c
+                            }
+                        }))
+                        self.stats['bars_sent'] += 1
+                    except websockets.exceptions.ConnectionClosed:
+                        pass
+
+    async def _replay(self):
+        """Replay ticks at the configured speed"""
+        wall_start = None
+        market_start = None
+        for timestamp, epic, bid, ofr in self.ticks:
+            if self._stop_event.is_set():
+                break
+            if wall_start is None:
+                wall_start, market_start = time.monotonic(), timestamp
+
+            # Sleep only when we are ahead of schedule so high speeds are not bound by timer resolution
+            wait = wall_start + (timestamp - market_start) / self.speed - time.monotonic()
+            if wait > 0.001:
+                await asyncio.sleep(wait)
+
+            self.stats['ticks'] += 1
+            self.broker.update_quote(epic, bid, ofr, timestamp)
+            delay = self._delay()
+            if delay > 0:
+                asyncio.get_running_loop().call_later(
+                    delay, lambda args=(timestamp, epic, bid, ofr): asyncio.ensure_future(self._broadcast(*args))
+                )
+            else:
+                await self._broadcast(timestamp, epic, bid, ofr)
+        self.replay_finished = True
+
+    async def _disconnect_clients(self):
+        """Drop every streaming connection periodically"""
+        while not self._stop_event.is_set():
+            await asyncio.sleep(self.disconnect_interval)
+            for websocket in list(self._connections):
+                self.stats['disconnects'] += 1
+                await websocket.close(code=1011, reason='Simulated disconnect')
+
+    # ------------------------------------------------------------- Lifecycle
+
+    async def serve_forever(self):
+        """Run both servers and the tick replay until stop() is called"""
+        self._loop = asyncio.get_running_loop()
+        self._stop_event = asyncio.Event()
+
+        self._rest_server = ThreadingHTTPServer((self.host, self.rest_port), _RestHandler)
+        self._rest_server.daemon_threads = True
+        self._rest_server.simulator = self
+        threading.Thread(target=self._rest_server.serve_forever, name="simulator-rest", daemon=True).start()
+
+        async with serve(self._handle_connection, self.host, self.ws_port):
+            print(colored(f"🧪 Simulator REST on http://{self.host}:{self.rest_port}", "cyan"))
+            print(colored(f"🧪 Simulator WebSocket on ws://{self.host}:{self.ws_port}/connect", "cyan"))
+            tasks = [asyncio.create_task(self._replay())]
+            if self.disconnect_interval:
+                tasks.append(asyncio.create_task(self._disconnect_clients()))
+            try:
+                await self._stop_event.wait()
+            finally:
+                for task in tasks:
+                    task.cancel()
+                self._rest_server.shutdown()
+                self._rest_server.server_close()
+
+    def start(self):
+        """Run the simulator in a background thread"""
+        ready = threading.Event()
+
+        def run():
+            async def main():
+                server = asyncio.create_task(self.serve_forever())
+                await asyncio.sleep(0.1)
+                ready.set()
+                await server
+            asyncio.run(main())
+
+        self._thread = threading.Thread(target=run, name="simulator", daemon=True)
+        self._thread.start()
+        ready.wait(timeout=5)
+
+    def stop(self):
+        """Stop a simulator started with start() or serve_forever()"""
+        if self._loop and self._stop_event:
+            self._loop.call_soon_threadsafe(self._stop_event.set)
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
@@ -0,0 +1,120 @@
+import csv
+import math
+import time
+import random
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from src.api.tick_recorder import TickReader
+
+# (timestamp in epoch seconds, epic, bid, ofr)
+Tick = Tuple[float, str, float, float]
+
+
+class SyntheticTickSource:
+    """Random-walk quote generator for one or more epics.
+
+    Prices follow a geometric random walk with the given annualized
+    volatility and a constant spread. Ticks are spaced ``tick_interval``
+    seconds apart in market time; the replay speed is applied by the
+    simulator, not here.
+    """
+
+    def __init__(
+        self,
+        epics: List[str] = None,
+        start_price: float = 40000.0,
+        volatility: float = 0.6,
+        spread: float = 10.0,
+        tick_interval: float = 0.5,
+        start_time: Optional[float] = None,
+        seed: Optional[int] = None
+    ):
+        """
+        Initialize SyntheticTickSource
+
+        Args:
+            epics: Instruments to generate quotes for
+            start_price: Initial mid price of every epic
+            volatility: Annualized volatility of the random walk
+            spread: Distance between bid and ofr
+            tick_interval: Market-time seconds between ticks of one epic
+            start_time: Epoch seconds of the first tick (defaults to now)
+            seed: Random seed
+        """
+        self.epics = epics or ['BTCUSD']
+        self.start_price = start_price
+        self.volatility = volatility
+        self.spread = spread
+        self.tick_interval = tick_interval
+        self.start_time = start_time if start_time is not None else time.time()
+        self._random = random.Random(seed)
+        self._prices: Dict[str, float] = {epic: start_price for epic in self.epics}
+
+    def _step(self, epic: str, seconds: float) -> float:
+        """Advance the random walk of an epic by the given number of seconds"""
+        sigma = self.volatility * math.sqrt(seconds / 31536000)
+        self._prices[epic] *= math.exp(self._random.gauss(0, sigma))
+        return self._prices[epic]
+
+    def generate_history(self, epic: str, minutes: int) -> List[Dict]:
+        """Generate one-minute bars ending at start_time for seeding the broker"""
+        bars = []
+        first_bar = self.start_time - self.start_time % 60 - minutes * 60
+        # Walk backwards from the current price so history ends where live ticks start
+        price = self._prices[epic]
+        closes = []
+        for _ in range(minutes):
+            closes.append(price)
+            price /= math.exp(self._random.gauss(0, self.volatility * math.sqrt(60 / 31536000)))
+        closes.reverse()
+
+        half_spread = self.spread / 2
+        previous = closes[0]
+        for i, close in enumerate(closes):
+            wick = abs(close - previous) * 0.5 + close * 0.0002
+            high, low = max(previous, close) + wick, min(previous, close) - wick
+            bid = [previous - half_spread, high - half_spread, low - half_spread, close - half_spread]
+            ask = [previous + half_spread, high + half_spread, low + half_spread, close + half_spread]
+            bars.append({'t': first_bar + i * 60, 'bid': bid, 'ask': ask, 'volume': self._random.randint(1, 100)})
+            previous = close
+        return bars
+
+    def __iter__(self) -> Iterator[Tick]:
+        timestamp = self.start_time
+        step = self.tick_interval / len(self.epics)
+        while True:
+            for epic in self.epics:
+                mid = self._step(epic, self.tick_interval)
+                yield timestamp, epic, mid - self.spread / 2, mid + self.spread / 2
+                timestamp += step
+
+
+def load_recorded_ticks(path: str) -> Iterator[Tick]:
+    """
+    Read recorded ticks from a CSV file or a TickRecorder .bin file
+
+    A CSV file must have a header with timestamp (epoch milliseconds), epic,
+    bid and ofr columns, matching the fields of streamed quote payloads.
+    """
+    if path.endswith('.bin'):
+        yield from TickReader(path).iter_ticks()
+        return
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            yield float(row['timestamp']) / 1000, row['epic'], float(row['bid']), float(row['ofr'])
+
+
+def load_history_bars(path: str) -> List[Dict]:
+    """
+    Read one-minute history bars for SimulatedBroker.seed_bars from a CSV file
+
+    The file must have a header with timestamp (epoch milliseconds), open,
+    high, low and close columns of bid prices and may have a volume column.
+    Ask prices are set to the bid prices, the trader only reads bid bars.
+    """
+    bars = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            bid = [float(row['open']), float(row['high']), float(row['low']), float(row['close'])]
+            bars.append({'t': int(float(row['timestamp'])) // 1000, 'bid': bid, 'ask': list(bid), 'volume': float(row.get('volume') or 0)})
+    return bars
@@ -1,9 +1,13 @@
 from .config import (
     TRADING_CONFIG,
     FEATURE_PARAMS,
+    API_CONFIG,
+    WEBSOCKET_CONFIG,
+    BACKTEST_CONFIG,
     ENV_CONFIG,
     DATA_DIR,
     DEFAULT_PAIR,
+    DEFAULT_EPIC,
     DEFAULT_TIMEFRAME
 )
 from .visualization import (
@@ -12,20 +16,26 @@ from .visualization import (
     print_bot_config,
     print_active_filters,
     print_positions,
+    print_latency_summary,
     print_error
 )
 
 __all__ = [
     'TRADING_CONFIG',
     'FEATURE_PARAMS',
+    'API_CONFIG',
+    'WEBSOCKET_CONFIG',
+    'BACKTEST_CONFIG',
     'ENV_CONFIG',
     'DATA_DIR',
     'DEFAULT_PAIR',
+    'DEFAULT_EPIC',
     'DEFAULT_TIMEFRAME',
     'print_header',
     'print_market_data',
     'print_bot_config',
     'print_active_filters',
     'print_positions',
+    'print_latency_summary',
     'print_error'
 ] 
\ No newline at end of file
@@ -11,8 +11,78 @@ ENV_CONFIG = {
 DATA_DIR = './data'
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Capital.com REST API configuration
+API_CONFIG: Dict[str, Any] = {
+    'rate_limit': 10,              # Requests per second shared by all REST calls
+    'rate_burst': 10,              # Maximum burst of back-to-back requests
+    'starvation_timeout': 5,       # Seconds before a low priority request jumps the queue
+    'max_retries': 3,              # Retries after a 429 Too Many Requests response
+    'default_retry_after': 1.0,    # Backoff in seconds when 429 has no Retry-After header
+    'session_keepalive_interval': 300,  # Seconds between pings, sessions idle out after 10 minutes
+    'order_max_quote_age': 5,      # Seconds a streamed quote is trusted to validate orders
+    'confirm_poll_interval': 0.2,  # Seconds between /confirms polls of one order
+    'confirm_timeout': 10,         # Seconds before an unconfirmed order times out
+    'order_workers': 4,            # Threads sending order requests concurrently
+    # Response cache freshness in seconds per endpoint (0 disables caching)
+    'cache_ttl': {
+        'markets': 5,              # /markets/{epic} details and snapshot
+        'positions': 15,           # /positions, invalidated on order events
+        'accounts': 30,            # /accounts balance information
+        'prices': 10               # Latest bars from /prices/{epic} (no date range)
+    }
+}
+
+# Capital.com streaming API configuration
+WEBSOCKET_CONFIG: Dict[str, Any] = {
+    'quote_queue_max_epics': 100,  # Epics with a latest-quote mailbox
+    'quote_workers': 4,            # Worker threads running quote callbacks
+    'ping_interval': 540,          # Seconds between heartbeat pings (session lasts 10 minutes)
+    'watchdog_timeout': 60,        # Seconds without any message before the connection is dropped
+    'reconnect_base_delay': 1,     # First reconnect backoff in seconds
+    'reconnect_max_delay': 60,     # Backoff cap in seconds
+    'max_epics_per_message': 40,   # Epics sent in one subscribe/unsubscribe message
+    'max_subscribed_epics': 40,    # Instruments one streaming session may subscribe to
+    'subscription_interval': 0.1,  # Seconds between subscription messages when resubscribing
+    'ohlc_bar_type': 'classic',    # Streamed OHLC bar type ('classic' or 'heikin-ashi')
+    'record_ticks': False,         # Record every received quote to binary daily files
+    'tick_directory': os.path.join(DATA_DIR, 'ticks'),
+    'tick_buffer_size': 4096,      # Quotes buffered before a write
+    'tick_flush_interval': 5.0,    # Seconds before a partially filled buffer is written
+    'max_gap_backfill_bars': 288,  # Most bars fetched to repair an outage (1 day of 5m bars)
+    'bar_reconcile_tolerance': 0.001  # Relative OHLC gap between streamed and quote-built bars reported as a mismatch
+}
+
+# Backtesting configuration
+BACKTEST_CONFIG: Dict[str, Any] = {
+    'initial_balance': 1000,
+    'spread': 0.0002,    # Bid/ask spread as a fraction of price
+    'slippage': 0.0001,  # Adverse move on market and stop fills as a fraction of price
+    'warmup_bars': 50,   # Bars of history before the first signal
+    'fast': True,        # Precompute signals and exit indicators, then run on arrays
+    'signal_batch_size': 4096,  # Feature rows per model call of SignalGenerator.get_signals
+    'max_holding_bars': 288,  # Bars a simulated outcome is followed before it times out
+    'tie_rule': 'stop_loss',  # Bar containing both levels: 'stop_loss', 'take_profit' or 'ohlc'
+    'sweep_workers': None,    # Parameter sweep processes (None uses every CPU)
+    'sweep_batch_size': 8,    # Combinations per sweep task
+    'sweep_checkpoint': os.path.join(DATA_DIR, 'sweep_results.jsonl'),
+    'walkforward_train_bars': 2016,   # Optimization bars per window (7 days of 5m bars)
+    'walkforward_test_bars': 576,     # Out-of-sample bars after each train window (2 days)
+    'walkforward_anchored': False,    # Train windows all start at the first bar
+    'walkforward_epochs': 10,         # Model training epochs per window when retraining
+    'walkforward_label_bars': 6,      # Bars ahead the training labels look
+    'walkforward_cache_dir': os.path.join(DATA_DIR, 'walkforward'),
+    'order_latency': 0.2,         # Seconds between sending an order and its fill in tick simulations
+    'tick_warmup_minutes': 300,   # Ticks that only build history bars before a tick simulation trades
+    'monte_carlo_paths': 100000,          # Synthetic equity paths per Monte Carlo run
+    'monte_carlo_method': 'bootstrap',    # Trade resampling: 'bootstrap' or 'block'
+    'monte_carlo_block_size': 5,          # Consecutive trades per block of the block method
+    'monte_carlo_ruin_level': 0.5,        # Share of the initial balance lost that counts as ruin
+    'monte_carlo_memory_limit': 256 * 1024 * 1024  # Bytes of path arrays held at once
+}
+
 # Trading pairs
 DEFAULT_PAIR = "BTC/USD"
+DEFAULT_EPIC = "BTCUSD"
 DEFAULT_TIMEFRAME = '5m'
 
 # Trading configuration
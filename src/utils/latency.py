@@ -0,0 +1,130 @@
+import json
+import time
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# Microsecond values below 2 * SUB_BUCKETS get exact buckets, larger values
+# get SUB_BUCKETS linear buckets per power of two (about 3% relative error)
+SUB_BUCKET_BITS = 5
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_EXPONENT = 40  # Covers up to ~12 days in microseconds
+
+
+class LatencyHistogram:
+    """HDR-style log-linear histogram of latencies with microsecond resolution.
+
+    Recording is O(1) with fixed memory, percentiles are accurate to the
+    bucket width (about 3% of the value).
+    """
+
+    def __init__(self):
+        self.counts = [0] * (2 * SUB_BUCKETS + MAX_EXPONENT * SUB_BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = 0.0
+
+    @staticmethod
+    def _index(micros: int) -> int:
+        if micros < 2 * SUB_BUCKETS:
+            return micros
+        shift = micros.bit_length() - SUB_BUCKET_BITS - 1
+        return 2 * SUB_BUCKETS + (shift - 1) * SUB_BUCKETS + (micros >> shift) - SUB_BUCKETS
+
+    @staticmethod
+    def _upper_bound(index: int) -> int:
+        """Highest microsecond value that falls into a bucket"""
+        if index < 2 * SUB_BUCKETS:
+            return index
+        shift = (index - 2 * SUB_BUCKETS) // SUB_BUCKETS + 1
+        sub = (index - 2 * SUB_BUCKETS) % SUB_BUCKETS + SUB_BUCKETS
+        return ((sub + 1) << shift) - 1
+
+    def record(self, seconds: float):
+        """Record one latency in seconds, negative values (clock skew) count as zero"""
+        seconds = max(0.0, seconds)
+        index = min(self._index(int(seconds * 1e6)), len(self.counts) - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self.min = seconds if self.min is None else min(self.min, seconds)
+
+    def percentile(self, percent: float) -> float:
+        """Latency in seconds below which the given percentage of values fall"""
+        if not self.count:
+            return 0.0
+        target = max(1, int(self.count * percent / 100 + 0.5))
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return min(self._upper_bound(index) / 1e6, self.max)
+        return self.max
+
+    def summary(self) -> Dict[str, float]:
+        """Count and p50/p90/p99/max/mean in milliseconds"""
+        return {
+            'count': self.count,
+            'p50': self.percentile(50) * 1000,
+            'p90': self.percentile(90) * 1000,
+            'p99': self.percentile(99) * 1000,
+            'max': self.max * 1000,
+            'mean': self.total / self.count * 1000 if self.count else 0.0
+        }
+
+
+class LatencyTrace:
+    """Timestamps of one decision as it moves through the pipeline stages"""
+
+    def __init__(self, stage: str, timestamp: Optional[float] = None):
+        self.marks: List[Tuple[str, float]] = [(stage, timestamp if timestamp is not None else time.time())]
+
+    def mark(self, stage: str, timestamp: Optional[float] = None):
+        """Record the time a stage finished"""
+        self.marks.append((stage, timestamp if timestamp is not None else time.time()))
+
+
+class LatencyTracker:
+    """Per-stage latency histograms fed by LatencyTrace objects.
+
+    The latency of a stage is the time between its mark and the previous
+    mark of the same trace; 'total' covers the first to the last mark.
+    """
+
+    def __init__(self, stages: List[str]):
+        """
+        Initialize LatencyTracker
+
+        Args:
+            stages: Stage names in pipeline order, used to order reports
+        """
+        self.stages = list(stages)
+        self.histograms: Dict[str, LatencyHistogram] = {stage: LatencyHistogram() for stage in self.stages}
+        self.histograms['total'] = LatencyHistogram()
+        self._lock = threading.Lock()
+
+    def start(self, stage: str, timestamp: Optional[float] = None) -> LatencyTrace:
+        """Start a trace at the given first stage"""
+        return LatencyTrace(stage, timestamp)
+
+    def finish(self, trace: LatencyTrace):
+        """Record the stage latencies of a trace"""
+        with self._lock:
+            for (_, previous), (stage, timestamp) in zip(trace.marks, trace.marks[1:]):
+                if stage not in self.histograms:
+                    self.stages.append(stage)
+                    self.histograms[stage] = LatencyHistogram()
+                self.histograms[stage].record(timestamp - previous)
+            if len(trace.marks) > 1:
+                self.histograms['total'].record(trace.marks[-1][1] - trace.marks[0][1])
+
+    def get_summary(self) -> Dict[str, Dict[str, float]]:
+        """Get p50/p90/p99/max/mean in milliseconds per stage"""
+        with self._lock:
+            return {stage: self.histograms[stage].summary() for stage in self.stages + ['total']}
+
+    def save(self, path: str):
+        """Write the summary as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.get_summary(), f, indent=2)
@@ -107,6 +107,18 @@ def print_trading_signal(signal_type: str, current_price: float, stop_loss: floa
     ]
     print(tabulate(signal_data, tablefmt='simple'))
 
+def print_latency_summary(summary: Dict[str, Dict[str, float]]):
+    """Print per-stage latency percentiles in a formatted table"""
+    print(colored("\n=== ⏱️ Latency (ms) ===", "cyan"))
+    rows = [
+        [stage, stats['count'], f"{stats['p50']:.2f}", f"{stats['p99']:.2f}", f"{stats['max']:.2f}"]
+        for stage, stats in summary.items() if stats['count']
+    ]
+    if not rows:
+        print("No decisions measured yet")
+        return
+    print(tabulate(rows, headers=['Stage', 'Count', 'p50', 'p99', 'Max'], tablefmt='simple'))
+
 def print_error(message: str, error: Exception = None):
     """Print error message"""
     print(colored(f"\n❌ Error: {message}", "red"))